@@ -0,0 +1,135 @@
+"""ディレクトリやワイルドカードで指定した複数ファイルをまとめて変換するバッチ処理
+
+使い方: python batch_converter.py <ディレクトリまたはパターン>... [-j 並列数] [-o 出力ディレクトリ]
+
+.xml ファイルは CSV に、.csv ファイルは TestLink インポート用 XML に変換する。
+ファイル毎にプロセスプールのワーカーで変換するため、CPUコア数に応じて処理量が増える。
+一部のファイルで失敗しても残りのファイルの変換は継続する。
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from converter_cli import get_output_path, CONVERTED_XML_SUFFIX
+from csv_to_xml import convert_csv_to_xml
+from xml_processor import convert_xml_file_to_csv
+from diagnostics import ConversionDiagnostics, get_report_path
+
+def collect_input_files(patterns):
+    """ディレクトリまたはワイルドカードのリストから、変換対象の .xml / .csv ファイルを列挙する
+
+    (変換対象のファイルのリスト, 対象外にした .csv ファイルのリスト) を返す。
+    同名の .xml がある .csv はその変換結果とみなし、対象外にする。
+    """
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern)
+        for path in sorted(matches):
+            lower = path.lower()
+            if not os.path.isfile(path) or not lower.endswith((".xml", ".csv")):
+                continue
+            # このツールが出力したXMLは再変換しない
+            if lower.endswith(CONVERTED_XML_SUFFIX):
+                continue
+            if path not in files:
+                files.append(path)
+
+    # 同名の .xml がある .csv はその変換結果なので対象外にする
+    xml_bases = {os.path.splitext(path)[0] for path in files if path.lower().endswith(".xml")}
+    skipped = [path for path in files if path.lower().endswith(".csv") and os.path.splitext(path)[0] in xml_bases]
+    return [path for path in files if path not in skipped], skipped
+
+def convert_file(input_file, output_dir=None):
+    """1ファイルを変換し、(入力ファイル, 出力ファイル, エラーメッセージ, 処理時間, 警告の件数) を返す（成功時のエラーは None）
+
+    警告は表示せずに 出力ファイル名.warnings.csv に書き込む（並列に変換したファイルの警告が混ざらないようにする）。
+    """
+    output_file = get_output_path(input_file, output_dir)
+    diagnostics = ConversionDiagnostics()
+    start = time.perf_counter()
+    try:
+        if input_file.lower().endswith(".xml"):
+            convert_xml_file_to_csv(input_file, output_file)
+        else:
+            convert_csv_to_xml(input_file, output_file, diagnostics=diagnostics)
+            if diagnostics.total:
+                diagnostics.write_report(get_report_path(output_file))
+        error = None
+    except Exception as e:
+        error = str(e) or traceback.format_exc()
+        # 途中まで書き込んだ出力ファイルは残さない
+        if os.path.exists(output_file):
+            os.remove(output_file)
+    return input_file, output_file, error, time.perf_counter() - start, diagnostics.total
+
+def run_batch(input_files, max_workers=None, output_dir=None):
+    """ファイルをプロセスプールで並列に変換し、ファイル毎の結果のリストを入力順で返す"""
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+
+    results = {}
+    if max_workers == 1:
+        # 並列数1の場合はプロセスを起動せずに順番に変換する
+        for input_file in input_files:
+            results[input_file] = convert_file(input_file, output_dir)
+            print_result(results[input_file])
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(convert_file, input_file, output_dir) for input_file in input_files]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result[0]] = result
+                print_result(result)
+    return [results[input_file] for input_file in input_files]
+
+def print_result(result):
+    """1ファイル分の変換結果を表示する"""
+    input_file, output_file, error, elapsed, warnings = result
+    if error is None:
+        warning_text = f", 警告 {warnings} 件: {get_report_path(output_file)}" if warnings else ""
+        print(f"[成功] {input_file} -> {output_file} ({elapsed:.2f}秒{warning_text})")
+    else:
+        first_line = error.splitlines()[0] if error else ""
+        print(f"[失敗] {input_file}: {first_line} ({elapsed:.2f}秒)")
+
+def print_summary(results, elapsed, skipped=()):
+    """全体の変換結果を集計して表示する（skipped は collect_input_files で対象外にしたファイル）"""
+    failed = [result for result in results if result[2] is not None]
+    skipped_text = f" / スキップ {len(skipped)} 件" if skipped else ""
+    print(f"完了: 成功 {len(results) - len(failed)} 件 / 失敗 {len(failed)} 件{skipped_text} / 合計 {len(results)} 件 ({elapsed:.2f}秒)")
+    for input_file, _, error, _, _ in failed:
+        print(f"  失敗: {input_file}")
+    print_skipped(skipped)
+
+def print_skipped(skipped):
+    """collect_input_files で対象外にしたファイルを表示する"""
+    for input_file in skipped:
+        print(f"  スキップ: {input_file}（同名の .xml の変換結果とみなしました）")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TestLink XML / CSV ファイルを一括変換する")
+    parser.add_argument("inputs", nargs="+", help="変換するファイルのディレクトリまたはワイルドカード")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="並列に変換するプロセス数（省略時はCPUコア数）")
+    parser.add_argument("-o", "--output-dir", default=None, help="出力先ディレクトリ（省略時は入力ファイルと同じ場所）")
+    args = parser.parse_args(argv)
+
+    input_files, skipped = collect_input_files(args.inputs)
+    if not input_files:
+        print("変換対象のファイルが見つかりません")
+        print_skipped(skipped)
+        return 1
+
+    start = time.perf_counter()
+    results = run_batch(input_files, args.jobs, args.output_dir)
+    print_summary(results, time.perf_counter() - start, skipped)
+    return 0 if all(result[2] is None for result in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""変換処理の性能を計測するベンチマークスクリプト
+
+使い方: python benchmark.py [テストケース数] [1テストケースあたりのステップ数]
+各処理の結果が比較対象の実装と一致することは、pytest のテスト（test_*.py）で確認する。
+"""
+import codecs
+import csv
+import itertools
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.sax.saxutils as saxutils
+
+from csv_reader import get_header_indices, iter_csv_rows, open_csv_output
+from xml_builder import RowPlan, create_root_element, build_testcase_element, iter_testcase_groups, group_testcases, get_group_key
+from text_cache import clear_text_caches, set_text_cache_size, format_text_cache_stats, DEFAULT_CACHE_SIZE
+from text_utils import text_to_html
+from xml_processor import clean_html, fix_double_cdata, element_to_testcase, testcase_to_rows, iter_testcases, convert_xml_to_csv
+from cdata_repair import iter_repaired_chunks
+from xml_utils import element_to_string
+from xml_emitter import testcase_to_xml
+from external_grouping import iter_external_testcase_groups
+from xml_index import XmlIndex
+from testcase_filter import TestcaseFilter
+from sample_data import make_csv_rows
+
+# 起動時間を計測するモジュール
+IMPORT_TIME_MODULES = ("testlink_converter_tool", "converter_cli", "xml_processor", "csv_to_xml")
+# CSV行のうち、HTMLとの変換対象のテキストの列（サマリ・事前条件・アクション・期待結果）
+TEXT_COLUMNS = (4, 6, 8, 9)
+
+def legacy_element_to_string(element, indent=""):
+    """比較用: 文字列連結で出力を組み立てていた従来の element_to_string"""
+    tag = element.tag
+    attrib_str = ""
+    if element.attrib:
+        attrib_str = " " + " ".join(f'{k}="{saxutils.escape(str(v))}"' for k, v in element.attrib.items())
+
+    result = f"{indent}<{tag}{attrib_str}"
+    text_content = element.text
+    has_children = len(element) > 0
+
+    if has_children or (text_content is not None and text_content.strip()):
+        result += ">"
+    else:
+         result += "></" + tag + ">" # 空要素 <tag></tag>
+         return result
+
+    html_tags = ['summary', 'preconditions', 'actions', 'expectedresults', 'details']
+    cdata_tags = [
+        'node_order', 'externalid', 'version', 'step_number',
+        'execution_type', 'importance', 'status',
+        'is_open', 'active', 'name', 'value'
+    ]
+
+    if text_content is not None:
+        stripped_text = text_content
+        if stripped_text:
+            if tag in html_tags:
+                escaped_text = stripped_text.replace(']]>', ']]]]><![CDATA[>')
+                result += f"<![CDATA[{escaped_text}]]>"
+            elif tag in cdata_tags:
+                escaped_text = stripped_text.replace(']]>', ']]]]><![CDATA[>')
+                result += f"<![CDATA[{escaped_text}]]>"
+            else:
+                result += saxutils.escape(stripped_text)
+
+    if has_children:
+        result += "\n"
+        for child in element:
+            result += legacy_element_to_string(child, indent + "\t") + "\n"
+        result += f"{indent}</{tag}>"
+    elif text_content is not None and text_content.strip():
+        result += f"</{tag}>"
+
+    return result
+
+def build_sample_tree(rows):
+    """合成CSV行から <testcases> 要素ツリーを構築する"""
+    plan = RowPlan(get_header_indices(rows[0]))
+    root = create_root_element()
+    for _, testcase in iter_testcase_groups(rows[1:], plan):
+        build_testcase_element(root, testcase)
+    return root
+
+def time_call(func, *args, repeat=3):
+    """関数を repeat 回実行し、最短の実行時間（秒）と最後の戻り値を返す"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        # 前回の戻り値を解放してから実行する（ピークメモリに前回の結果を含めない）
+        result = None
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+def bench_element_to_string(root):
+    """element_to_string と従来実装の実行時間を比較する"""
+    new_time, _ = time_call(element_to_string, root)
+    old_time, _ = time_call(legacy_element_to_string, root)
+    print(f"element_to_string: {new_time:.3f}秒 (従来実装: {old_time:.3f}秒, {old_time / new_time:.1f}倍)")
+
+def emit_with_element_tree(testcase):
+    """比較用: 要素ツリーを構築して <testcase> のXML文字列に変換する"""
+    testcase_elem = build_testcase_element(create_root_element(), testcase)
+    return None if testcase_elem is None else element_to_string(testcase_elem, "\t")
+
+def bench_xml_emitter(rows):
+    """testcase_to_xml と要素ツリーによる出力の実行時間を比較する"""
+    plan = RowPlan(get_header_indices(rows[0]))
+    groups = list(iter_testcase_groups(rows[1:], plan))
+    new_time, _ = time_call(lambda: [testcase_to_xml(testcase) for _, testcase in groups])
+    old_time, _ = time_call(lambda: [emit_with_element_tree(testcase) for _, testcase in groups])
+    print(f"testcase_to_xml: {new_time:.3f}秒 (要素ツリー: {old_time:.3f}秒, {old_time / new_time:.1f}倍)")
+
+def repair_cdata_stream(text, chunk_size):
+    """text を chunk_size バイトずつに分けて iter_repaired_chunks で修正し、文字列で返す"""
+    data = text.encode("utf-8")
+    chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+    return b"".join(iter_repaired_chunks(chunks)).decode("utf-8")
+
+def bench_cdata_repair(root):
+    """全CDATAを二重にしたXMLで、ストリーミング修正と fix_double_cdata の実行時間を比較する"""
+    text = element_to_string(root).replace("<![CDATA[", "<![CDATA[<![CDATA[").replace("]]>", "]]>]]>")
+    new_time, _ = time_call(repair_cdata_stream, text, 1024 * 1024)
+    old_time, _ = time_call(fix_double_cdata, text)
+    print(f"二重CDATA修正: {new_time:.3f}秒 (fix_double_cdata: {old_time:.3f}秒, {old_time / new_time:.1f}倍)")
+
+    # 閉じ側が一重の二重CDATAが多いと、fix_double_cdata は開始位置毎に文書の末尾まで探索する
+    text = "<a><![CDATA[<![CDATA[閉じ側が一重]]></a>\n" * 2000
+    new_time, _ = time_call(repair_cdata_stream, text, 1024 * 1024)
+    old_time, _ = time_call(fix_double_cdata, text, repeat=1)
+    print(f"二重CDATA修正（閉じ側が一重）: {new_time:.3f}秒 (fix_double_cdata: {old_time:.3f}秒, {old_time / new_time:.1f}倍)")
+
+def bench_text_cache(rows):
+    """text_to_html と clean_html をキャッシュ無効・有効で実行し、時間とヒット率を比較する"""
+    def convert_all():
+        for row in rows[1:]:
+            for i in TEXT_COLUMNS:
+                clean_html(text_to_html(row[i]))
+
+    set_text_cache_size(0)
+    uncached_time, _ = time_call(convert_all, repeat=1)
+    set_text_cache_size(DEFAULT_CACHE_SIZE)
+    cached_time, _ = time_call(convert_all, repeat=1)
+    print(f"テキスト変換キャッシュ: {cached_time:.3f}秒 (キャッシュなし: {uncached_time:.3f}秒, {uncached_time / cached_time:.1f}倍)")
+    print(format_text_cache_stats())
+    clear_text_caches()
+
+def legacy_read_csv_rows(csv_file, encoding="shift_jis"):
+    """比較用: codecs のストリームリーダーで1行ずつデコードしていた従来の読み込み"""
+    with codecs.open(csv_file, "r", encoding, errors="replace") as f:
+        return list(csv.reader(f))
+
+def bench_csv_decode(rows, min_size=64 * 1024 * 1024):
+    """合成CSVを cp932 で min_size バイト以上書き込み、iter_csv_rows と従来の読み込みの実行時間を比較する"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_file = os.path.join(work_dir, "decode.csv")
+        with open_csv_output(csv_file) as f:
+            writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+            writer.writerow(rows[0])
+            while f.tell() < min_size:
+                writer.writerows(rows[1:])
+        size = os.path.getsize(csv_file) / (1024 * 1024)
+        new_time, _ = time_call(lambda: list(iter_csv_rows(csv_file)), repeat=1)
+        old_time, _ = time_call(legacy_read_csv_rows, csv_file, repeat=1)
+    print(f"CSV読み込み ({size:.0f}MB): {new_time:.3f}秒 (codecs: {old_time:.3f}秒, {old_time / new_time:.1f}倍)")
+
+def legacy_group_testcases(rows, plan):
+    """比較用: 各テストケースの全行を plan.read のタプルのまま保持していた従来のグループ化"""
+    testcase_groups = {}
+    for row in rows[1:]:
+        record = plan.read(row)
+        group_key = get_group_key(record)
+        if group_key:
+            testcase_groups.setdefault(group_key, []).append(record)
+    return testcase_groups
+
+def traced_size(func, *args):
+    """func の戻り値が確保しているメモリ（バイト）を tracemalloc で計測する"""
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+def bench_testcase_model(rows, root):
+    """Testcase によるテストケースの保持と、従来の行単位の保持のメモリ使用量を比較する"""
+    plan = RowPlan(get_header_indices(rows[0]))
+    new_size = traced_size(group_testcases, rows, plan)
+    old_size = traced_size(legacy_group_testcases, rows, plan)
+    print(f"テストケースのグループ化: {new_size / (1024 * 1024):.1f}MB (行単位: {old_size / (1024 * 1024):.1f}MB, {old_size / new_size:.1f}倍)")
+
+    # XML→CSV の並列変換でワーカーから受け取るデータの大きさ
+    testcases = root.findall("testcase")
+    new_bytes = len(pickle.dumps([element_to_testcase(testcase, "") for testcase in testcases], pickle.HIGHEST_PROTOCOL))
+    old_bytes = len(pickle.dumps([testcase_to_rows(testcase, "") for testcase in testcases], pickle.HIGHEST_PROTOCOL))
+    print(f"ワーカーの変換結果: {new_bytes / (1024 * 1024):.1f}MB (CSV行: {old_bytes / (1024 * 1024):.1f}MB, {old_bytes / new_bytes:.1f}倍)")
+
+def traced_peak(func, *args):
+    """func の実行中のメモリ使用量のピーク（バイト）を tracemalloc で計測する"""
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+def bench_external_grouping(rows, memory_budget=4 * 1024 * 1024):
+    """テストケースの行を交互に並べたCSV行で、一時ファイルを使うグループ化と group_testcases を比較する"""
+    plan = RowPlan(get_header_indices(rows[0]))
+    # テストケース毎の行を1行ずつ交互に並べる（同じテストケースの行が連続しない）
+    groups = {}
+    for row in rows[1:]:
+        groups.setdefault(row[0], []).append(row)
+    interleaved = [row for step_rows in itertools.zip_longest(*groups.values()) for row in step_rows if row is not None]
+
+    def external():
+        return iter_external_testcase_groups(iter(interleaved), plan, memory_budget)
+
+    def in_memory():
+        return group_testcases([rows[0]] + interleaved, plan).items()
+
+    # テストケースを1件ずつ取り出して捨てる（XMLに変換して書き込む場合と同じ）
+    new_time, _ = time_call(lambda: sum(1 for _ in external()), repeat=1)
+    old_time, _ = time_call(lambda: sum(1 for _ in in_memory()), repeat=1)
+    new_peak = traced_peak(lambda: sum(1 for _ in external()))
+    old_peak = traced_peak(lambda: sum(1 for _ in in_memory()))
+    print(f"一時ファイルによるグループ化: {new_time:.3f}秒, ピーク {new_peak / (1024 * 1024):.1f}MB "
+          f"(group_testcases: {old_time:.3f}秒, ピーク {old_peak / (1024 * 1024):.1f}MB)")
+
+def bench_xml_index(root):
+    """XMLファイルの索引の作成と、索引による1件の取り出しを、ファイル全体のパースと比較する"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        xml_file = os.path.join(temp_dir, "testcases.xml")
+        with open(xml_file, "w", encoding="utf-8") as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write(element_to_string(root))
+
+        build_time, index = time_call(XmlIndex.build, xml_file)
+        parse_time, _ = time_call(lambda: sum(1 for _ in iter_testcases(xml_file)))
+        # 末尾のテストケース1件を取り出す（ファイル全体のパースでは最後まで読む必要がある）
+        entries = index.testcases[-1:]
+        extract_time, _ = time_call(lambda: list(index.iter_testcases(entries)))
+        print(f"XML索引の作成: {build_time:.3f}秒, 1件の取り出し: {extract_time * 1000:.2f}ミリ秒 "
+              f"(ファイル全体のパース: {parse_time:.3f}秒)")
+
+def bench_testcase_filter(rows, root, expressions=("importance=high", "AutomationEnabled=1")):
+    """フィルタを指定した変換と、すべてを変換する場合の実行時間を比較する"""
+    from csv_to_xml import convert_csv_to_xml
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_file = os.path.join(work_dir, "filter.csv")
+        output = os.path.join(work_dir, "output")
+        with open_csv_output(csv_file, "utf-8") as f:
+            csv.writer(f, quoting=csv.QUOTE_ALL).writerows(rows)
+
+        testcase_filter = TestcaseFilter(expressions)
+        new_time, _ = time_call(lambda: convert_csv_to_xml(csv_file, output, encoding="utf-8", testcase_filter=TestcaseFilter(expressions)), repeat=1)
+        convert_csv_to_xml(csv_file, output, encoding="utf-8", testcase_filter=testcase_filter)
+        old_time, _ = time_call(lambda: convert_csv_to_xml(csv_file, output, encoding="utf-8"), repeat=1)
+        print(f"CSV→XML フィルタ ({' '.join(expressions)}): {new_time:.3f}秒 (すべて変換: {old_time:.3f}秒, {old_time / new_time:.1f}倍)")
+        print(testcase_filter.format_stats())
+
+        new_time, _ = time_call(lambda: convert_xml_to_csv(root, "", output, encoding="utf-8", testcase_filter=TestcaseFilter(expressions)), repeat=1)
+        old_time, _ = time_call(lambda: convert_xml_to_csv(root, "", output, encoding="utf-8"), repeat=1)
+        print(f"XML→CSV フィルタ ({' '.join(expressions)}): {new_time:.3f}秒 (すべて変換: {old_time:.3f}秒, {old_time / new_time:.1f}倍)")
+
+def bench_import_time(repeat=5):
+    """各モジュールのインポート時間を別プロセスで計測する"""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    for module in IMPORT_TIME_MODULES:
+        code = (
+            "import time\n"
+            "start = time.perf_counter()\n"
+            f"import {module}\n"
+            "print(time.perf_counter() - start)\n"
+        )
+        best = None
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, "-c", code], cwd=repo_dir, capture_output=True, text=True, check=True).stdout
+            elapsed = float(output)
+            if best is None or elapsed < best:
+                best = elapsed
+        print(f"import {module}: {best * 1000:.1f}ミリ秒")
+
+def main():
+    n_testcases = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    n_steps = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    print(f"テストケース数: {n_testcases}, ステップ数/テストケース: {n_steps}")
+
+    rows = make_csv_rows(n_testcases, n_steps)
+    root = build_sample_tree(rows)
+    bench_element_to_string(root)
+    bench_cdata_repair(root)
+
+    # 変換処理そのものの比較はキャッシュを無効にして行う
+    set_text_cache_size(0)
+    bench_xml_emitter(rows)
+    bench_text_cache(rows)
+    bench_csv_decode(rows)
+    bench_testcase_model(rows, root)
+    bench_external_grouping(rows)
+    bench_xml_index(root)
+    bench_testcase_filter(rows, root)
+    bench_import_time()
+
+if __name__ == "__main__":
+    main()
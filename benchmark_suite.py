@@ -0,0 +1,281 @@
+"""合成したTestLinkデータで変換処理の性能を計測し、ベースラインと比較するベンチマーク
+
+使い方:
+    python benchmark_suite.py [--scales 1k,10k,100k] [--repeat 回数] [--output 結果.json]
+                              [--baseline ベースライン.json] [--write-baseline | --no-baseline] [--tolerance 0.25]
+
+規模（テストケース数）毎に合成したXML（sample_data.write_corpus_xml）と、それを変換したCSVを --data-dir に作成し
+（作成済みなら再利用）、各ベンチマークを別プロセスで実行して、最短の処理時間（benchmark.time_call）・スループット・
+ピークメモリをJSONで出力する。
+結果はベースラインファイルと比較し、処理時間かピークメモリが tolerance の割合を超えて
+悪化したベンチマークがあれば終了コード1で終了する。ベースラインは実行した環境でのみ意味を持つため
+リポジトリには含めない。同じマシンで最初に --write-baseline を指定して作成すること。
+ベースラインファイルがない場合や合成データが異なる場合は、比較できないため終了コード2で終了する
+（比較せずに計測だけを行う場合は --no-baseline を指定する）。
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from metrics import get_peak_rss
+from sample_data import CORPUS_VERSION
+
+# 規模の名前とテストケース数
+SCALES = {"1k": 1000, "10k": 10000, "100k": 100000}
+DEFAULT_SCALES = "1k,10k"
+DEFAULT_SEED = 1
+DEFAULT_REPEAT = 3
+# 処理時間・ピークメモリがベースラインのこの割合を超えて増えた場合に回帰とみなす
+DEFAULT_TOLERANCE = 0.25
+# これより短い処理時間の差は誤差とみなす（秒）
+MIN_REGRESSION_SECONDS = 0.02
+# 既定のベースラインファイル（このスクリプトと同じディレクトリ）
+BASELINE_FILE = "benchmark_baseline.json"
+RESULT_FORMAT_VERSION = 1
+
+def prepare_corpus(data_dir, scale, seed=DEFAULT_SEED):
+    """規模 scale の合成XMLと、それを変換したCSVのパスを返す（なければ作成する）"""
+    from xml_processor import convert_xml_file_to_csv
+    from sample_data import write_corpus_xml
+
+    os.makedirs(data_dir, exist_ok=True)
+    base = os.path.join(data_dir, f"corpus_{scale}_s{seed}_v{CORPUS_VERSION}")
+    xml_file = base + ".xml"
+    csv_file = base + ".csv"
+    if not os.path.exists(csv_file):
+        print(f"合成データを作成中: {base} ...", file=sys.stderr)
+        write_corpus_xml(xml_file + ".tmp", SCALES[scale], seed)
+        os.replace(xml_file + ".tmp", xml_file)
+        convert_xml_file_to_csv(xml_file, csv_file + ".tmp")
+        os.replace(csv_file + ".tmp", csv_file)
+    return xml_file, csv_file
+
+# 各ベンチマークの準備処理。(計測する関数, 処理件数, 入力バイト数) を返す（準備の時間は計測しない）
+
+def _setup_clean_html(xml_file, csv_file, work_dir):
+    from xml_processor import clean_html, get_element_text, iter_testcases
+    from text_cache import set_text_cache_size
+
+    texts = []
+    for testcase, _ in iter_testcases(xml_file):
+        texts.append(get_element_text(testcase, "summary"))
+        texts.append(get_element_text(testcase, "preconditions"))
+        for step in testcase.iter("step"):
+            texts.append(get_element_text(step, "actions"))
+            texts.append(get_element_text(step, "expectedresults"))
+    # 関数そのものの速度を計測するため、変換結果のキャッシュは使わない
+    set_text_cache_size(0)
+    return lambda: [clean_html(text) for text in texts], len(texts), sum(len(text.encode("utf-8")) for text in texts)
+
+def _setup_text_to_html(xml_file, csv_file, work_dir):
+    from benchmark import TEXT_COLUMNS
+    from csv_reader import read_csv_file
+    from text_cache import set_text_cache_size
+    from text_utils import text_to_html
+
+    rows = read_csv_file(csv_file)
+    texts = [row[i] for row in rows[1:] for i in TEXT_COLUMNS]
+    set_text_cache_size(0)
+    return lambda: [text_to_html(text) for text in texts], len(texts), sum(len(text.encode("utf-8")) for text in texts)
+
+def _setup_element_to_string(xml_file, csv_file, work_dir):
+    from benchmark import build_sample_tree
+    from csv_reader import read_csv_file
+    from xml_utils import element_to_string
+
+    root = build_sample_tree(read_csv_file(csv_file))
+    return lambda: element_to_string(root), len(root), None
+
+def _setup_read_csv_file(xml_file, csv_file, work_dir):
+    from csv_reader import read_csv_file
+    return lambda: read_csv_file(csv_file), None, os.path.getsize(csv_file)
+
+def _setup_group_testcases(xml_file, csv_file, work_dir):
+    from csv_reader import read_csv_file, get_header_indices
+    from xml_builder import RowPlan, group_testcases
+
+    rows = read_csv_file(csv_file)
+    plan = RowPlan(get_header_indices(rows[0]))
+    return lambda: group_testcases(rows, plan), len(rows) - 1, None
+
+def _setup_xml2csv(xml_file, csv_file, work_dir):
+    from text_cache import clear_text_caches
+    from xml_processor import convert_xml_file_to_csv
+
+    output_file = os.path.join(work_dir, "output.csv")
+    def run():
+        clear_text_caches()
+        convert_xml_file_to_csv(xml_file, output_file)
+    return run, None, os.path.getsize(xml_file)
+
+def _setup_csv2xml(xml_file, csv_file, work_dir):
+    from text_cache import clear_text_caches
+    from csv_to_xml import convert_csv_to_xml
+
+    output_file = os.path.join(work_dir, "output.xml")
+    def run():
+        clear_text_caches()
+        convert_csv_to_xml(csv_file, output_file)
+    return run, None, os.path.getsize(csv_file)
+
+# ベンチマーク名と準備処理（実行順）
+BENCHMARKS = {
+    "clean_html": _setup_clean_html,
+    "text_to_html": _setup_text_to_html,
+    "element_to_string": _setup_element_to_string,
+    "read_csv_file": _setup_read_csv_file,
+    "group_testcases": _setup_group_testcases,
+    "xml2csv": _setup_xml2csv,
+    "csv2xml": _setup_csv2xml,
+}
+
+def run_benchmark(name, xml_file, csv_file, repeat):
+    """ベンチマーク name を repeat 回実行し、最短の処理時間などの結果を返す（別プロセスで呼び出す）"""
+    from benchmark import time_call
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        func, items, input_bytes = BENCHMARKS[name](xml_file, csv_file, work_dir)
+        # 入力不備などの警告は計測結果の出力に混ぜない
+        with contextlib.redirect_stdout(io.StringIO()):
+            best, _ = time_call(func, repeat=repeat)
+
+    result = {"seconds": best}
+    if items is not None:
+        result["items"] = items
+        result["items_per_sec"] = items / best if best else None
+    if input_bytes is not None:
+        result["mb_per_sec"] = input_bytes / (1024 * 1024) / best if best else None
+    peak = get_peak_rss()
+    result["peak_rss_mb"] = peak / (1024 * 1024) if peak is not None else None
+    return result
+
+def run_benchmark_process(name, xml_file, csv_file, repeat):
+    """ベンチマークを別プロセスで実行する（ピークメモリを他のベンチマークと分けて計測するため）"""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-one", name, xml_file, csv_file, str(repeat)],
+        cwd=repo_dir, capture_output=True, text=True,
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"ベンチマーク {name} の実行に失敗しました:\n{output.stderr}")
+    return json.loads(output.stdout.splitlines()[-1])
+
+def compare_with_baseline(results, baseline, tolerance):
+    """ベースラインと比較して結果を表示し、回帰したベンチマークの説明のリストを返す"""
+    regressions = []
+    for scale, benchmarks in results["results"].items():
+        for name, result in benchmarks.items():
+            base = baseline.get("results", {}).get(scale, {}).get(name)
+            if base is None:
+                continue
+            ratio = result["seconds"] / base["seconds"] if base["seconds"] else 1.0
+            line = f"{scale:>5} {name:<18} {result['seconds']:>9.3f}秒 (ベースライン {base['seconds']:.3f}秒, {ratio:.2f}倍)"
+            if ratio > 1 + tolerance and result["seconds"] - base["seconds"] > MIN_REGRESSION_SECONDS:
+                regressions.append(f"{scale} {name}: 処理時間 {base['seconds']:.3f}秒 → {result['seconds']:.3f}秒 ({ratio:.2f}倍)")
+                line += "  ← 回帰"
+            rss, base_rss = result.get("peak_rss_mb"), base.get("peak_rss_mb")
+            if rss and base_rss and rss > base_rss * (1 + tolerance):
+                regressions.append(f"{scale} {name}: ピークメモリ {base_rss:.1f}MB → {rss:.1f}MB")
+                line += "  ← メモリ増加"
+            print(line)
+    return regressions
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="合成したTestLinkデータで変換処理の性能を計測する")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help=f"計測する規模（{', '.join(SCALES)} からカンマ区切り。既定: {DEFAULT_SCALES}）")
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS), help="実行するベンチマーク（カンマ区切り。既定: すべて）")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"各ベンチマークの実行回数（最短時間を採用。既定: {DEFAULT_REPEAT}）")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="合成データの乱数シード")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "testlink_benchmark"), help="合成データを置くディレクトリ")
+    parser.add_argument("--output", default=None, help="結果を書き込むJSONファイル（省略時は標準出力）")
+    parser.add_argument("--baseline", default=None, help=f"比較するベースラインのJSONファイル（既定: このスクリプトと同じディレクトリの {BASELINE_FILE}）")
+    baseline_mode = parser.add_mutually_exclusive_group()
+    baseline_mode.add_argument("--write-baseline", "--update-baseline", dest="write_baseline", action="store_true",
+                               help="比較せずに、結果をベースラインファイルに書き込む")
+    baseline_mode.add_argument("--no-baseline", action="store_true", help="ベースラインと比較せずに計測だけを行う")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help=f"回帰とみなす悪化の割合（既定: {DEFAULT_TOLERANCE}）")
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "--run-one":
+        name, xml_file, csv_file, repeat = argv[1:5]
+        print(json.dumps(run_benchmark(name, xml_file, csv_file, int(repeat))))
+        return 0
+
+    args = build_parser().parse_args(argv)
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    names = [name.strip() for name in args.benchmarks.split(",") if name.strip()]
+    for scale in scales:
+        if scale not in SCALES:
+            print(f"エラー: 不明な規模です: {scale}", file=sys.stderr)
+            return 2
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"エラー: 不明なベンチマークです: {name}", file=sys.stderr)
+            return 2
+
+    results = {
+        "version": RESULT_FORMAT_VERSION,
+        "corpus_version": CORPUS_VERSION,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": {},
+    }
+    for scale in scales:
+        xml_file, csv_file = prepare_corpus(args.data_dir, scale, args.seed)
+        results["results"][scale] = {}
+        for name in names:
+            result = run_benchmark_process(name, xml_file, csv_file, args.repeat)
+            results["results"][scale][name] = result
+            throughput = f", {result['items_per_sec']:.0f} 件/秒" if result.get("items_per_sec") else ""
+            if result.get("mb_per_sec"):
+                throughput += f", {result['mb_per_sec']:.1f} MB/秒"
+            print(f"{scale:>5} {name:<18} {result['seconds']:>9.3f}秒{throughput}, ピークメモリ {result['peak_rss_mb']:.1f}MB", file=sys.stderr)
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    baseline_file = args.baseline or os.path.join(os.path.dirname(os.path.abspath(__file__)), BASELINE_FILE)
+    if args.write_baseline:
+        with open(baseline_file, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"ベースラインを書き込みました: {baseline_file}", file=sys.stderr)
+        return 0
+    if args.no_baseline:
+        return 0
+
+    # 比較できない場合に回帰なしとして終了すると、CIなどで性能の悪化を見逃すため失敗にする
+    if not os.path.exists(baseline_file):
+        print(f"エラー: ベースラインファイルがないため比較できません: {baseline_file}\n"
+              "このマシンで --write-baseline を指定して作成するか、比較しない場合は --no-baseline を指定してください。", file=sys.stderr)
+        return 2
+    with open(baseline_file, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("corpus_version") != CORPUS_VERSION or baseline.get("seed") != args.seed:
+        print(f"エラー: ベースラインの合成データ（バージョン・乱数シード）が異なるため比較できません: {baseline_file}\n"
+              "--write-baseline を指定して作成し直してください。", file=sys.stderr)
+        return 2
+    with contextlib.redirect_stdout(sys.stderr):
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print("性能が悪化しました:\n" + "\n".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import re
+
+# 二重CDATAの閉じ側を探すために保持する最大バイト数（これを超えた二重CDATAは修正しない）
+MAX_PENDING_SIZE = 16 * 1024 * 1024
+
+# 正規表現の \s に相当する空白（UTF-8のバイト列）
+_WS = rb'(?:[\t-\r\x1c-\x20]|\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)*'
+_DOUBLE_OPEN_RE = re.compile(rb'<!\[CDATA\[' + _WS + rb'<!\[CDATA\[')
+_DOUBLE_CLOSE_RE = re.compile(rb'\]\]>' + _WS + rb'\]\]>')
+# 中身に ]]> を含まない二重CDATA（通常はこの形のみ）。中身は ]]> の手前までを1回の走査で読む
+_SIMPLE_DOUBLE_RE = re.compile(
+    rb'<!\[CDATA\[' + _WS + rb'<!\[CDATA\[([^\]]*(?:\](?!\]>)[^\]]*)*)\]\]>' + _WS + rb'\]\]>'
+)
+
+_CDATA_OPEN = b'<![CDATA['
+_CDATA_CLOSE = b']]>'
+_ASCII_WS = frozenset(b'\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f ')
+_MULTIBYTE_WS = (
+    b'\xc2\x85', b'\xc2\xa0', b'\xe1\x9a\x80', b'\xe2\x81\x9f', b'\xe3\x80\x80',
+) + tuple(b'\xe2\x80' + bytes([c]) for c in list(range(0x80, 0x8b)) + [0xa8, 0xa9, 0xaf])
+# チャンクの境界で途切れた可能性のある空白文字の先頭部分
+_PARTIAL_WS = (b'\xe1\x9a', b'\xe2\x80', b'\xe2\x81', b'\xe3\x80', b'\xc2', b'\xe1', b'\xe2', b'\xe3')
+
+def _rstrip_ws(buf, start, end, partial):
+    """buf[start:end] の末尾の空白を除いた終了位置を返す（partial が真なら途切れた空白文字も除く）"""
+    if partial:
+        for seq in _PARTIAL_WS:
+            if end - len(seq) >= start and buf.endswith(seq, start, end):
+                end -= len(seq)
+                break
+    while end > start:
+        if buf[end - 1] in _ASCII_WS:
+            end -= 1
+            continue
+        for seq in _MULTIBYTE_WS:
+            if end - len(seq) >= start and buf.endswith(seq, start, end):
+                end -= len(seq)
+                break
+        else:
+            return end
+    return end
+
+def _strip_partial(buf, start, end, token):
+    """buf[start:end] が token の途中（先頭の一部）で終わっていれば、その開始位置を返す。なければ end"""
+    for length in range(min(len(token) - 1, end - start), 0, -1):
+        if buf.endswith(token[:length], start, end):
+            return end - length
+    return end
+
+def _pending_open_start(buf, start):
+    """buf の末尾に、続きのデータ次第で二重CDATAの開始になりうる部分があればその位置を返す。なければ len(buf)"""
+    end = len(buf)
+    partial_start = _strip_partial(buf, start, end, _CDATA_OPEN)
+    ws_end = _rstrip_ws(buf, start, partial_start, partial_start == end)
+    if ws_end - len(_CDATA_OPEN) >= start and buf.endswith(_CDATA_OPEN, start, ws_end):
+        return ws_end - len(_CDATA_OPEN)
+    return partial_start
+
+def _pending_close_start(buf, start):
+    """buf の末尾に、続きのデータ次第で二重CDATAの終了になりうる部分があればその位置を返す。なければ len(buf)"""
+    end = len(buf)
+    partial_start = _strip_partial(buf, start, end, _CDATA_CLOSE)
+    ws_end = _rstrip_ws(buf, start, partial_start, partial_start == end)
+    if ws_end - len(_CDATA_CLOSE) >= start and buf.endswith(_CDATA_CLOSE, start, ws_end):
+        return ws_end - len(_CDATA_CLOSE)
+    return partial_start
+
+def iter_repaired_chunks(chunks, max_pending=MAX_PENDING_SIZE):
+    """UTF-8のバイト列チャンクを順に受け取り、二重CDATAを修正したバイト列を順に返す
+
+    xml_processor.fix_double_cdata と同じ置換を、文書全体を保持せずに行う。保持するのは
+    読み込み中のチャンクと、閉じ側がまだ見つかっていない二重CDATAの部分だけで、
+    その大きさが max_pending バイトを超えた二重CDATAは修正せずにそのまま出力する。
+    DOTALLの正規表現を使わず、開始・終了の検索はそれぞれ1回の走査で行う。
+
+    読み込んだ範囲のすべての二重CDATAが中身に ]]> を含まない通常の形であれば、
+    最後の ]]> までをまとめて置換する。そうでない場合のみ、1か所ずつ開始と終了を探す。
+    """
+    buf = b""
+    pos = 0 # 二重CDATAの開始を探す位置
+    close_from = 0 # 保持中の二重CDATAの閉じ側を探す位置
+    chunks = iter(chunks)
+    eof = False
+    while not eof:
+        chunk = next(chunks, None)
+        if chunk is None:
+            eof = True
+        else:
+            buf += chunk
+
+        out = []
+        close_end = len(buf) if eof else buf.rfind(_CDATA_CLOSE) + len(_CDATA_CLOSE)
+        if close_end >= len(_CDATA_CLOSE):
+            # 置換後に二重CDATAの開始が残っていなければ、通常の形だけだったのでそのまま使う
+            fixed = _SIMPLE_DOUBLE_RE.sub(rb'<![CDATA[\1]]>', buf[:close_end])
+            if _DOUBLE_OPEN_RE.search(fixed) is None:
+                out.append(fixed)
+                buf = buf[close_end:]
+                pos = close_from = 0
+
+        start = 0 # buf のうち未出力の部分の開始位置
+        while True:
+            opening = _DOUBLE_OPEN_RE.search(buf, pos)
+            if opening is None:
+                # 末尾の開始タグになりうる部分以外を出力する
+                cut = len(buf) if eof else _pending_open_start(buf, pos)
+                out.append(buf[start:cut])
+                buf = buf[cut:]
+                pos = 0
+                break
+
+            closing = _DOUBLE_CLOSE_RE.search(buf, max(opening.end(), close_from))
+            if closing is not None:
+                out.append(buf[start:opening.start()])
+                out.append(_CDATA_OPEN)
+                out.append(buf[opening.end():closing.start()])
+                out.append(_CDATA_CLOSE)
+                start = pos = closing.end()
+                close_from = 0
+                continue
+
+            if eof:
+                # 以降に閉じ側がないため、これより後ろに修正箇所はない
+                out.append(buf[start:])
+                buf = b""
+                break
+            if len(buf) - opening.start() > max_pending:
+                # 閉じ側が見つからないまま上限を超えたため、この開始位置は修正しない
+                pos = opening.start() + 1
+                close_from = 0
+                continue
+
+            # 閉じ側を探すために開始位置以降を保持し、続きのデータを読む
+            out.append(buf[start:opening.start()])
+            buf = buf[opening.start():]
+            pos = 0
+            close_from = _pending_close_start(buf, opening.end() - opening.start())
+            break
+
+        data = b"".join(out)
+        if data:
+            yield data
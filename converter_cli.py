@@ -0,0 +1,219 @@
+"""GUIを使わずに変換するコマンドラインインターフェース
+
+使い方:
+    python converter_cli.py xml2csv <XMLファイル> [-o 出力CSV] [--encoding 文字コード] [-j 並列数] [--suite-path | --split-suites] [--id ID] [--external-id 外部ID] [--name 名前] [--suite パス] [--filter 条件] [--incremental] [--timings] [--profile 種類]
+    python converter_cli.py csv2xml <CSVファイル> [-o 出力XML] [--encoding 文字コード] [-j 並列数] [--stream [--memory-budget MB]] [--max-testcases 件数] [--max-bytes バイト数] [--filter 条件] [--incremental] [--timings] [--profile 種類]
+    python converter_cli.py index <XMLファイル> [-o 索引ファイル]
+
+tkinter を読み込まないため、CIコンテナなど画面のない環境でも実行できる。
+--timings を指定すると read / parse / transform / write などの各フェーズの処理時間と
+プロセスの最大RSS、テストケース数・スキップ数などのカウンターを標準エラー出力に表示する。
+--profile cprofile / tracemalloc を指定すると、あわせて関数毎の処理時間やメモリを確保した行を表示する。
+tracemalloc の場合は、フェーズ毎のピークメモリも表示する。
+--incremental を指定すると、出力ファイル名に .cache を付けたキャッシュファイルに
+テストケース毎の変換結果を保存し、次回以降は内容が変わったテストケースのみ変換する。
+xml2csv で --suite-path を指定すると「親テストスイート名」列に入れ子のテストスイートのパス
+（例: 親スイート/子スイート）を出力する。--split-suites を指定すると、テストスイート毎に
+別のCSVファイルを出力ディレクトリ（-o、省略時は <入力ファイル名>_suites）に書き込む。
+xml2csv で --id / --external-id / --name / --suite（それぞれ複数指定可）を指定すると、いずれかに一致する
+テストケース（--suite はそのテストスイートと下位のテストスイートのもの）だけを変換する。このとき
+XMLファイルの索引（XMLファイル名.index.json）を使い、選択したテストケースの範囲だけをパースする。
+索引がないかXMLファイルが変更されていれば作成し直す。index サブコマンドは索引の作成のみを行う。
+--filter 項目=値（または 項目!=値）を指定すると、条件に一致するテストケースだけを変換する。
+項目は id / external_id / name / suite / importance / status / exec_type / active / is_open または
+カスタムフィールド名（例: AutomationEnabled=1）。値は , 区切りで複数指定でき、いずれかに一致すればよい。
+--filter を複数指定した場合はすべての条件を満たすものを変換する（例: --filter importance=high --filter AutomationEnabled=1）。
+条件はHTMLの変換前に判定し、変換後に一致・除外したテストケース数を表示する。
+csv2xml で --max-testcases / --max-bytes を指定すると、TestLinkでインポートできる大きさの
+XMLファイル（出力ファイル名_001.xml, ...）に分割し、一覧を 出力ファイル名_manifest.json に書き込む。
+csv2xml で --stream を指定すると、CSVを逐次読み込んで変換する。同じテストケースの行が連続していないことが分かると
+最初から読み直し、--memory-budget（MB）を超える分を一時ファイルに書き出してグループ化する。
+csv2xml の警告は分類毎に最初の数件だけ表示し、すべての警告を 出力ファイル名.warnings.csv に書き込む。
+"""
+import argparse
+import os
+import sys
+import time
+
+from csv_reader import DEFAULT_INPUT_ENCODING, DEFAULT_OUTPUT_ENCODING
+from metrics import PROFILE_MODES
+
+# CSV→XML変換で出力ファイル名に付ける接尾辞
+CONVERTED_XML_SUFFIX = "_converted.xml"
+# 標準出力に表示する警告の件数（分類毎）
+WARNING_ECHO_LIMIT = 10
+# テストスイート毎にCSVを分割する場合の出力ディレクトリ名に付ける接尾辞
+SUITES_DIR_SUFFIX = "_suites"
+# --stream で行が連続していないCSVをグループ化するときに、メモリに保持する大きさの既定値（MB）
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+def get_output_path(input_file, output_dir=None):
+    """入力ファイルに対応する出力ファイルのパスを返す（GUIと同じ命名規則）"""
+    base = os.path.splitext(input_file)[0]
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    if input_file.lower().endswith(".xml"):
+        return base + ".csv"
+    return base + CONVERTED_XML_SUFFIX
+
+def get_testcase_filter(args):
+    """--filter が指定されていれば TestcaseFilter を、なければ None を返す"""
+    if not args.filters:
+        return None
+    from testcase_filter import TestcaseFilter
+    return TestcaseFilter(args.filters)
+
+def run_xml2csv(args, output_file, metrics, cache):
+    """xml2csv サブコマンド: XMLファイルをストリーミングでCSVに変換する"""
+    from xml_processor import convert_xml_file_to_csv, convert_xml_file_to_suite_csvs
+
+    index = entries = None
+    if args.ids or args.external_ids or args.names or args.suites:
+        from xml_index import XmlIndex
+        index = XmlIndex.open(args.input)
+        entries = index.select(args.ids or (), args.external_ids or (), args.names or (), args.suites or ())
+        print(f"選択したテストケース: {len(entries)} / {len(index.testcases)} 件")
+
+    if args.split_suites:
+        written = convert_xml_file_to_suite_csvs(args.input, output_file, args.jobs, args.encoding, metrics, cache=cache, index=index, entries=entries,
+                                                 testcase_filter=args.testcase_filter)
+        print(f"テストスイート毎のCSVファイル: {len(written)} 件")
+        return
+    convert_xml_file_to_csv(args.input, output_file, args.jobs, args.encoding, metrics, cache=cache, suite_path=args.suite_path, index=index, entries=entries,
+                            testcase_filter=args.testcase_filter)
+
+def run_index(args, output_file, metrics, cache):
+    """index サブコマンド: XMLファイルの索引を作成して保存する"""
+    from xml_index import XmlIndex
+
+    index = XmlIndex.build(args.input)
+    index.save(output_file)
+    print(f"テストケース: {len(index.testcases)} 件, テストスイート: {len(index.testsuites)} 件")
+
+def run_csv2xml(args, output_file, metrics, cache):
+    """csv2xml サブコマンド: CSVファイルをTestLinkインポート用XMLに変換する"""
+    from csv_to_xml import convert_csv_to_xml, stream_csv_to_xml
+    from diagnostics import ConversionDiagnostics, get_report_path
+
+    # 警告は分類毎に最初の数件だけ表示し、すべてレポートファイルに書き込む
+    diagnostics = ConversionDiagnostics(echo=WARNING_ECHO_LIMIT)
+    options = {"max_testcases": args.max_testcases, "max_bytes": args.max_bytes, "diagnostics": diagnostics, "testcase_filter": args.testcase_filter}
+    if args.stream:
+        convert = stream_csv_to_xml
+        options["memory_budget"] = args.memory_budget * 1024 * 1024
+    else:
+        convert = convert_csv_to_xml
+    convert(args.input, output_file, args.jobs, args.encoding, metrics, cache=cache, **options)
+    if diagnostics.total:
+        report_file = get_report_path(output_file)
+        diagnostics.write_report(report_file)
+        print(f"{diagnostics.format_summary()} 詳細: {report_file}")
+    if args.max_testcases or args.max_bytes:
+        from csv_to_xml import get_manifest_path
+        print(f"分割したXMLファイルの一覧: {get_manifest_path(output_file)}")
+
+def build_parser():
+    """コマンドライン引数のパーサーを作成する"""
+    parser = argparse.ArgumentParser(description="TestLink XML と CSV を相互に変換する")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("input", help="入力ファイル")
+    common.add_argument("-o", "--output", default=None, help="出力ファイル（省略時はGUIと同じ命名規則）")
+    common.add_argument("-j", "--jobs", type=int, default=None, help="テストケースを並列に変換するプロセス数（既定: 並列化しない）")
+    common.add_argument("--incremental", action="store_true", help="前回の変換結果を再利用し、内容が変わったテストケースのみ変換する")
+    common.add_argument("--timings", action="store_true", help="フェーズ毎の処理時間とプロセスの最大RSSを表示する")
+    common.add_argument("--filter", dest="filters", action="append",
+                        help="変換するテストケースの条件（項目=値 / 項目!=値。例: importance=high, AutomationEnabled=1。複数指定はすべてを満たすもの）")
+    common.add_argument("--profile", choices=PROFILE_MODES, default=None, help="cProfile または tracemalloc で計測した結果も表示する（--timings を含む）")
+
+    xml2csv = subparsers.add_parser("xml2csv", parents=[common], help="TestLink XML を CSV に変換する")
+    xml2csv.add_argument("--encoding", default=DEFAULT_OUTPUT_ENCODING, help=f"出力するCSVファイルの文字コード（cp932 / utf-8 / utf-8-sig など。既定: {DEFAULT_OUTPUT_ENCODING}）")
+    suite_options = xml2csv.add_mutually_exclusive_group()
+    suite_options.add_argument("--suite-path", action="store_true", help="親テストスイート名に入れ子のテストスイートのパスを出力する")
+    suite_options.add_argument("--split-suites", action="store_true", help="テストスイート毎に別のCSVファイルを出力する（-o は出力ディレクトリ）")
+    xml2csv.add_argument("--id", dest="ids", action="append", help="変換するテストケースの internalid（複数指定可）")
+    xml2csv.add_argument("--external-id", dest="external_ids", action="append", help="変換するテストケースの外部ID（複数指定可）")
+    xml2csv.add_argument("--name", dest="names", action="append", help="変換するテストケースの名前（複数指定可）")
+    xml2csv.add_argument("--suite", dest="suites", action="append", help="変換するテストスイートのパス（例: 親スイート/子スイート、複数指定可）")
+    xml2csv.set_defaults(func=run_xml2csv)
+
+    csv2xml = subparsers.add_parser("csv2xml", parents=[common], help="CSV を TestLink インポート用 XML に変換する")
+    csv2xml.add_argument("--encoding", default=DEFAULT_INPUT_ENCODING, help=f"CSVファイルの文字コード（auto でBOM・UTF-8・cp932 を判定。既定: {DEFAULT_INPUT_ENCODING}）")
+    csv2xml.add_argument("--stream", action="store_true", help="CSVを逐次読み込んで変換する（巨大なCSV向け）")
+    csv2xml.add_argument("--memory-budget", type=int, default=DEFAULT_MEMORY_BUDGET_MB,
+                         help=f"--stream で行が連続していないCSVをグループ化するときにメモリに保持する大きさ（MB、超える分は一時ファイルに書き出す。既定: {DEFAULT_MEMORY_BUDGET_MB}）")
+    csv2xml.add_argument("--max-testcases", type=int, default=None, help="1つのXMLファイルに出力するテストケースの最大数（超える場合は分割する）")
+    csv2xml.add_argument("--max-bytes", type=int, default=None, help="1つのXMLファイルの最大バイト数（超える場合は分割する）")
+    csv2xml.set_defaults(func=run_csv2xml)
+
+    index = subparsers.add_parser("index", help="TestLink XML の索引（テストケースのバイト位置）を作成する")
+    index.add_argument("input", help="入力ファイル")
+    index.add_argument("-o", "--output", default=None, help="索引ファイル（省略時は XMLファイル名.index.json）")
+    index.set_defaults(func=run_index, timings=False, profile=None, incremental=False, filters=None)
+
+    return parser
+
+def _file_state(path):
+    """ファイルの (更新日時, 大きさ) を返す。ファイルでなければ None"""
+    if not os.path.isfile(path):
+        return None
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.testcase_filter = get_testcase_filter(args)
+    except ValueError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 2
+
+    metrics = None
+    if args.timings or args.profile:
+        from metrics import ConversionMetrics
+        metrics = ConversionMetrics(args.profile)
+
+    output_file = args.output
+    if not output_file:
+        if args.command == "index":
+            from xml_index import get_index_path
+            output_file = get_index_path(args.input)
+        elif getattr(args, "split_suites", False):
+            output_file = os.path.splitext(args.input)[0] + SUITES_DIR_SUFFIX
+        else:
+            output_file = get_output_path(args.input)
+    cache = None
+    if args.incremental:
+        from incremental_cache import ConversionCache, get_cache_path
+        cache = ConversionCache(get_cache_path(output_file), args.command)
+
+    # 変換に失敗した場合に、この実行で作成したファイルか書き換えたファイルかを判定するため
+    previous_output = _file_state(output_file)
+    start = time.perf_counter()
+    try:
+        args.func(args, output_file, metrics, cache)
+    except Exception as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        if cache is not None:
+            # 前回のキャッシュをそのまま残す
+            cache.close()
+        # この実行で作成して途中まで書き込んだ出力ファイルは残さない。既存のファイルは削除しない
+        output_state = _file_state(output_file)
+        if output_state is not None and previous_output is None:
+            os.remove(output_file)
+        elif output_state is not None and output_state != previous_output:
+            print(f"警告: 既存の出力ファイルを途中まで書き換えたため、内容が不完全です: {output_file}", file=sys.stderr)
+        return 1
+
+    print(f"変換完了: {output_file} ({time.perf_counter() - start:.2f}秒)")
+    if args.testcase_filter is not None:
+        print(args.testcase_filter.format_stats())
+    if cache is not None:
+        print(cache.format_stats())
+    if metrics is not None:
+        print(metrics.format_report(), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
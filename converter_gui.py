@@ -0,0 +1,245 @@
+import os
+import queue
+import threading
+import tkinter as tk
+from tkinter import filedialog, messagebox
+import traceback
+
+# 変換処理モジュールは、変換する方向に応じて実行時にインポートする
+import text_cache
+from progress import ConversionProgress, ConversionCancelled
+from diagnostics import ConversionDiagnostics, get_report_path
+
+# ワーカースレッドからのメッセージを確認する間隔（ミリ秒）
+POLL_INTERVAL_MS = 100
+# 終了時に、キャンセルした変換が終わる（途中まで書き込んだ出力ファイルを削除する）のを待つ最大時間（秒）
+EXIT_JOIN_TIMEOUT = 10
+# 計測結果を書き込むファイル名の接尾辞（出力ファイル名に付ける）
+METRICS_REPORT_SUFFIX = ".metrics.txt"
+# 計測方法の表示名と ConversionMetrics の profile（プロファイルは変換が遅くなるため既定では使わない）
+PROFILE_CHOICES = {
+    "処理時間のみ": None,
+    "cProfile（関数毎の処理時間）": "cprofile",
+    "tracemalloc（メモリ）": "tracemalloc",
+}
+
+class TestLinkConverter:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("TestLink XML-CSV Converter")
+        self.root.geometry("500x420")
+        self.root.resizable(False, False)
+        self.root.protocol("WM_DELETE_WINDOW", self.exit_app)
+
+        # 変換中のジョブ（ワーカースレッドからのメッセージ用キュー、進捗、ワーカースレッドと出力ファイル）
+        self.messages = queue.Queue()
+        self.progress = None
+        self.worker = None
+        self.output_file = None
+
+        # GUI要素の作成
+        self.create_widgets()
+
+        # ステータス表示の初期化
+        self.update_status("待機中")
+
+    def create_widgets(self):
+        # 説明文ラベル
+        self.lbl_description = tk.Label(
+            self.root, 
+            text="このツールは、TestLinkからエクスポートしたテストケースのXMLファイルを\nCSV形式に変換したり、CSVファイルからTestLink用のXMLファイルに\n変換したりするためのユーティリティです。",
+            justify=tk.LEFT,
+            anchor="w",
+            pady=10
+        )
+        self.lbl_description.pack(fill=tk.X, padx=20)
+
+        # XMLからCSV変換ボタン
+        self.btn_xml_to_csv = tk.Button(self.root, text="XML→CSV変換", width=20, height=2,
+                                        command=self.process_xml_to_csv)
+        self.btn_xml_to_csv.pack(pady=10)
+
+        # CSVからXML変換ボタン
+        self.btn_csv_to_xml = tk.Button(self.root, text="CSV→XML変換", width=20, height=2,
+                                        command=self.process_csv_to_xml)
+        self.btn_csv_to_xml.pack(pady=10)
+
+        # キャンセルボタン（変換中のみ有効）
+        self.btn_cancel = tk.Button(self.root, text="キャンセル", width=20, height=2,
+                                    command=self.cancel_conversion, state=tk.DISABLED)
+        self.btn_cancel.pack(pady=10)
+
+        # 計測の有無と方法（処理時間・件数と、選んだ場合はプロファイルの結果をファイルに出力する）
+        self.measure = tk.BooleanVar(value=False)
+        self.chk_measure = tk.Checkbutton(self.root, text="処理時間を計測する（結果を .metrics.txt に出力）",
+                                          variable=self.measure)
+        self.chk_measure.pack()
+        self.frm_profile = tk.Frame(self.root)
+        self.frm_profile.pack()
+        tk.Label(self.frm_profile, text="計測方法:").pack(side=tk.LEFT)
+        self.profile_choice = tk.StringVar(value=next(iter(PROFILE_CHOICES)))
+        self.opt_profile = tk.OptionMenu(self.frm_profile, self.profile_choice, *PROFILE_CHOICES)
+        self.opt_profile.pack(side=tk.LEFT)
+
+        # 終了ボタン
+        self.btn_exit = tk.Button(self.root, text="終了", width=20, height=2,
+                                  command=self.exit_app)
+        self.btn_exit.pack(pady=10)
+
+        # ステータス表示ラベル
+        self.lbl_status = tk.Label(self.root, text="ステータス: ", anchor="w")
+        self.lbl_status.pack(fill=tk.X, padx=10, pady=10)
+
+    def update_status(self, message):
+        """ステータスメッセージを更新する"""
+        self.lbl_status.config(text=f"ステータス: {message}")
+
+    def process_xml_to_csv(self):
+        """XMLファイルをCSVに変換するプロセス"""
+        xml_file = filedialog.askopenfilename(
+            title="XMLファイルを選択してください",
+            filetypes=[("XMLファイル", "*.xml"), ("すべてのファイル", "*.*")]
+        )
+        if not xml_file:
+            self.update_status("ファイルが選択されていません")
+            return
+
+        # 出力CSVファイル名の生成
+        output_file = os.path.splitext(xml_file)[0] + ".csv"
+        self.update_status("XMLファイルを解析中...")
+        self.start_conversion(self.run_xml_to_csv, xml_file, output_file, "XML→CSV変換", "CSVファイルに変換しました")
+
+    def process_csv_to_xml(self):
+        """CSVファイルをXMLに変換するプロセス"""
+        csv_file = filedialog.askopenfilename(
+            title="CSVファイルを選択してください",
+            filetypes=[("CSVファイル", "*.csv"), ("すべてのファイル", "*.*")]
+        )
+        if not csv_file:
+            self.update_status("ファイルが選択されていません")
+            return
+
+        # 出力XMLファイル名の生成
+        output_file = os.path.splitext(csv_file)[0] + "_converted.xml"
+        self.update_status("CSVファイルを解析中...")
+        self.start_conversion(self.run_csv_to_xml, csv_file, output_file, "CSV→XML変換", "XMLファイルに変換しました")
+
+    def run_xml_to_csv(self, xml_file, output_file, progress, metrics, diagnostics):
+        """XMLからCSVへの変換処理を呼び出す（ワーカースレッドで実行）"""
+        import xml_processor
+        # ファイル全体を読み込まず、テストケース毎に逐次パース・書き込みを行う
+        xml_processor.convert_xml_file_to_csv(xml_file, output_file, metrics=metrics, progress=progress)
+
+    def run_csv_to_xml(self, csv_file, output_file, progress, metrics, diagnostics):
+        """CSVからXMLへの変換処理を呼び出す（ワーカースレッドで実行）"""
+        import csv_processor
+        csv_processor.convert_csv_to_xml(csv_file, output_file, metrics=metrics, progress=progress, diagnostics=diagnostics)
+
+    def start_conversion(self, convert, input_file, output_file, title, done_message):
+        """変換処理をワーカースレッドで開始し、進捗の確認を始める"""
+        self.progress = ConversionProgress(report=lambda status: self.messages.put(("status", status)))
+        metrics = None
+        if self.measure.get():
+            from metrics import ConversionMetrics
+            metrics = ConversionMetrics(PROFILE_CHOICES[self.profile_choice.get()])
+        self.set_running(True)
+        self.output_file = output_file
+        self.worker = threading.Thread(
+            target=self.conversion_worker,
+            args=(convert, input_file, output_file, title, done_message, self.progress, metrics),
+            daemon=True
+        )
+        self.worker.start()
+        self.root.after(POLL_INTERVAL_MS, self.poll_messages)
+
+    def conversion_worker(self, convert, input_file, output_file, title, done_message, progress, metrics):
+        """変換を実行し、結果をキューでGUIスレッドに通知する（tkinter はGUIスレッドからのみ操作する）"""
+        try:
+            text_cache.clear_text_caches()
+            # 警告はコンソールに表示せずに記録し、結果とともに表示する
+            diagnostics = ConversionDiagnostics()
+            convert(input_file, output_file, progress, metrics, diagnostics)
+            details = f"{progress.format_status()}\n{text_cache.format_text_cache_stats()}"
+            if diagnostics.total:
+                report_file = get_report_path(output_file)
+                diagnostics.write_report(report_file)
+                details += f"\n{diagnostics.format_summary()}\n詳細: {report_file}"
+            if metrics is not None:
+                report_file = output_file + METRICS_REPORT_SUFFIX
+                with open(report_file, "w", encoding="utf-8") as f:
+                    f.write(metrics.format_report())
+                details += f"\n計測結果: {report_file}"
+            self.messages.put(("done", "変換完了", f"{done_message}:\n{output_file}\n\n{details}", f"変換完了: {output_file}"))
+        except ConversionCancelled:
+            # 途中まで書き込んだ出力ファイルは残さない
+            if os.path.exists(output_file):
+                os.remove(output_file)
+            self.messages.put(("cancelled", "変換をキャンセルしました"))
+        except Exception as e:
+            error_details = traceback.format_exc()
+            self.messages.put(("error", "エラー", f"{title}中にエラーが発生しました:\n{str(e)}\n\n詳細:\n{error_details}", f"エラー: {str(e)}"))
+
+    def poll_messages(self):
+        """ワーカースレッドからのメッセージを処理する。変換が終わるまで定期的に呼び出す"""
+        while True:
+            try:
+                message = self.messages.get_nowait()
+            except queue.Empty:
+                break
+            kind = message[0]
+            if kind == "status":
+                self.update_status(message[1])
+                continue
+
+            # 変換終了
+            self.set_running(False)
+            self.progress = None
+            self.worker = None
+            if kind == "done":
+                self.update_status(message[3])
+                messagebox.showinfo(message[1], message[2])
+            elif kind == "error":
+                self.update_status(message[3])
+                messagebox.showerror(message[1], message[2])
+            else:
+                self.update_status(message[1])
+            return
+        self.root.after(POLL_INTERVAL_MS, self.poll_messages)
+
+    def set_running(self, running):
+        """変換中は変換ボタンを無効にし、キャンセルボタンを有効にする"""
+        convert_state = tk.DISABLED if running else tk.NORMAL
+        self.btn_xml_to_csv.config(state=convert_state)
+        self.btn_csv_to_xml.config(state=convert_state)
+        self.btn_cancel.config(state=tk.NORMAL if running else tk.DISABLED)
+
+    def cancel_conversion(self):
+        """変換中のジョブにキャンセルを要求する"""
+        if self.progress is not None:
+            self.progress.cancel()
+            self.btn_cancel.config(state=tk.DISABLED)
+            self.update_status("キャンセルしています...")
+
+    def exit_app(self):
+        """変換中であればキャンセルし、ワーカースレッドが終わるのを待ってから終了する"""
+        worker = self.worker
+        if worker is not None and worker.is_alive():
+            self.cancel_conversion()
+            self.root.update_idletasks()
+            worker.join(EXIT_JOIN_TIMEOUT)
+            if worker.is_alive() and os.path.exists(self.output_file):
+                # 時間内に終わらなかった場合も、途中まで書き込んだ出力ファイルは残さない
+                try:
+                    os.remove(self.output_file)
+                except OSError as e:
+                    print(f"警告: 途中まで書き込んだ出力ファイルを削除できません: {self.output_file}: {str(e)}")
+        self.root.destroy()
+
+def run_gui():
+    """GUIアプリケーションを起動する"""
+    root = tk.Tk()
+    app = TestLinkConverter(root)
+    root.mainloop()
+
+if __name__ == "__main__":
+    run_gui()
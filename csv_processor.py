@@ -3,7 +3,7 @@
 
 from text_utils import text_to_html
 from xml_utils import element_to_string
-from csv_to_xml import convert_csv_to_xml
+from csv_to_xml import convert_csv_to_xml, stream_csv_to_xml
 
 # 以下のエクスポートにより、csv_processor.convert_csv_to_xml()の呼び出しが動作する
-__all__ = ['convert_csv_to_xml', 'text_to_html', 'element_to_string']
\ No newline at end of file
+__all__ = ['convert_csv_to_xml', 'stream_csv_to_xml', 'text_to_html', 'element_to_string']
\ No newline at end of file
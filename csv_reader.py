@@ -1,26 +1,131 @@
 import csv
 import codecs
 import traceback
+from metrics import count
+from diagnostics import warn, WARN_COLUMN_COUNT
 
-def read_csv_file(csv_file):
+# 読み込むCSVファイルの文字コードを内容から判定する指定
+AUTO_ENCODING = 'auto'
+# 読み込むCSVファイルの既定の文字コード
+DEFAULT_INPUT_ENCODING = AUTO_ENCODING
+# 出力するCSVファイルの既定の文字コード（Windows版Excelで開ける cp932）
+DEFAULT_OUTPUT_ENCODING = 'cp932'
+
+# 文字コードの判定に使う最大バイト数（最初の非ASCII文字からこの範囲をデコードしてみる）
+SNIFF_SIZE = 64 * 1024
+# CSVファイルを読み込むときのバッファサイズ（この単位でまとめてデコードする）
+READ_BUFFER_SIZE = 1024 * 1024
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'), (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+def detect_encoding(csv_file):
+    """CSVファイルの文字コードを判定する（BOM → UTF-8 → cp932 の順）
+
+    BOMがなければ最初の非ASCII文字から SNIFF_SIZE バイトをUTF-8としてデコードしてみて、
+    デコードできなければ cp932（Shift_JIS にNEC特殊文字・IBM拡張文字を加えたもの）とする。
+    ASCII文字のみのファイルは UTF-8 とする。
+    """
+    with open(csv_file, 'rb') as f:
+        head = f.read(4)
+        for bom, encoding in _BOMS:
+            if head.startswith(bom):
+                return encoding
+        f.seek(0)
+        while True:
+            block = f.read(READ_BUFFER_SIZE)
+            if not block:
+                return 'utf-8'
+            if block.isascii():
+                continue
+            # ここまでASCII文字のみなので、最初の非ASCIIバイトは文字の先頭になる
+            start = next(i for i, byte in enumerate(block) if byte >= 0x80)
+            sample = block[start:start + SNIFF_SIZE]
+            if len(sample) < SNIFF_SIZE:
+                sample += f.read(SNIFF_SIZE - len(sample))
+            try:
+                sample.decode('utf-8')
+            except UnicodeDecodeError as e:
+                # 末尾で途切れた文字だけが原因なら UTF-8 とみなす
+                if not (e.reason == 'unexpected end of data' and e.start >= len(sample) - 3):
+                    return 'cp932'
+            return 'utf-8'
+
+def resolve_input_encoding(csv_file, encoding):
+    """encoding が AUTO_ENCODING（または None）ならファイルの内容から判定した文字コードを、それ以外はそのまま返す"""
+    if encoding is None or encoding == AUTO_ENCODING:
+        return detect_encoding(csv_file)
+    return encoding
+
+def _jis_fallback(error):
+    """cp932 で出力できない文字を、従来の shift_jis での表現で出力するエラーハンドラ
+
+    〜（U+301C）や ¥（U+00A5）などは shift_jis では出力できるが cp932 では出力できないため、
+    shift_jis の同じバイト列で出力する。どちらでも出力できない文字は出力しない（従来どおり）。
+    """
+    if not isinstance(error, UnicodeEncodeError):
+        raise error
+    try:
+        return error.object[error.start].encode('shift_jis'), error.start + 1
+    except UnicodeEncodeError:
+        return '', error.start + 1
+
+# cp932 で出力するときのエラーハンドラ名
+JIS_FALLBACK_ERRORS = 'testlink_jis_fallback'
+codecs.register_error(JIS_FALLBACK_ERRORS, _jis_fallback)
+
+def open_csv_output(csv_file, encoding=DEFAULT_OUTPUT_ENCODING, mode='w'):
+    """CSVファイルを書き込み用に開く（csv.writer に渡す）
+
+    cp932 の場合、cp932 にない文字は shift_jis での表現で出力するため、従来の shift_jis の出力で
+    失われていなかった文字は失われない。出力できない文字は従来どおり出力しない。
+    """
+    errors = JIS_FALLBACK_ERRORS if codecs.lookup(encoding).name == 'cp932' else 'ignore'
+    return open(csv_file, mode, encoding=encoding, errors=errors, newline='')
+
+def iter_csv_rows(csv_file, encoding=DEFAULT_INPUT_ENCODING, metrics=None, diagnostics=None):
+    """CSVファイルを逐次読み込み、ヘッダー行に続けてデータ行を1行ずつ返す
+
+    encoding が AUTO_ENCODING の場合は detect_encoding で文字コードを判定する。
+    デコードは READ_BUFFER_SIZE バイト単位でまとめて行い、デコードできないバイトは置換文字にする。
+    metrics を指定すると、読み込んだ行数（csv_rows）とスキップした行数（skipped_rows）を記録する。
+    diagnostics（ConversionDiagnostics）を指定すると、警告を表示せずに記録する。
+    """
+    encoding = resolve_input_encoding(csv_file, encoding)
+    with open(csv_file, 'r', encoding=encoding, errors='replace', newline='', buffering=READ_BUFFER_SIZE) as f:
+        reader = csv.reader(f)
+        try:
+            headers = next(reader)
+        except StopIteration:
+            raise ValueError("CSVファイルにヘッダー行がありません")
+        yield headers
+        line_num = 1 # ヘッダーが1行目
+        skipped = 0
+        try:
+            for row in reader:
+                line_num += 1
+                if len(row) != len(headers):
+                     warn(diagnostics, WARN_COLUMN_COUNT, f"行 {line_num} の列数がヘッダー ({len(headers)}列) と異なります ({len(row)}列)。スキップします。", line_num)
+                     skipped += 1
+                     continue
+                yield row
+        finally:
+            count(metrics, "csv_rows", line_num - 1)
+            count(metrics, "skipped_rows", skipped)
+            count(metrics, "warnings", skipped)
+
+def read_csv_file(csv_file, encoding=DEFAULT_INPUT_ENCODING, metrics=None, diagnostics=None):
     """CSVファイルを読み込み、ヘッダーとデータ行を返す"""
     try:
         # CSV読み込み
         rows = []
         try:
-            with codecs.open(csv_file, 'r', 'shift_jis', errors='replace') as f:
-                reader = csv.reader(f)
-                headers = next(reader)
-                rows.append(headers)
-                line_num = 1 # ヘッダーが1行目
-                for row in reader:
-                    line_num += 1
-                    if len(row) != len(headers):
-                         print(f"警告: 行 {line_num} の列数がヘッダー ({len(headers)}列) と異なります ({len(row)}列)。スキップします。")
-                         continue
-                    rows.append(row)
-        except StopIteration:
-             raise ValueError("CSVファイルにヘッダー行がありません")
+            rows = list(iter_csv_rows(csv_file, encoding, metrics, diagnostics))
+        except ValueError:
+             raise
         except FileNotFoundError:
              raise Exception(f"CSVファイルが見つかりません: {csv_file}")
         except Exception as e:
@@ -1,41 +1,362 @@
+import itertools
+import json
+import os
 import traceback
-from csv_reader import read_csv_file, get_header_indices
-from xml_builder import group_testcases, build_testcase_element, create_root_element
-from xml_utils import element_to_string
+from csv_reader import read_csv_file, iter_csv_rows, get_header_indices, DEFAULT_INPUT_ENCODING
+from xml_builder import RowPlan, group_testcases, iter_testcase_groups, NonContiguousRowsError
+from text_utils import text_to_html
+from xml_emitter import testcase_to_xml
+from xml_utils import remove_blank_lines
+from parallel_utils import iter_chunks, ordered_parallel_map, DEFAULT_CHUNK_SIZE
+from metrics import timed_iter, phase, count, timed_function, profiling
+from progress import ConversionCancelled, advance
+from incremental_cache import data_digest
+from diagnostics import ConversionDiagnostics, warn, WARN_TESTCASE_ERROR, WARN_STREAM_RESTART
+from external_grouping import iter_external_testcase_groups, DEFAULT_MEMORY_BUDGET
+from testcase_filter import filter_testcase_groups
 
-def convert_csv_to_xml(csv_file, output_xml_file):
-    """CSVファイルを読み込み、TestLinkインポート用のXMLファイルに変換する"""
+XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+# 分割出力したXMLファイルの一覧を書き込むマニフェストファイル名の接尾辞
+MANIFEST_SUFFIX = "_manifest.json"
+
+def _count_step_warnings(testcase):
+    """アクションまたは期待結果が空のステップ（変換時に警告を表示する）の数"""
+    return sum(1 for step in testcase.steps or () if not (step.actions and step.expected))
+
+def testcase_group_to_xml(group_key, testcase, metrics=None, diagnostics=None):
+    """1テストケース（Testcase）を <testcase> のXML文字列に変換する。スキップした場合は None を返す"""
     try:
-        # CSV読み込み
-        rows = read_csv_file(csv_file)
-        headers = rows[0]
-        
-        # ヘッダーインデックスの取得
-        header_indices = get_header_indices(headers)
+        with phase(metrics, "serialize"):
+            xml_string = testcase_to_xml(testcase, timed_function(metrics, "text_to_html", text_to_html), diagnostics)
+    except Exception as e:
+        warn(diagnostics, WARN_TESTCASE_ERROR, f"テストケース {group_key} の処理中にエラーが発生しました: {str(e)}", key=group_key)
+        xml_string = None
+    if xml_string is None:
+        # 必須データの不足などで警告を表示してスキップした
+        count(metrics, "skipped_testcases")
+        count(metrics, "warnings")
+        return None
 
-        # XMLルート要素 <testcases> を作成
-        root = create_root_element()
+    if metrics is not None:
+        # アクションまたは期待結果が空のステップは testcase_to_xml が警告を表示している
+        count(metrics, "warnings", _count_step_warnings(testcase))
 
-        # テストケースをグループ化 (IDまたは名前で)
-        testcase_groups = group_testcases(rows, header_indices)
+    # 出力前に不要な空行などを削除する（オプション）
+    with phase(metrics, "cleanup"):
+        return remove_blank_lines(xml_string)
 
-        # 各グループからテストケースXML要素を生成
-        for group_key, testcase_rows in testcase_groups.items():
-            try:
-                build_testcase_element(root, testcase_rows, header_indices)
-            except Exception as e:
-                print(f"警告: テストケース {group_key} の処理中にエラーが発生しました: {str(e)}")
-                continue
+def testcase_chunk_to_xml(chunk, diagnostics=None):
+    """(グループキー, Testcase) のリストをXML文字列のリストに変換する（並列変換のワーカー用）"""
+    return [testcase_group_to_xml(group_key, testcase, diagnostics=diagnostics) for group_key, testcase in chunk]
+
+def _testcase_chunk_with_sizes(chunk, collect_warnings=False):
+    """testcase_chunk_to_xml の結果を、各テストケースの行数のリストと組にして返す（進捗表示用）
+
+    collect_warnings が真の場合は警告をワーカー内で記録し、ConversionDiagnostics も返す（なければ None）。
+    """
+    diagnostics = ConversionDiagnostics() if collect_warnings else None
+    return [testcase.row_count for _, testcase in chunk], testcase_chunk_to_xml(chunk, diagnostics), diagnostics
+
+def cached_testcase_group_to_xml(cache, group_key, testcase, metrics=None, diagnostics=None):
+    """内容が前回から変わっていなければキャッシュのXML文字列を返し、変わっていれば変換してキャッシュに加える"""
+    digest = data_digest(testcase.astuple())
+    xml_string = cache.lookup(group_key, digest)
+    if xml_string is None:
+        xml_string = testcase_group_to_xml(group_key, testcase, metrics, diagnostics)
+        # スキップしたテストケースや警告のあるステップは、次回も警告を表示するため保存しない
+        if xml_string is not None and not _count_step_warnings(testcase):
+            cache.store(group_key, digest, xml_string)
+    return xml_string
+
+def iter_testcase_xml(testcase_groups, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, cache=None, metrics=None, diagnostics=None):
+    """(グループキー, Testcase) を順に <testcase> のXML文字列へ変換して返す（スキップしたものは None）
+
+    workers が2以上の場合はテストケースを chunk_size 件ずつワーカープロセスで変換し、
+    元の順序で結果を返す。progress を指定するとテストケース毎に進捗を記録する。
+    cache（ConversionCache）を指定すると、前回から変わっていないテストケースは変換結果を再利用する。
+    この場合は変換するテストケースが少ないため並列化しない。
+    metrics を指定すると、テストケース数（testcases）と行数（rows）を記録する。
+    diagnostics（ConversionDiagnostics）を指定すると、警告を表示せずに記録する。
+    """
+    if cache is not None:
+        for group_key, testcase in testcase_groups:
+            xml_string = cached_testcase_group_to_xml(cache, group_key, testcase, metrics, diagnostics)
+            advance(progress, 1, testcase.row_count)
+            count(metrics, "testcases")
+            count(metrics, "rows", testcase.row_count)
+            yield xml_string
+        return
 
-        # XMLをファイルに書き込み
-        xml_string = '<?xml version="1.0" encoding="UTF-8"?>\n' + element_to_string(root)
-        # 出力前に不要な空行などを削除する（オプション）
-        xml_string = "\n".join(line for line in xml_string.splitlines() if line.strip())
+    if not workers or workers <= 1:
+        for group_key, testcase in testcase_groups:
+            xml_string = testcase_group_to_xml(group_key, testcase, metrics, diagnostics)
+            advance(progress, 1, testcase.row_count)
+            count(metrics, "testcases")
+            count(metrics, "rows", testcase.row_count)
+            yield xml_string
+        return
 
-        with open(output_xml_file, 'w', encoding='utf-8') as f:
+    # ワーカープロセス内の処理時間は記録できないため、件数のみ記録する
+    chunks = iter_chunks(testcase_groups, chunk_size)
+    for sizes, xml_strings, chunk_diagnostics in ordered_parallel_map(_testcase_chunk_with_sizes, chunks, workers, diagnostics is not None):
+        if chunk_diagnostics is not None:
+            diagnostics.merge(chunk_diagnostics)
+        for steps, xml_string in zip(sizes, xml_strings):
+            advance(progress, 1, steps)
+            count(metrics, "testcases")
+            count(metrics, "rows", steps)
+            if xml_string is None:
+                count(metrics, "skipped_testcases")
+                count(metrics, "warnings")
+            yield xml_string
+
+def write_testcases_xml(f, testcase_groups, workers=None, metrics=None, progress=None, cache=None, diagnostics=None):
+    """(グループキー, Testcase) を1件ずつXMLに変換し、<testcases> 文書としてファイルへ逐次書き込む"""
+    xml_strings = timed_iter(metrics, "transform", iter_testcase_xml(testcase_groups, workers, progress=progress, cache=cache, metrics=metrics, diagnostics=diagnostics))
+    with phase(metrics, "write"):
+        f.write(XML_DECLARATION)
+
+        written = 0
+        for xml_string in xml_strings:
+            if xml_string is None:
+                continue
+            f.write("<testcases>\n" if not written else "\n")
             f.write(xml_string)
+            written += 1
 
-    except ValueError as ve: # CSVフォーマットエラーなど
-        raise Exception(f"CSVファイルの処理中にエラーが発生しました: {str(ve)}\n{traceback.format_exc()}")
-    except Exception as e:
-        raise Exception(f"CSVからXMLへの変換中に予期せぬエラーが発生しました: {str(e)}\n{traceback.format_exc()}")
\ No newline at end of file
+        f.write("\n</testcases>" if written else "<testcases></testcases>")
+
+def get_chunk_path(output_xml_file, number):
+    """分割出力する number 番目（1から）のXMLファイルのパスを返す"""
+    base, ext = os.path.splitext(output_xml_file)
+    return f"{base}_{number:03d}{ext or '.xml'}"
+
+def get_manifest_path(output_xml_file):
+    """分割出力したXMLファイルの一覧を書き込むマニフェストファイルのパスを返す"""
+    return os.path.splitext(output_xml_file)[0] + MANIFEST_SUFFIX
+
+def _write_manifest(manifest_file, chunks, complete):
+    """マニフェストを書き込む（書き込み途中のファイルは残さない）"""
+    temp_path = manifest_file + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"complete": complete, "chunks": chunks}, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, manifest_file)
+
+def write_testcases_xml_chunks(output_xml_file, testcase_groups, max_testcases=None, max_bytes=None,
+                               workers=None, metrics=None, progress=None, cache=None, diagnostics=None):
+    """(グループキー, Testcase) を1件ずつXMLに変換し、複数の <testcases> 文書に分けて逐次書き込む
+
+    1つのファイルのテストケース数が max_testcases 件、またはファイルサイズ（UTF-8のバイト数）が
+    max_bytes バイトを超える前に次のファイルに切り替える。テストケースの途中では分割しないため、
+    1件で max_bytes を超えるテストケースはそれだけで1ファイルになる。
+    ファイルを書き終えるたびにマニフェスト（get_manifest_path）を更新するため、書き終えたファイルから
+    順にインポートできる。すべて書き終えるとマニフェストの complete が true になる。
+    書き込んだファイルの情報（file, testcases, bytes）のリストを返す。
+    """
+    manifest_file = get_manifest_path(output_xml_file)
+    footer = "\n</testcases>"
+    header_bytes = len(XML_DECLARATION.encode('utf-8')) + len("<testcases>\n")
+    footer_bytes = len(footer)
+    chunks = []
+    f = None
+    chunk_path = None
+    testcase_count = 0
+    size = 0
+
+    def finish_chunk():
+        f.write(footer if testcase_count else "<testcases></testcases>")
+        f.close()
+        chunks.append({"file": os.path.basename(chunk_path), "testcases": testcase_count, "bytes": os.path.getsize(chunk_path)})
+        _write_manifest(manifest_file, chunks, False)
+
+    xml_strings = timed_iter(metrics, "transform", iter_testcase_xml(testcase_groups, workers, progress=progress, cache=cache, metrics=metrics, diagnostics=diagnostics))
+    try:
+        with phase(metrics, "write"):
+            for xml_string in xml_strings:
+                if xml_string is None:
+                    continue
+                xml_bytes = len(xml_string.encode('utf-8')) if max_bytes else 0
+                if f is not None and (
+                    (max_testcases and testcase_count >= max_testcases)
+                    or (max_bytes and size + 1 + xml_bytes + footer_bytes > max_bytes)
+                ):
+                    finish_chunk()
+                    f = None
+                if f is None:
+                    chunk_path = get_chunk_path(output_xml_file, len(chunks) + 1)
+                    f = open(chunk_path, 'w', encoding='utf-8')
+                    f.write(XML_DECLARATION)
+                    f.write("<testcases>\n")
+                    testcase_count = 0
+                    size = header_bytes
+                else:
+                    f.write("\n")
+                    size += 1
+                f.write(xml_string)
+                testcase_count += 1
+                size += xml_bytes
+
+            if f is None:
+                # テストケースが1件もない場合も、空の文書を1つ出力する
+                chunk_path = get_chunk_path(output_xml_file, 1)
+                f = open(chunk_path, 'w', encoding='utf-8')
+                f.write(XML_DECLARATION)
+            finish_chunk()
+            f = None
+            _write_manifest(manifest_file, chunks, True)
+    finally:
+        if f is not None:
+            # 書き込み途中のファイルは残さない（書き終えたファイルはマニフェストに残る）
+            f.close()
+            os.remove(chunk_path)
+    return chunks
+
+def write_xml_output(output_xml_file, testcase_groups, workers=None, metrics=None, progress=None, cache=None,
+                     max_testcases=None, max_bytes=None, diagnostics=None):
+    """max_testcases か max_bytes が指定されていれば分割して、そうでなければ1つのXMLファイルに書き込む"""
+    if max_testcases or max_bytes:
+        write_testcases_xml_chunks(output_xml_file, testcase_groups, max_testcases, max_bytes, workers, metrics, progress, cache, diagnostics)
+        return
+    with open(output_xml_file, 'w', encoding='utf-8') as f:
+        write_testcases_xml(f, testcase_groups, workers, metrics, progress, cache, diagnostics)
+
+def convert_csv_to_xml(csv_file, output_xml_file, workers=None, encoding=DEFAULT_INPUT_ENCODING, metrics=None, progress=None, cache=None,
+                       max_testcases=None, max_bytes=None, diagnostics=None, testcase_filter=None):
+    """CSVファイルを読み込み、TestLinkインポート用のXMLファイルに変換する（workers が2以上ならテストケースを並列変換）
+
+    progress（ConversionProgress）を指定すると進捗を記録し、キャンセルされた場合は
+    ConversionCancelled をそのまま送出する。cache（ConversionCache）を指定すると差分変換を行い、
+    変換が成功した場合にキャッシュファイルを更新する。max_testcases か max_bytes を指定すると、
+    write_testcases_xml_chunks で複数のXMLファイルに分割して出力する。
+    diagnostics（ConversionDiagnostics）を指定すると、警告を表示せずに記録し、それを返す。
+    testcase_filter（testcase_filter.TestcaseFilter）を指定すると、グループ化したテストケースのうち
+    一致するものだけを、テキストのHTML変換やXMLへの変換の前に選ぶ。
+    """
+    with profiling(metrics):
+        try:
+            # CSV読み込み
+            with phase(metrics, "read"):
+                rows = read_csv_file(csv_file, encoding, metrics, diagnostics)
+            headers = rows[0]
+
+            with phase(metrics, "parse"):
+                # ヘッダーインデックスの取得
+                header_indices = get_header_indices(headers)
+                plan = RowPlan(header_indices)
+
+                # テストケースをグループ化 (IDまたは名前で)
+                testcase_groups = group_testcases(rows, plan, metrics, diagnostics)
+            if progress is not None:
+                progress.total_testcases = len(testcase_groups)
+
+            testcase_groups = testcase_groups.items()
+            if testcase_filter is not None:
+                testcase_groups = timed_iter(metrics, "filter", filter_testcase_groups(testcase_groups, testcase_filter, progress, metrics))
+
+            # 各グループからテストケースXML要素を生成し、ファイルに書き込み
+            write_xml_output(output_xml_file, testcase_groups, workers, metrics, progress, cache, max_testcases, max_bytes, diagnostics)
+            if cache is not None:
+                cache.save()
+            return diagnostics
+
+        except ConversionCancelled:
+            raise
+        except ValueError as ve: # CSVフォーマットエラーなど
+            raise Exception(f"CSVファイルの処理中にエラーが発生しました: {str(ve)}\n{traceback.format_exc()}")
+        except Exception as e:
+            raise Exception(f"CSVからXMLへの変換中に予期せぬエラーが発生しました: {str(e)}\n{traceback.format_exc()}")
+
+def _checkpoint(metrics, progress, cache, diagnostics, testcase_filter):
+    """変換をやり直す場合に戻すための、カウンター・進捗・キャッシュとフィルタの統計・警告の状態"""
+    return (
+        None if metrics is None else dict(metrics.counters),
+        None if progress is None else (progress.testcases, progress.steps),
+        None if cache is None else (cache.hits, cache.misses),
+        None if diagnostics is None else diagnostics.checkpoint(),
+        None if testcase_filter is None else (testcase_filter.matched, testcase_filter.excluded, dict(testcase_filter.excluded_by)),
+    )
+
+def _rollback(checkpoint, metrics, progress, cache, diagnostics, testcase_filter):
+    """_checkpoint の時点に、カウンター・進捗・キャッシュとフィルタの統計・警告を戻す"""
+    counters, progress_counts, cache_counts, diagnostics_checkpoint, filter_counts = checkpoint
+    if metrics is not None:
+        metrics.counters = dict(counters)
+    if progress is not None:
+        progress.testcases, progress.steps = progress_counts
+    if cache is not None:
+        cache.hits, cache.misses = cache_counts
+    if diagnostics is not None:
+        diagnostics.rollback(diagnostics_checkpoint)
+    if testcase_filter is not None:
+        testcase_filter.matched, testcase_filter.excluded, excluded_by = filter_counts
+        testcase_filter.excluded_by = dict(excluded_by)
+
+def _open_stream_rows(csv_file, encoding, metrics, diagnostics):
+    """CSVファイルを逐次読み込み、(行のイテレーター, RowPlan, データ行) を返す（行のイテレーターは呼び出し元で閉じる）"""
+    rows = iter_csv_rows(csv_file, encoding, metrics, diagnostics)
+    try:
+        timed_rows = timed_iter(metrics, "read", rows)
+        headers = next(timed_rows)
+        # ヘッダーインデックスの取得
+        plan = RowPlan(get_header_indices(headers))
+        first_row = next(timed_rows, None)
+        if first_row is None:
+            raise ValueError("CSVファイルにデータ行がありません")
+    except BaseException:
+        rows.close()
+        raise
+    return rows, plan, itertools.chain([first_row], timed_rows)
+
+def _write_stream_groups(output_xml_file, testcase_groups, workers, metrics, progress, cache, max_testcases, max_bytes, diagnostics, testcase_filter):
+    """stream_csv_to_xml でグループ化したテストケースを、フィルタしてXMLファイルに書き込む"""
+    testcase_groups = timed_iter(metrics, "parse", testcase_groups)
+    if testcase_filter is not None:
+        testcase_groups = timed_iter(metrics, "filter", filter_testcase_groups(testcase_groups, testcase_filter, progress, metrics))
+    write_xml_output(output_xml_file, testcase_groups, workers, metrics, progress, cache, max_testcases, max_bytes, diagnostics)
+
+def stream_csv_to_xml(csv_file, output_xml_file, workers=None, encoding=DEFAULT_INPUT_ENCODING, metrics=None, progress=None, cache=None,
+                      max_testcases=None, max_bytes=None, diagnostics=None, memory_budget=DEFAULT_MEMORY_BUDGET, temp_dir=None,
+                      testcase_filter=None):
+    """CSVファイルを逐次読み込み、テストケースのグループが終わるたびにXMLへ変換して書き込む
+
+    全行をメモリに保持しないため、巨大なCSVでもメモリ使用量が一定になり、出力もすぐに始まる。
+    出力済みのテストケースの行が再び現れた（同じテストケースの行が連続していない）場合は、
+    カウンター・進捗・フィルタの統計・警告を戻してCSVを最初から読み直し、iter_external_testcase_groups でグループ化して
+    出力し直す（メモリに保持するのは memory_budget バイトまでで、超える分は temp_dir の一時ファイルに書き出す）。
+    どちらの場合もテストケースは最初に現れた順に出力する。
+    max_testcases か max_bytes を指定すると、複数のXMLファイルに分割して出力する。
+    diagnostics（ConversionDiagnostics）を指定すると、警告を表示せずに記録し、それを返す。
+    testcase_filter は convert_csv_to_xml と同じ。
+    """
+    rows = None
+    with profiling(metrics):
+        try:
+            checkpoint = _checkpoint(metrics, progress, cache, diagnostics, testcase_filter)
+            try:
+                rows, plan, data_rows = _open_stream_rows(csv_file, encoding, metrics, diagnostics)
+                # 連続する行をテストケース単位にまとめながら書き込む
+                testcase_groups = iter_testcase_groups(data_rows, plan, metrics, diagnostics)
+                _write_stream_groups(output_xml_file, testcase_groups, workers, metrics, progress, cache, max_testcases, max_bytes, diagnostics, testcase_filter)
+            except NonContiguousRowsError:
+                # 連続していない行があれば、最初から読み直して一時ファイルでグループ化する
+                rows.close()
+                _rollback(checkpoint, metrics, progress, cache, diagnostics, testcase_filter)
+                count(metrics, "stream_restarts")
+                count(metrics, "warnings")
+                warn(diagnostics, WARN_STREAM_RESTART, "同じテストケースの行が連続していないため、最初から変換し直します。以降の警告は読み直した結果です。")
+                rows, plan, data_rows = _open_stream_rows(csv_file, encoding, metrics, diagnostics)
+                testcase_groups = iter_external_testcase_groups(data_rows, plan, memory_budget, temp_dir, metrics, diagnostics)
+                _write_stream_groups(output_xml_file, testcase_groups, workers, metrics, progress, cache, max_testcases, max_bytes, diagnostics, testcase_filter)
+            if cache is not None:
+                cache.save()
+            return diagnostics
+
+        except ConversionCancelled:
+            raise
+        except ValueError as ve: # CSVフォーマットエラーなど
+            raise Exception(f"CSVファイルの処理中にエラーが発生しました: {str(ve)}\n{traceback.format_exc()}")
+        except Exception as e:
+            raise Exception(f"CSVからXMLへの変換中に予期せぬエラーが発生しました: {str(e)}\n{traceback.format_exc()}")
+        finally:
+            if rows is not None:
+                rows.close()
@@ -0,0 +1,107 @@
+import csv
+
+# 警告の分類
+WARN_COLUMN_COUNT = "column_count" # CSVの列数がヘッダーと異なる行
+WARN_MISSING_KEY = "missing_key" # テストケースIDも名前もない行
+WARN_MISSING_REQUIRED = "missing_required" # 必須データが不足しているテストケース
+WARN_EMPTY_STEP = "empty_step" # アクションまたは期待結果が空のステップ
+WARN_TESTCASE_ERROR = "testcase_error" # 変換中にエラーが発生したテストケース
+WARN_STREAM_RESTART = "stream_restart" # 行が連続していないため最初から変換し直したCSV
+WARN_CACHE_RESET = "cache_reset" # 読み込めず作り直した差分変換のキャッシュファイル
+WARN_INDEX_RESET = "index_reset" # 読み込めず作り直す索引ファイル
+
+# 分類の表示名
+CATEGORY_LABELS = {
+    WARN_COLUMN_COUNT: "列数の不一致",
+    WARN_MISSING_KEY: "IDも名前もない行",
+    WARN_MISSING_REQUIRED: "必須データの不足",
+    WARN_EMPTY_STEP: "空のステップ",
+    WARN_TESTCASE_ERROR: "変換エラー",
+    WARN_STREAM_RESTART: "変換のやり直し",
+    WARN_CACHE_RESET: "キャッシュの作り直し",
+    WARN_INDEX_RESET: "索引の作り直し",
+}
+
+# 分類毎に記録する警告の最大件数（件数はすべて数える）
+DEFAULT_MAX_RECORDS = 1000
+# 警告レポートのファイル名に付ける接尾辞（出力ファイル名に付ける）
+REPORT_SUFFIX = ".warnings.csv"
+REPORT_HEADERS = ["分類", "行", "テストケース", "メッセージ"]
+
+def get_report_path(output_file):
+    """出力ファイルに対応する警告レポートのパスを返す"""
+    return output_file + REPORT_SUFFIX
+
+class ConversionDiagnostics:
+    """変換中の警告を、分類・行番号・テストケースのキーとともに集計する
+
+    警告毎に print() せず記録だけを行うため、警告が多いCSVでもコンソール出力で遅くならない。
+    記録する警告は分類毎に max_records 件までで、それ以降は件数のみ数える。
+    echo を指定すると、分類毎に最初の echo 件だけ従来どおり標準出力に表示する。
+    """
+
+    def __init__(self, max_records=DEFAULT_MAX_RECORDS, echo=0):
+        self.max_records = max_records
+        self.echo = echo
+        self.counts = {}
+        self.records = [] # (分類, 行番号, テストケースのキー, メッセージ)
+
+    def warn(self, category, message, line=None, key=None):
+        """警告を1件記録する"""
+        count = self.counts.get(category, 0) + 1
+        self.counts[category] = count
+        if count <= self.max_records:
+            self.records.append((category, line, key, message))
+        if count <= self.echo:
+            print(f"警告: {message}")
+        elif count == self.echo + 1 and self.echo:
+            print(f"警告: 「{CATEGORY_LABELS.get(category, category)}」の警告が {self.echo} 件を超えたため、以降は表示しません。")
+
+    def checkpoint(self):
+        """rollback() で戻すための、現在の警告の件数と記録数"""
+        return dict(self.counts), len(self.records)
+
+    def rollback(self, checkpoint):
+        """checkpoint() 以降に記録した警告を取り消す（変換をやり直す場合に使う。表示済みの警告はそのまま）"""
+        counts, records = checkpoint
+        self.counts = dict(counts)
+        del self.records[records:]
+
+    def merge(self, other):
+        """別の ConversionDiagnostics（並列変換のワーカーで記録したものなど）の警告を加える"""
+        recorded = {}
+        for category, line, key, message in other.records:
+            self.warn(category, message, line, key)
+            recorded[category] = recorded.get(category, 0) + 1
+        for category, count in other.counts.items():
+            # 件数だけ数えて記録しなかった警告
+            self.counts[category] = self.counts.get(category, 0) + count - recorded.get(category, 0)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def format_summary(self):
+        """警告の件数を分類毎に集計した文字列にする"""
+        if not self.counts:
+            return "警告: なし"
+        details = ", ".join(f"{CATEGORY_LABELS.get(category, category)} {count} 件" for category, count in self.counts.items())
+        return f"警告: {self.total} 件 ({details})"
+
+    def write_report(self, report_file):
+        """記録した警告をCSVファイルに書き込む（Excelで開けるようBOM付きUTF-8）"""
+        with open(report_file, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_HEADERS)
+            for category, line, key, message in self.records:
+                writer.writerow([CATEGORY_LABELS.get(category, category), "" if line is None else line, key or "", message])
+            for category, count in self.counts.items():
+                if count > self.max_records:
+                    writer.writerow([CATEGORY_LABELS.get(category, category), "", "", f"ほか {count - self.max_records} 件は省略しました"])
+
+def warn(diagnostics, category, message, line=None, key=None):
+    """diagnostics が指定されていれば警告を記録し、なければ従来どおり標準出力に表示する"""
+    if diagnostics is None:
+        print(f"警告: {message}")
+    else:
+        diagnostics.warn(category, message, line, key)
@@ -0,0 +1,111 @@
+import heapq
+import pickle
+import tempfile
+from operator import itemgetter
+from testcase_model import Testcase
+from xml_builder import get_group_key, new_testcase, add_record, merge_testcase_parts, COL_STEP_NUMBER, COL_EXEC_TYPE
+from metrics import phase, count
+from diagnostics import warn, WARN_MISSING_KEY
+
+# グループ化のためにメモリに保持するテストケースの見積もりサイズの上限（バイト）
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+# 1行あたりのメモリ使用量の見積もりに加える、Testcase や Step などのオブジェクトの大きさ（バイト）
+RECORD_OVERHEAD = 200
+# 一時ファイルの読み書きのバッファサイズ
+SPILL_BUFFER_SIZE = 64 * 1024
+
+def _stored_size(record):
+    """行を Testcase に加えたときに増えるメモリ使用量の見積もり（文字列は1文字2バイトとする）"""
+    return sum(map(len, record)) * 2 + RECORD_OVERHEAD
+
+def _write_run(groups, order, temp_dir):
+    """メモリ上のテストケースを最初に現れた順に並べ、一時ファイルに書き込む"""
+    run = tempfile.TemporaryFile(dir=temp_dir, buffering=SPILL_BUFFER_SIZE)
+    for group_key, testcase in sorted(groups.items(), key=lambda item: order[item[0]]):
+        pickle.dump((order[group_key], group_key, testcase), run, pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+def _read_run(run):
+    """_write_run で書き込んだ一時ファイルから (順序, グループキー, Testcase) を順に返す"""
+    try:
+        while True:
+            try:
+                yield pickle.load(run)
+            except EOFError:
+                return
+    finally:
+        run.close()
+
+def iter_external_testcase_groups(rows, plan, memory_budget=DEFAULT_MEMORY_BUDGET, temp_dir=None, metrics=None, diagnostics=None):
+    """データ行をIDまたは名前でグループ化し、(グループキー, Testcase) をテストケースが最初に現れた順に返す
+
+    group_testcases と同じ結果になるが、同じテストケースの行が連続していなくてもよく、
+    メモリに保持するテストケースの見積もりサイズが memory_budget を超えるたびに、
+    それまでのテストケースを最初に現れた順に並べて一時ファイル（temp_dir）に書き出す。
+    最後に各一時ファイルを順序でマージし、複数のファイルに分かれたテストケースは行の順に結合する。
+    メモリに保持し続けるのはグループキーと順序の対応のみ。
+    metrics を指定すると、一時ファイルへの書き出しを spill フェーズとして、ファイル数を spill_files として記録する。
+    """
+    order = {} # グループキー → 最初に現れた順序
+    groups = {}
+    runs = []
+    buffered = 0
+    try:
+        line_num = 1 # ヘッダーが1行目
+        for row in rows: # データ行のみ渡される
+            line_num += 1
+            record = plan.read(row)
+            group_key = get_group_key(record)
+            if not group_key:
+                warn(diagnostics, WARN_MISSING_KEY, f"行 {line_num} にはテストケースIDも名前もありません。スキップします。", line_num)
+                count(metrics, "skipped_rows")
+                count(metrics, "warnings")
+                continue
+
+            testcase = groups.get(group_key)
+            if testcase is None:
+                if group_key not in order:
+                    order[group_key] = len(order)
+                    testcase = new_testcase(record, plan.custom_field_names)
+                    buffered += _stored_size(record)
+                else:
+                    # 一時ファイルに書き出したテストケースの続き（1行目の項目は使わないため持たない）
+                    testcase = Testcase("", "", "", "", "", "", "", "", row_count=0)
+                    buffered += RECORD_OVERHEAD
+                groups[group_key] = testcase
+            add_record(testcase, record)
+            if record[COL_STEP_NUMBER]:
+                # ステップの行はステップ番号・アクション・期待結果を保持する
+                buffered += _stored_size(record[COL_STEP_NUMBER:COL_EXEC_TYPE])
+
+            if buffered > memory_budget:
+                with phase(metrics, "spill"):
+                    runs.append(_write_run(groups, order, temp_dir))
+                count(metrics, "spill_files")
+                groups = {}
+                buffered = 0
+
+        if not runs:
+            # 一時ファイルに書き出していなければ、辞書の順序が最初に現れた順
+            yield from groups.items()
+            return
+
+        remaining = [(order[group_key], group_key, testcase) for group_key, testcase in groups.items()]
+        remaining.sort(key=itemgetter(0))
+        groups = None
+        merged = heapq.merge(*[_read_run(run) for run in runs], remaining, key=itemgetter(0))
+        current = None
+        for index, group_key, testcase in merged:
+            # 同じ順序の部分は、先に書き出したもの（CSVで先の行）から順に現れる
+            if current is not None and current[0] == index:
+                merge_testcase_parts(current[2], testcase)
+                continue
+            if current is not None:
+                yield current[1], current[2]
+            current = (index, group_key, testcase)
+        if current is not None:
+            yield current[1], current[2]
+    finally:
+        for run in runs:
+            run.close()
@@ -0,0 +1,116 @@
+import hashlib
+import os
+from diagnostics import warn, WARN_CACHE_RESET
+
+# キャッシュファイルの形式・変換結果が変わった場合に上げる（古いキャッシュは使わない）
+CACHE_VERSION = 5
+# 出力ファイル名に付けるキャッシュファイルの接尾辞
+CACHE_SUFFIX = ".cache"
+
+def get_cache_path(output_file):
+    """出力ファイルに対応する既定のキャッシュファイルのパスを返す"""
+    return output_file + CACHE_SUFFIX
+
+# ハッシュ値の計算に使う pickle のプロトコル（Pythonのバージョンによって結果が変わらないよう固定する）
+DIGEST_PICKLE_PROTOCOL = 4
+
+def data_digest(value):
+    """リストやタプル、文字列などからなる値から、キャッシュ照合用のハッシュ値を計算する"""
+    # pickle は読み込みに時間がかかるため、差分変換を行うときだけ読み込む
+    import pickle
+    return hashlib.blake2b(pickle.dumps(value, DIGEST_PICKLE_PROTOCOL), digest_size=16).digest()
+
+def element_digest(element, *extra):
+    """XML要素（子孫を含む）のタグ・属性・テキストと extra から、キャッシュ照合用のハッシュ値を計算する
+
+    要素の後ろの空白（tail）は変換結果に影響しないため含めない。
+    """
+    return data_digest(([(e.tag, e.attrib, e.text, len(e)) for e in element.iter()], extra))
+
+class ConversionCache:
+    """テストケース単位の変換結果を、テストケースの識別子と内容のハッシュ値で保存するキャッシュ
+
+    前回の変換で保存したファイルを参照し、識別子とハッシュ値が一致するテストケースは
+    変換結果（CSV行やXML文字列）を再利用する。save() では今回の変換で使わなかった結果を削除するため、
+    削除されたテストケースの結果は残らない。kind には変換の種類（"xml2csv" など）を指定し、
+    種類やバージョンが異なるキャッシュファイルは使わない。
+
+    キャッシュファイルは SQLite のデータベースで、変換結果はテストケース毎に読み書きするため、
+    エクスポート全体の変換結果をメモリに保持しない。変更は save() まで確定しないため、
+    変換が途中で失敗した場合は前回のキャッシュがそのまま残る。
+    変換結果は pickle 形式で保存するため、信頼できない場所のファイルを指定しないこと。
+    読み込めないキャッシュファイルは作り直し、diagnostics（ConversionDiagnostics）を指定すると、その警告を記録する。
+    """
+
+    def __init__(self, path, kind, diagnostics=None):
+        self.path = path
+        self.kind = kind
+        self.diagnostics = diagnostics
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._generation = self._open()
+
+    def _open(self):
+        """キャッシュファイルを開き、今回の変換の世代番号を返す（使えないファイルは作り直す）"""
+        import sqlite3
+        try:
+            generation = self._connect()
+        except sqlite3.DatabaseError as e:
+            # 旧形式（pickle）のファイルや壊れたファイル
+            warn(self.diagnostics, WARN_CACHE_RESET, f"キャッシュファイルを読み込めません。すべてのテストケースを変換します: {str(e)}")
+            self.close()
+            os.remove(self.path)
+            generation = self._connect()
+        return generation
+
+    def _connect(self):
+        import sqlite3
+        self._connection = sqlite3.connect(self.path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        meta = dict(self._connection.execute("SELECT name, value FROM meta"))
+        if meta.get("version") != str(CACHE_VERSION) or meta.get("kind") != self.kind:
+            self._connection.execute("DROP TABLE IF EXISTS entries")
+            meta = {}
+        # created: 変換結果を保存した世代、used: 最後に使った世代
+        self._connection.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, digest BLOB, result BLOB, created INTEGER, used INTEGER)")
+        generation = int(meta.get("generation", 0)) + 1
+        self._connection.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                     [("version", str(CACHE_VERSION)), ("kind", self.kind), ("generation", str(generation))])
+        return generation
+
+    def lookup(self, key, digest):
+        """識別子とハッシュ値が一致する前回までの変換結果を返す。なければ None"""
+        import pickle
+        row = self._connection.execute("SELECT result FROM entries WHERE key = ? AND digest = ? AND created < ?",
+                                       (key, digest, self._generation)).fetchone()
+        if row is not None:
+            self.hits += 1
+            self._connection.execute("UPDATE entries SET used = ? WHERE key = ?", (self._generation, key))
+            return pickle.loads(row[0])
+        self.misses += 1
+        return None
+
+    def store(self, key, digest, result):
+        """変換結果を保存対象に加える"""
+        import pickle
+        self._connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)",
+                                 (key, digest, pickle.dumps(result, pickle.HIGHEST_PROTOCOL), self._generation, self._generation))
+
+    def save(self):
+        """今回の変換で使わなかった結果を削除し、キャッシュファイルへの変更を確定する"""
+        self._connection.execute("DELETE FROM entries WHERE used < ?", (self._generation,))
+        self._connection.commit()
+        self.close()
+
+    def close(self):
+        """キャッシュファイルを閉じる（save() していない変更は破棄する）"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def format_stats(self):
+        """再利用したテストケース数を表示用の文字列にする"""
+        total = self.hits + self.misses
+        rate = f" ({self.hits / total:.0%})" if total else ""
+        return f"差分変換: 再利用 {self.hits} / {total} 件{rate}"
@@ -0,0 +1,220 @@
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError: # Windows では resource モジュールが使えない
+    resource = None
+
+# 計測するフェーズ（表示順）
+PHASES = ("read", "cdata_repair", "parse", "spill", "filter", "transform", "clean_html", "text_to_html", "serialize", "cleanup", "write")
+# プロファイルの種類（cProfile: 関数毎の処理時間、tracemalloc: メモリを確保した行）
+PROFILE_MODES = ("cprofile", "tracemalloc")
+# プロファイル結果として表示する行数
+PROFILE_TOP = 20
+
+def get_peak_rss():
+    """プロセスのピークメモリ使用量（バイト）を返す。取得できない環境では None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB 単位、macOS はバイト単位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+class ConversionMetrics:
+    """変換処理のフェーズ毎の処理時間とピークメモリ、件数のカウンターを記録する
+
+    フェーズは入れ子にでき、内側のフェーズの時間は外側のフェーズから除かれる。
+    ストリーミング処理のように各フェーズが交互に実行される場合も、フェーズ毎の合計時間になる。
+    profile に PROFILE_MODES のいずれかを指定すると、変換処理の実行中（profiling()）に
+    cProfile または tracemalloc で計測し、結果を format_report() に含める。
+    フェーズ毎のピークメモリは tracemalloc の実行中だけ記録する（フェーズを切り替える度にピークを
+    リセットし、そのフェーズの実行中に確保されていたPythonのメモリの最大値を記録する）。
+    プロセスの最大RSSは減らないため、フェーズ毎ではなく変換全体の値として表示する。
+    テストケースを並列変換する場合、ワーカープロセス内のフェーズとプロファイルは記録されない。
+    """
+
+    def __init__(self, profile=None):
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"不明なプロファイルの種類です: {profile}")
+        self.profile = profile
+        self.phase_times = {}
+        self.phase_peak_memory = {}
+        self.counters = {}
+        self._stack = []
+        self._last = None
+        self._start = time.perf_counter()
+        self._timed_functions = {}
+        self._profiler = None
+        self._profile_depth = 0
+        self._profile_report = None
+        self._tracemalloc = None # tracemalloc の実行中のみモジュール
+        self._traced_peak = 0
+
+    def _switch(self):
+        """現在のフェーズにここまでの経過時間（tracemalloc の実行中はピークメモリも）を加算する"""
+        now = time.perf_counter()
+        peak = None
+        if self._tracemalloc is not None:
+            peak = self._tracemalloc.get_traced_memory()[1]
+            self._tracemalloc.reset_peak()
+            self._traced_peak = max(self._traced_peak, peak)
+        if self._stack:
+            name = self._stack[-1]
+            self.phase_times[name] = self.phase_times.get(name, 0.0) + (now - self._last)
+            if peak is not None and peak > self.phase_peak_memory.get(name, 0):
+                self.phase_peak_memory[name] = peak
+        self._last = now
+
+    def enter(self, name):
+        self._switch()
+        self._stack.append(name)
+
+    def exit(self):
+        self._switch()
+        self._stack.pop()
+
+    @contextmanager
+    def phase(self, name):
+        """with ブロック内の処理時間を name のフェーズとして記録する"""
+        self.enter(name)
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def timed_iter(self, name, iterable):
+        """iterable から1件取り出す処理の時間を name のフェーズとして記録しながら要素を返す"""
+        iterator = iter(iterable)
+        while True:
+            self.enter(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.exit()
+            yield item
+
+    def add(self, name, count=1):
+        """カウンター name に count を加算する"""
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    def timed_function(self, name, func):
+        """呼び出しの処理時間を name のフェーズとして記録する関数を返す"""
+        key = (name, func)
+        wrapper = self._timed_functions.get(key)
+        if wrapper is None:
+            def wrapper(*args, **kwargs):
+                self.enter(name)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.exit()
+            self._timed_functions[key] = wrapper
+        return wrapper
+
+    @contextmanager
+    def profiling(self):
+        """with ブロックの実行中、profile で指定した方法でプロファイルを取る（入れ子の場合は最も外側のみ）"""
+        if self.profile is None:
+            yield
+            return
+        self._profile_depth += 1
+        if self._profile_depth == 1:
+            self._start_profile()
+        try:
+            yield
+        finally:
+            self._profile_depth -= 1
+            if self._profile_depth == 0:
+                self._stop_profile()
+
+    def _start_profile(self):
+        if self.profile == "cprofile":
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            import tracemalloc
+            tracemalloc.start()
+            self._tracemalloc = tracemalloc
+            self._traced_peak = 0
+
+    def _stop_profile(self):
+        if self.profile == "cprofile":
+            import io
+            import pstats
+            self._profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(self._profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            self._profile_report = output.getvalue().strip()
+            self._profiler = None
+        else:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            peak = max(self._traced_peak, tracemalloc.get_traced_memory()[1])
+            self._tracemalloc = None
+            tracemalloc.stop()
+            lines = [f"tracemalloc ピーク: {peak / (1024 * 1024):.1f}MB", "確保中のメモリが多い行:"]
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP]:
+                lines.append(f"  {stat}")
+            self._profile_report = "\n".join(lines)
+
+    def format_report(self):
+        """フェーズ毎の処理時間とピークメモリ、プロセスの最大RSS、カウンター、プロファイル結果を文字列にする
+
+        フェーズ毎のピークメモリは tracemalloc で計測した場合のみ表示する（それ以外は -）。
+        """
+        lines = [f"{'フェーズ':<14}{'時間(秒)':>10}{'ピークメモリ(MB)':>18}"]
+        names = [name for name in PHASES if name in self.phase_times]
+        names += [name for name in self.phase_times if name not in PHASES]
+        for name in names:
+            peak = self.phase_peak_memory.get(name)
+            peak_text = f"{peak / (1024 * 1024):.1f}" if peak is not None else "-"
+            lines.append(f"{name:<14}{self.phase_times[name]:>10.3f}{peak_text:>18}")
+        total_peak_text = f"{self._traced_peak / (1024 * 1024):.1f}" if self.phase_peak_memory else "-"
+        lines.append(f"{'合計':<14}{time.perf_counter() - self._start:>10.3f}{total_peak_text:>18}")
+        if not self.phase_peak_memory:
+            lines.append("（フェーズ毎のピークメモリは tracemalloc でプロファイルした場合のみ計測する）")
+        rss = get_peak_rss()
+        if rss is not None:
+            lines.append(f"プロセスの最大RSS（開始からの最大値）: {rss / (1024 * 1024):.1f}MB")
+        if self.counters:
+            lines.append("")
+            for name, count in self.counters.items():
+                lines.append(f"{name:<24}{count:>10}")
+        if self._profile_report:
+            lines.append("")
+            lines.append(self._profile_report)
+        return "\n".join(lines)
+
+def timed_iter(metrics, name, iterable):
+    """metrics が指定されていればフェーズ時間を記録する iterable を、なければ iterable をそのまま返す"""
+    if metrics is None:
+        return iterable
+    return metrics.timed_iter(name, iterable)
+
+def phase(metrics, name):
+    """metrics が指定されていればフェーズ時間を記録するコンテキストを、なければ何もしないコンテキストを返す"""
+    if metrics is None:
+        return nullcontext()
+    return metrics.phase(name)
+
+def count(metrics, name, value=1):
+    """metrics が指定されていればカウンター name に value を加算する"""
+    if metrics is not None:
+        metrics.add(name, value)
+
+def timed_function(metrics, name, func):
+    """metrics が指定されていれば処理時間を記録する関数を、なければ func をそのまま返す"""
+    if metrics is None:
+        return func
+    return metrics.timed_function(name, func)
+
+def profiling(metrics):
+    """metrics が指定されていればプロファイルを取るコンテキストを、なければ何もしないコンテキストを返す"""
+    if metrics is None:
+        return nullcontext()
+    return metrics.profiling()
@@ -0,0 +1,32 @@
+import itertools
+from collections import deque
+
+# 1つのワーカー処理にまとめて渡すテストケース数
+DEFAULT_CHUNK_SIZE = 200
+
+def iter_chunks(iterable, chunk_size=DEFAULT_CHUNK_SIZE):
+    """iterable を chunk_size 件ずつのリストに分割して順に返す"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def ordered_parallel_map(func, chunks, workers, *args):
+    """各チャンクに func(chunk, *args) をワーカープロセスで適用し、結果を入力と同じ順序で返す
+
+    処理待ちのチャンクは workers の2倍までに抑えるため、入力を逐次読み込む場合も
+    メモリ使用量は一定になる。func はワーカーから呼び出せるようモジュールの関数にすること。
+    """
+    # concurrent.futures は読み込みに時間がかかるため、並列変換するときだけ読み込む
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk, *args))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
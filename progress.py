@@ -0,0 +1,87 @@
+import time
+
+# 進捗を通知する最小間隔（秒）
+DEFAULT_REPORT_INTERVAL = 0.2
+
+class ConversionCancelled(Exception):
+    """変換がキャンセルされたときに送出される例外"""
+
+class ConversionProgress:
+    """変換処理の進捗（処理したテストケース数・行数）を記録し、一定間隔で report 関数に通知する
+
+    変換を別スレッドで実行する場合は report に queue.Queue.put などスレッドセーフな関数を渡す。
+    cancel() を呼ぶと、変換処理が次に進捗を記録したときに ConversionCancelled を送出する。
+    残り時間は total_testcases（テストケース総数）か total_bytes（入力ファイルのバイト数）が
+    分かっている場合のみ表示する。
+    """
+
+    def __init__(self, report=None, total_testcases=None, interval=DEFAULT_REPORT_INTERVAL):
+        self.report = report
+        self.total_testcases = total_testcases
+        self.total_bytes = None
+        self.bytes_read = 0
+        self.testcases = 0
+        self.steps = 0 # CSVの行数（ステップ毎に1行）
+        self.interval = interval
+        self._cancelled = False
+        self._start = time.perf_counter()
+        self._last_report = self._start
+
+    def cancel(self):
+        """変換のキャンセルを要求する（別スレッドから呼び出してよい）"""
+        self._cancelled = True
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def check_cancelled(self):
+        """キャンセルが要求されていれば ConversionCancelled を送出する"""
+        if self._cancelled:
+            raise ConversionCancelled("変換がキャンセルされました")
+
+    def advance(self, testcases=1, steps=0):
+        """処理したテストケース数と行数を加算し、必要なら進捗を通知する"""
+        self.check_cancelled()
+        self.testcases += testcases
+        self.steps += steps
+        self._maybe_report()
+
+    def update_bytes(self, bytes_read):
+        """入力ファイルの読み込み済みバイト数を更新する"""
+        self.check_cancelled()
+        self.bytes_read = bytes_read
+        self._maybe_report()
+
+    def _maybe_report(self):
+        if self.report is None:
+            return
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report(self.format_status())
+
+    def get_fraction(self):
+        """処理済みの割合（0～1）を返す。総量が分からない場合は None"""
+        if self.total_testcases:
+            return min(self.testcases / self.total_testcases, 1.0)
+        if self.total_bytes:
+            return min(self.bytes_read / self.total_bytes, 1.0)
+        return None
+
+    def format_status(self):
+        """進捗をステータス表示用の文字列にする"""
+        elapsed = time.perf_counter() - self._start
+        message = f"テストケース {self.testcases} 件 / ステップ {self.steps} 行"
+        if elapsed > 0:
+            message += f" ({self.testcases / elapsed:.0f} 件/秒"
+            fraction = self.get_fraction()
+            if fraction:
+                message += f", 残り約 {elapsed * (1 - fraction) / fraction:.0f} 秒"
+            message += ")"
+        return message
+
+def advance(progress, testcases=1, steps=0):
+    """progress が指定されていれば進捗を記録する"""
+    if progress is not None:
+        progress.advance(testcases, steps)
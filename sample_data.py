@@ -0,0 +1,155 @@
+"""テスト・ベンチマーク用の合成データ（CSV行と、TestLinkエクスポート形式のXML）"""
+import csv
+import random
+
+from xml_processor import CSV_HEADERS, CUSTOM_FIELD_NAMES
+
+def csv_row(values):
+    """ヘッダー名と値の辞書から、CSV_HEADERS の順のCSV行を作る（辞書にない列は空文字）"""
+    return [values.get(header, "") for header in CSV_HEADERS]
+
+def make_testcase_rows(i, n_steps):
+    """i 番目のテストケースの n_steps 行分のCSV行を生成する"""
+    rows = []
+    for step in range(1, n_steps + 1):
+        rows.append(csv_row({
+            "ID": str(1000 + i),
+            "外部ID": str(i),
+            "バージョン": "1",
+            "テストケース名": f"テストケース {i}",
+            "サマリ（概要）": f"サマリ {i}\n・項目A\n・項目B",
+            "重要度": str(i % 3 + 1),
+            "事前条件": "画面が表示されること",
+            "ステップ番号": str(step),
+            "アクション（手順）": f"手順 {step} を実行する <入力> & 確認",
+            "期待結果": "画面が表示されること]]>",
+            "実行タイプ": "1",
+            "AutomationEnabled": str(i % 2),
+        }))
+    return rows
+
+def make_csv_rows(n_testcases, n_steps):
+    """テストケース毎に n_steps 行の合成CSV行（ヘッダー行を含む）を生成する"""
+    rows = [list(CSV_HEADERS)]
+    for i in range(n_testcases):
+        rows.extend(make_testcase_rows(i, n_steps))
+    return rows
+
+def write_csv_file(path, rows, encoding="utf-8"):
+    """CSV_HEADERS のヘッダー行に続けて、データ行 rows をCSVファイルに書き込む"""
+    with open(path, "w", encoding=encoding, newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(CSV_HEADERS)
+        writer.writerows(rows)
+
+# write_corpus_xml で生成するデータを変えた場合に上げる（作成済みのデータを使わない）
+CORPUS_VERSION = 1
+# 1テストスイートあたりのテストケース数と、入れ子のテストスイートの数
+TESTCASES_PER_SUITE = 50
+SUBSUITES_PER_SUITE = 4
+
+_WORDS = [
+    "ログイン", "画面", "ボタン", "入力欄", "メニュー", "設定", "ユーザー", "パスワード", "検索", "一覧",
+    "詳細", "保存", "削除", "確認", "ダイアログ", "エラー", "メッセージ", "表示", "選択", "更新",
+    "login", "submit", "value", "field", "option", "report", "export", "import", "admin", "session",
+]
+
+def _sentence(rng, min_words=3, max_words=12):
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(min_words, max_words)))
+
+def _html_list(rng, depth=0):
+    """入れ子を含むHTMLのリストを生成する"""
+    tag = rng.choice(("ul", "ol"))
+    items = []
+    for _ in range(rng.randint(2, 5)):
+        item = _sentence(rng)
+        if depth < 2 and rng.random() < 0.2:
+            item += _html_list(rng, depth + 1)
+        items.append(f"<li>{item}</li>")
+    return f"<{tag}>{''.join(items)}</{tag}>"
+
+def _rich_text(rng, size):
+    """TestLinkのエディタが出力する形式のHTMLを生成する（size は段落などの数の目安）"""
+    parts = []
+    for _ in range(max(1, size)):
+        kind = rng.random()
+        if kind < 0.5:
+            parts.append(f"<p>{_sentence(rng)}</p>")
+        elif kind < 0.7:
+            parts.append(f"<p>{_sentence(rng)}<br />{_sentence(rng)}</p>")
+        elif kind < 0.85:
+            parts.append(_html_list(rng))
+        elif kind < 0.95:
+            parts.append(f"<p><strong>{_sentence(rng, 1, 3)}</strong> &amp; &lt;{rng.choice(_WORDS)}&gt; &quot;{_sentence(rng, 1, 3)}&quot;</p>")
+        else:
+            parts.append(f"<p>{_sentence(rng)}&nbsp;{_sentence(rng)}</p>")
+    return "\n".join(parts)
+
+def _text_size(rng):
+    """リッチテキストの大きさ（多くは小さく、まれに大きい）"""
+    return rng.choice((1, 1, 1, 2, 2, 3, 5, 10))
+
+def _step_count(rng):
+    """ステップ数（ステップなしから多数まで）"""
+    return rng.choice((0, 1, 2, 3, 3, 5, 5, 8, 10, 15, 30))
+
+def _testcase_xml(rng, number, custom_field_names):
+    """合成したテストケース1件分のXML文字列を返す"""
+    lines = [
+        f'<testcase internalid="{100000 + number}" name="テストケース {number} {rng.choice(_WORDS)}">',
+        "<node_order><![CDATA[0]]></node_order>",
+        f"<externalid><![CDATA[{number}]]></externalid>",
+        "<version><![CDATA[1]]></version>",
+        f"<summary><![CDATA[{_rich_text(rng, _text_size(rng))}]]></summary>",
+        f"<preconditions><![CDATA[{_rich_text(rng, _text_size(rng))}]]></preconditions>",
+        f"<execution_type><![CDATA[{rng.choice('12')}]]></execution_type>",
+        f"<importance><![CDATA[{rng.choice('123')}]]></importance>",
+        f"<estimated_exec_duration>{rng.choice(('', '1', '2.5', '10'))}</estimated_exec_duration>",
+        "<status><![CDATA[1]]></status>",
+        "<is_open><![CDATA[1]]></is_open>",
+        "<active><![CDATA[1]]></active>",
+    ]
+    n_steps = _step_count(rng)
+    if n_steps:
+        lines.append("<steps>")
+        for step in range(1, n_steps + 1):
+            lines.append("<step>")
+            lines.append(f"<step_number><![CDATA[{step}]]></step_number>")
+            lines.append(f"<actions><![CDATA[{_rich_text(rng, _text_size(rng))}]]></actions>")
+            lines.append(f"<expectedresults><![CDATA[{_rich_text(rng, _text_size(rng))}]]></expectedresults>")
+            lines.append(f"<execution_type><![CDATA[{rng.choice('12')}]]></execution_type>")
+            lines.append("</step>")
+        lines.append("</steps>")
+    custom_fields = [name for name in custom_field_names if rng.random() < 0.5]
+    if custom_fields:
+        lines.append("<custom_fields>")
+        for name in custom_fields:
+            lines.append(f"<custom_field><name><![CDATA[{name}]]></name><value><![CDATA[{_sentence(rng, 1, 4)}]]></value></custom_field>")
+        lines.append("</custom_fields>")
+    lines.append("</testcase>")
+    return "\n".join(lines)
+
+def write_corpus_xml(xml_file, n_testcases, seed=1):
+    """n_testcases 件のテストケースを入れ子のテストスイートに分けた、TestLinkエクスポート形式のXMLを書き込む
+
+    同じ seed からは同じXMLを生成する（出力を変えた場合は CORPUS_VERSION を上げる）。
+    """
+    rng = random.Random(seed)
+    with open(xml_file, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<testsuite id="1" name="ベンチマーク">\n')
+        number = 0
+        suite = 0
+        while number < n_testcases:
+            suite += 1
+            f.write(f'<testsuite id="{suite * 10}" name="機能 {suite}">\n')
+            for sub in range(SUBSUITES_PER_SUITE):
+                if number >= n_testcases:
+                    break
+                f.write(f'<testsuite id="{suite * 10 + sub + 1}" name="画面 {sub + 1}">\n')
+                for _ in range(min(TESTCASES_PER_SUITE, n_testcases - number)):
+                    number += 1
+                    f.write(_testcase_xml(rng, number, CUSTOM_FIELD_NAMES))
+                    f.write("\n")
+                f.write("</testsuite>\n")
+            f.write("</testsuite>\n")
+        f.write("</testsuite>\n")
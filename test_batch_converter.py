@@ -0,0 +1,46 @@
+import pytest
+
+import batch_converter
+from sample_data import make_testcase_rows, write_csv_file
+
+GOOD_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuite name="ルート">
+<testcase internalid="1" name="ケース1"><summary>サマリ</summary></testcase>
+</testsuite>"""
+BROKEN_XML = '<?xml version="1.0" encoding="UTF-8"?>\n<testsuite name="root">\n<testcase name="a"><summary>x</summary></testcase>\n<testcase name="b">'
+
+@pytest.fixture
+def input_dir(tmp_path):
+    (tmp_path / "a_good.xml").write_text(GOOD_XML, encoding="utf-8")
+    (tmp_path / "b_broken.xml").write_text(BROKEN_XML, encoding="utf-8")
+    write_csv_file(tmp_path / "c_good.csv", make_testcase_rows(1, 2))
+    # a_good.xml の変換結果とみなされる
+    write_csv_file(tmp_path / "a_good.csv", make_testcase_rows(1, 2))
+    return tmp_path
+
+def test_collect_input_files_reports_skipped_csv(input_dir):
+    input_files, skipped = batch_converter.collect_input_files([str(input_dir)])
+    assert input_files == [str(input_dir / name) for name in ("a_good.xml", "b_broken.xml", "c_good.csv")]
+    assert skipped == [str(input_dir / "a_good.csv")]
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_failure_is_reported_and_batch_continues(input_dir, capsys, jobs):
+    output_dir = input_dir / "out"
+    assert batch_converter.main([str(input_dir), "-j", jobs, "-o", str(output_dir)]) == 1
+
+    # 失敗したファイルの出力は残らず、残りのファイルは変換される
+    assert sorted(path.name for path in output_dir.iterdir()) == ["a_good.csv", "c_good_converted.xml"]
+    out = capsys.readouterr().out
+    assert f"[失敗] {input_dir / 'b_broken.xml'}" in out
+    assert "完了: 成功 2 件 / 失敗 1 件 / スキップ 1 件 / 合計 3 件" in out
+    assert f"  失敗: {input_dir / 'b_broken.xml'}" in out
+    assert f"  スキップ: {input_dir / 'a_good.csv'}" in out
+
+def test_exit_code_is_zero_without_failures(input_dir, capsys):
+    (input_dir / "b_broken.xml").unlink()
+    assert batch_converter.main([str(input_dir), "-j", "1", "-o", str(input_dir / "out")]) == 0
+    assert "完了: 成功 2 件 / 失敗 0 件 / スキップ 1 件 / 合計 2 件" in capsys.readouterr().out
+
+def test_no_input_files(tmp_path, capsys):
+    assert batch_converter.main([str(tmp_path)]) == 1
+    assert "変換対象のファイルが見つかりません" in capsys.readouterr().out
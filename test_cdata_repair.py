@@ -0,0 +1,31 @@
+import pytest
+
+from cdata_repair import iter_repaired_chunks
+from xml_processor import fix_double_cdata
+
+# iter_repaired_chunks と fix_double_cdata の出力が一致することを確認する入力例
+CDATA_REPAIR_CORPUS = [
+    "<a><![CDATA[<![CDATA[二重]]>]]></a>",
+    "<a><![CDATA[ \n\t<![CDATA[空白付き]]>\u3000 ]]></a>",
+    "<a><![CDATA[一重]]></a><b><![CDATA[<![CDATA[x]]>]]></b>",
+    "<a><![CDATA[<![CDATA[a]]>b]]>]]></a>",
+    "<a><![CDATA[<![CDATA[閉じ側が一重]]></a>",
+    "<a><![CDATA[<![CDATA[<![CDATA[三重]]>]]>]]></a>",
+    "<![CDATA[<![CD",
+    "]]> ]]> <![CDATA[",
+    "<a><![CDATA[<![CDATA[閉じ側が一重]]></a>\n" * 50,
+]
+
+def repair_cdata_stream(text, chunk_size):
+    """text を chunk_size バイトずつに分けて iter_repaired_chunks で修正し、文字列で返す"""
+    data = text.encode("utf-8")
+    chunks = (data[i:i + chunk_size] for i in range(0, len(data), chunk_size))
+    return b"".join(iter_repaired_chunks(chunks)).decode("utf-8")
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 8, 1024])
+@pytest.mark.parametrize("text", CDATA_REPAIR_CORPUS)
+def test_streaming_repair_matches_fix_double_cdata(text, chunk_size):
+    assert repair_cdata_stream(text, chunk_size) == fix_double_cdata(text)
+
+def test_repair_double_cdata():
+    assert fix_double_cdata("<a><![CDATA[<![CDATA[二重]]>]]></a>") == "<a><![CDATA[二重]]></a>"
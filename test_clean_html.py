@@ -0,0 +1,129 @@
+import random
+import re
+
+import pytest
+
+from text_cache import set_text_cache_size, DEFAULT_CACHE_SIZE
+from text_utils import text_to_html
+from xml_processor import clean_html
+
+# (入力, 期待する出力)
+CLEAN_HTML_CASES = [
+    ("", ""),
+    ("画面が表示されること", "画面が表示されること"),
+    ("<p>画面が表示されること</p>", "画面が表示されること"),
+    ("<p> 前後の空白 </p>\n<p>2行目</p>", "前後の空白\n2行目"),
+    ("<p>1行目<br>2行目<br/>3行目<BR /></p>", "1行目\n2行目\n3行目"),
+    ("line1<br/>line2<br>  line3 &nbsp; x", "line1\nline2\n line3 x"),
+    ("<![CDATA[<p>CDATA付き</p>]]>", "CDATA付き"),
+    ("<p>手順 &amp; &lt;tag&gt; &quot;引用&quot; &#39;x&#39;</p>", "手順 & <tag> \"引用\" 'x'"),
+    ("<p>&amp;lt;b&amp;gt;二重エスケープ</p>", "&lt;b&gt;二重エスケープ"),
+    ("<p><b>太字</b> と <span style=\"color:red\">色付き</span></p>", "太字 と 色付き"),
+    ("<p class=\"x\">属性付きの段落</p>", "<p class=\"x\">属性付きの段落</p>"),
+    ("<p>閉じタグなし", "<p>閉じタグなし"),
+    ("</p>開始タグなし", "</p>開始タグなし"),
+    ("<pre>整形済み</pre>\t\tタブ\n\n\n空行", "整形済み タブ\n空行"),
+    ("　全角空白　", "全角空白"),
+    # リスト
+    ("<ol>\n<li><p>項目A</p></li>\n<li><p>項目B</p></li>\n</ol>", "・項目A\n・項目B"),
+    ("<p>前</p><ul><li>a</li><li>b</li></ul><p>後</p>", "前\n・a\n・b\n後"),
+    ("手順:<ul><li>a</li></ul>以上", "手順:\n・a\n以上"),
+    ("<ul><li><p>a</p><p>b</p></li></ul>", "・a\n・b"),
+    ("<ul><li>&amp;lt;</li></ul>", "・&lt;"),
+    ("<UL class='a'><li class=\"x\">属性付き</li></UL>", "・属性付き"),
+    ("<ul>外<li>中</li></ul>", "・中"),
+    # 入れ子のリスト
+    ("<ul><li>a<ul><li>入れ子</li></ul></li><li>b</li></ul><p>after</p>", "・a\n・・入れ子\n・b\nafter"),
+    ("<ul><li>x<ol><li>y<ul><li>z</li></ul></li></ol></li></ul>", "・x\n・・y\n・・・z"),
+    # 閉じタグのないリスト・項目、リスト外の項目
+    ("<ul><li>a<li>b</ul>", "・a\n・b"),
+    ("<ul><li>a</li>", "・a"),
+    ("<ol><li>a<ul><li>b</ol>c", "・a\n・・b\nc"),
+    ("<li>リスト外の項目</li>", "・リスト外の項目"),
+    ("<li>a<li>b", "・a\n・b"),
+    ("</ul>x</li>", "x"),
+]
+
+def legacy_clean_html(text):
+    """比較用: 以前の正規表現による clean_html（リストの内容を捨てる点以外は clean_html と同じ出力になる）"""
+    if not text:
+        return ""
+    # CDATA除去
+    text = re.sub(r'<!\[CDATA\[(.*?)\]\]>', r'\1', text, flags=re.DOTALL)
+    # <p> -> 改行
+    text = re.sub(r'<p>(.*?)</p>', lambda m: m.group(1).strip() + '\n', text, flags=re.DOTALL | re.IGNORECASE)
+    # <br> -> 改行
+    text = re.sub(r'<br\s*/?>', '\n', text, flags=re.IGNORECASE)
+    # リスト処理
+    def replace_list(match):
+        list_content = match.group(1)
+        items = re.findall(r'<li.*?>(.*?)</li>', list_content, flags=re.DOTALL | re.IGNORECASE)
+        plain_items = []
+        for item in items:
+            cleaned_item = legacy_clean_html(item).strip() # 再帰呼び出しでネストに対応
+            lines = [f"・{line.strip()}" for line in cleaned_item.split('\n') if line.strip()]
+            plain_items.extend(lines)
+        return '\n'.join(plain_items) + '\n' if plain_items else '\n'
+    text = re.sub(r'<(ul|ol).*?>(.*?)</\1>', replace_list, text, flags=re.DOTALL | re.IGNORECASE)
+    # 残った<li>処理
+    text = re.sub(r'<li.*?>(.*?)</li>', lambda m: '・' + legacy_clean_html(m.group(1)).strip() + '\n', text, flags=re.DOTALL | re.IGNORECASE)
+    # その他タグ除去
+    text = re.sub(r'<(?!\/?(p|br|ul|ol|li)\b)[^>]+>', '', text, flags=re.IGNORECASE)
+    # HTMLエンティティデコード
+    text = text.replace("&nbsp;", " ").replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&").replace("&quot;", "\"").replace("&#39;", "'")
+    # 空白・改行整理
+    text = re.sub(r'[ \t]+', ' ', text)
+    text = re.sub(r'\n\s*\n+', '\n', text)
+    return text.strip()
+
+# リストを含まないHTMLを組み立てる部品
+_PARTS = [
+    "<p>", "</p>", "<P>", "</P>", "<p class=\"x\">", "<br>", "<br/>", "<BR />", "<b>", "</b>", "<span style=\"color:red\">", "</span>",
+    "<pre>", "</pre>", "<![CDATA[", "]]>", "<!-- c -->", "&amp;", "&lt;", "&gt;", "&quot;", "&#39;", "&nbsp;", "&amp;lt;",
+    " ", "  ", "\t", "\n", "\n\n", "　", "<", ">", "&", "手順", "画面", "text", "]]", "<p", "<br",
+]
+
+def random_html(rng):
+    return "".join(rng.choice(_PARTS) for _ in range(rng.randint(0, 20)))
+
+@pytest.fixture(autouse=True)
+def no_text_cache():
+    """変換処理そのものを確認するため、変換結果のキャッシュを使わない"""
+    set_text_cache_size(0)
+    yield
+    set_text_cache_size(DEFAULT_CACHE_SIZE)
+
+@pytest.mark.parametrize("text, expected", CLEAN_HTML_CASES)
+def test_clean_html(text, expected):
+    assert clean_html(text) == expected
+
+@pytest.mark.parametrize("text", [
+    "画面が表示されること",
+    "手順\n・項目A\n・項目B\n確認する",
+    "・先頭の項目\n\n空行の後",
+    "記号 & <tag> \"引用\"",
+])
+def test_text_to_html_round_trip(text):
+    """CSV→XML で text_to_html した値は、XML→CSV の clean_html で空行を除いて元に戻る"""
+    expected = "\n".join(line.strip() for line in text.split("\n") if line.strip())
+    assert clean_html(text_to_html(text)) == expected
+
+@pytest.mark.parametrize("text, expected", [case for case in CLEAN_HTML_CASES if not re.search(r"</?(ul|ol|li)\b", case[0], re.IGNORECASE)])
+def test_matches_legacy_without_lists(text, expected):
+    assert legacy_clean_html(text) == expected
+
+def test_matches_legacy_on_random_html():
+    """リストを含まないHTMLでは、以前の実装と出力が一致する"""
+    rng = random.Random(1)
+    for _ in range(20000):
+        text = random_html(rng)
+        assert clean_html(text) == legacy_clean_html(text), text
+
+@pytest.mark.parametrize("text, legacy, current", [
+    ("<ul><li>a</li><li>b</li></ul>", "", "・a\n・b"),
+    ("<p>前</p><ol><li><p>項目</p></li></ol><p>後</p>", "前\n後", "前\n・項目\n後"),
+])
+def test_list_handling_differs_from_legacy(text, legacy, current):
+    """以前の実装はリストの内容を捨てていた（意図した出力の違い）"""
+    assert legacy_clean_html(text) == legacy
+    assert clean_html(text) == current
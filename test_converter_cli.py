@@ -0,0 +1,25 @@
+import converter_cli
+
+BROKEN_XML = '<?xml version="1.0" encoding="UTF-8"?>\n<testsuite name="root">\n<testcase name="a"><summary>x</summary></testcase>\n<testcase name="b">'
+
+def test_failed_conversion_removes_created_output(tmp_path):
+    xml_file = tmp_path / "input.xml"
+    xml_file.write_text(BROKEN_XML, encoding="utf-8")
+    output = tmp_path / "output.csv"
+
+    assert converter_cli.main(["xml2csv", str(xml_file), "-o", str(output)]) == 1
+    assert not output.exists()
+
+def test_failed_conversion_keeps_existing_file(tmp_path):
+    """出力ファイルを書き込む前に失敗した場合、既存のファイルは削除しない"""
+    csv_file = tmp_path / "input.csv"
+    csv_file.write_text("ID,テストケース名\n", encoding="utf-8")
+    output = tmp_path / "output.xml"
+    output.write_text("前回の出力", encoding="utf-8")
+
+    assert converter_cli.main(["csv2xml", str(csv_file), "-o", str(output), "--encoding", "utf-8"]) == 1
+    assert output.read_text(encoding="utf-8") == "前回の出力"
+
+    # 分割出力では output.xml 自体には書き込まない
+    assert converter_cli.main(["csv2xml", str(csv_file), "-o", str(output), "--encoding", "utf-8", "--max-testcases", "10"]) == 1
+    assert output.read_text(encoding="utf-8") == "前回の出力"
@@ -0,0 +1,36 @@
+import codecs
+import csv
+
+import pytest
+
+from csv_reader import iter_csv_rows, detect_encoding, open_csv_output
+
+ROWS = [
+    ["ID", "テストケース名", "アクション（手順）"],
+    ["1", "ログイン画面", "手順1\n・項目A\n・項目B"],
+    ["2", "\"引用\" と カンマ, を含む名前", "<p>&amp;</p>"],
+    ["3", "", "ｶﾀｶﾅ 〒 表示される"],
+]
+
+def write_rows(path, encoding):
+    with open_csv_output(str(path), encoding) as f:
+        csv.writer(f, quoting=csv.QUOTE_ALL).writerows(ROWS)
+
+@pytest.mark.parametrize("encoding, expected", [("cp932", "cp932"), ("utf-8", "utf-8"), ("utf-8-sig", "utf-8-sig")])
+def test_detect_encoding(tmp_path, encoding, expected):
+    csv_file = tmp_path / "input.csv"
+    write_rows(csv_file, encoding)
+    assert detect_encoding(str(csv_file)) == expected
+    assert list(iter_csv_rows(str(csv_file))) == ROWS
+
+def test_matches_codecs_reader(tmp_path):
+    """まとめてデコードする読み込みの結果が、codecs で1行ずつデコードする従来の読み込みと一致する"""
+    csv_file = tmp_path / "input.csv"
+    with open_csv_output(str(csv_file)) as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(ROWS[0])
+        for _ in range(2000):
+            writer.writerows(ROWS[1:])
+    with codecs.open(str(csv_file), "r", "shift_jis", errors="replace") as f:
+        expected = list(csv.reader(f))
+    assert list(iter_csv_rows(str(csv_file), "cp932")) == expected
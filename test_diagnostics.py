@@ -0,0 +1,88 @@
+import csv
+
+from diagnostics import (ConversionDiagnostics, warn, get_report_path, REPORT_HEADERS, CATEGORY_LABELS,
+                         WARN_EMPTY_STEP, WARN_MISSING_KEY, WARN_COLUMN_COUNT)
+
+def test_records_are_truncated_per_category():
+    diagnostics = ConversionDiagnostics(max_records=2)
+    for n in range(5):
+        diagnostics.warn(WARN_EMPTY_STEP, f"空 {n}", n + 2, f"ID_{n}")
+    diagnostics.warn(WARN_MISSING_KEY, "キーなし", 10)
+
+    assert diagnostics.counts == {WARN_EMPTY_STEP: 5, WARN_MISSING_KEY: 1}
+    assert diagnostics.total == 6
+    assert diagnostics.records == [
+        (WARN_EMPTY_STEP, 2, "ID_0", "空 0"), (WARN_EMPTY_STEP, 3, "ID_1", "空 1"), (WARN_MISSING_KEY, 10, None, "キーなし"),
+    ]
+    assert diagnostics.format_summary() == f"警告: 6 件 ({CATEGORY_LABELS[WARN_EMPTY_STEP]} 5 件, {CATEGORY_LABELS[WARN_MISSING_KEY]} 1 件)"
+
+def test_echo_prints_first_warnings_only(capsys):
+    diagnostics = ConversionDiagnostics(echo=2)
+    for n in range(4):
+        diagnostics.warn(WARN_EMPTY_STEP, f"空 {n}")
+    diagnostics.warn(WARN_MISSING_KEY, "キーなし")
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines == [
+        "警告: 空 0", "警告: 空 1",
+        f"警告: 「{CATEGORY_LABELS[WARN_EMPTY_STEP]}」の警告が 2 件を超えたため、以降は表示しません。",
+        "警告: キーなし",
+    ]
+    assert diagnostics.total == 5
+
+def test_no_echo_by_default(capsys):
+    diagnostics = ConversionDiagnostics()
+    diagnostics.warn(WARN_EMPTY_STEP, "空")
+    assert capsys.readouterr().out == ""
+    assert ConversionDiagnostics().format_summary() == "警告: なし"
+
+def test_warn_without_diagnostics_prints(capsys):
+    warn(None, WARN_EMPTY_STEP, "空")
+    assert capsys.readouterr().out == "警告: 空\n"
+
+def test_merge_keeps_unrecorded_counts():
+    """ワーカーで記録しきれなかった警告も件数に含める"""
+    diagnostics = ConversionDiagnostics(max_records=3)
+    diagnostics.warn(WARN_EMPTY_STEP, "親", 1)
+    worker = ConversionDiagnostics(max_records=2)
+    for n in range(4):
+        worker.warn(WARN_EMPTY_STEP, f"ワーカー {n}", n)
+    worker.warn(WARN_COLUMN_COUNT, "列数", 9)
+
+    diagnostics.merge(worker)
+    assert diagnostics.counts == {WARN_EMPTY_STEP: 5, WARN_COLUMN_COUNT: 1}
+    assert diagnostics.records == [
+        (WARN_EMPTY_STEP, 1, None, "親"), (WARN_EMPTY_STEP, 0, None, "ワーカー 0"), (WARN_EMPTY_STEP, 1, None, "ワーカー 1"),
+        (WARN_COLUMN_COUNT, 9, None, "列数"),
+    ]
+
+def test_rollback():
+    diagnostics = ConversionDiagnostics()
+    diagnostics.warn(WARN_EMPTY_STEP, "前")
+    checkpoint = diagnostics.checkpoint()
+    diagnostics.warn(WARN_EMPTY_STEP, "後")
+    diagnostics.warn(WARN_MISSING_KEY, "後")
+    diagnostics.rollback(checkpoint)
+    assert diagnostics.counts == {WARN_EMPTY_STEP: 1}
+    assert diagnostics.records == [(WARN_EMPTY_STEP, None, None, "前")]
+
+def test_write_report(tmp_path):
+    diagnostics = ConversionDiagnostics(max_records=1)
+    diagnostics.warn(WARN_EMPTY_STEP, "空, \"引用\"", 3, "ID_1")
+    diagnostics.warn(WARN_EMPTY_STEP, "空", 4, "ID_2")
+    diagnostics.warn(WARN_EMPTY_STEP, "空", 5, "ID_3")
+    diagnostics.warn(WARN_MISSING_KEY, "キーなし")
+
+    report_file = get_report_path(str(tmp_path / "output.xml"))
+    diagnostics.write_report(report_file)
+    with open(report_file, "rb") as f:
+        assert f.read(3) == b"\xef\xbb\xbf"
+    with open(report_file, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.reader(f))
+    label = CATEGORY_LABELS[WARN_EMPTY_STEP]
+    assert rows == [
+        REPORT_HEADERS,
+        [label, "3", "ID_1", "空, \"引用\""],
+        [CATEGORY_LABELS[WARN_MISSING_KEY], "", "", "キーなし"],
+        [label, "", "", "ほか 2 件は省略しました"],
+    ]
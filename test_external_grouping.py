@@ -0,0 +1,38 @@
+import itertools
+
+import pytest
+
+from csv_reader import get_header_indices
+from external_grouping import iter_external_testcase_groups
+from metrics import ConversionMetrics
+from xml_builder import RowPlan, group_testcases
+from xml_processor import CSV_HEADERS
+from sample_data import make_testcase_rows
+
+def make_rows(n_testcases, n_steps):
+    """テストケース毎の行を1行ずつ交互に並べた（同じテストケースの行が連続しない）CSV行
+
+    ステップ数はテストケース毎に変え、5件に1件は ID を空にして名前でグループ化させる。
+    """
+    id_index = CSV_HEADERS.index("ID")
+    groups = []
+    for i in range(n_testcases):
+        steps = make_testcase_rows(i, n_steps + i % 3)
+        if i % 5 == 0:
+            for row in steps:
+                row[id_index] = ""
+        groups.append(steps)
+    return [row for step_rows in itertools.zip_longest(*groups) for row in step_rows if row is not None]
+
+@pytest.mark.parametrize("memory_budget", [0, 2000, 64 * 1024 * 1024])
+def test_matches_group_testcases(tmp_path, memory_budget):
+    rows = make_rows(40, 3)
+    plan = RowPlan(get_header_indices(CSV_HEADERS))
+    expected = [(key, testcase.astuple()) for key, testcase in group_testcases([list(CSV_HEADERS)] + rows, plan).items()]
+
+    metrics = ConversionMetrics()
+    groups = iter_external_testcase_groups(iter(rows), plan, memory_budget, str(tmp_path), metrics)
+    assert [(key, testcase.astuple()) for key, testcase in groups] == expected
+    assert (metrics.counters.get("spill_files", 0) > 0) == (memory_budget < 64 * 1024 * 1024)
+    # 一時ファイルは残さない
+    assert list(tmp_path.iterdir()) == []
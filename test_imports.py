@@ -0,0 +1,21 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# モジュールと、そのモジュールを読み込んだときに読み込まれてはいけないモジュール（起動時間を短く保つため）
+IMPORT_CHECKS = {
+    "testlink_converter_tool": ["tkinter", "xml_processor", "csv_to_xml", "concurrent.futures"],
+    "converter_cli": ["tkinter", "xml_processor", "csv_to_xml", "concurrent.futures"],
+    "xml_processor": ["tkinter", "csv_to_xml", "xml_builder", "concurrent.futures", "xml.sax"],
+    "csv_to_xml": ["tkinter", "xml_processor", "concurrent.futures", "xml.sax"],
+}
+
+@pytest.mark.parametrize("module, forbidden", IMPORT_CHECKS.items())
+def test_no_unneeded_imports(module, forbidden):
+    """新しいプロセスでモジュールを読み込み、不要なモジュールが読み込まれないことを確認する"""
+    code = f"import sys\nimport {module}\nprint(*[name for name in {forbidden!r} if name in sys.modules])\n"
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run([sys.executable, "-c", code], cwd=repo_dir, capture_output=True, text=True, check=True).stdout
+    assert output.split() == []
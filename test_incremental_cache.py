@@ -0,0 +1,78 @@
+import pickle
+
+from diagnostics import ConversionDiagnostics, WARN_CACHE_RESET
+from incremental_cache import ConversionCache
+
+def test_reuse_and_remove_unused(tmp_path):
+    path = str(tmp_path / "output.xml.cache")
+    cache = ConversionCache(path, "csv2xml")
+    for key in ("A", "B"):
+        assert cache.lookup(key, b"1") is None
+        cache.store(key, b"1", f"<{key}/>")
+    cache.save()
+
+    # 内容が変わったテストケースと、削除されたテストケース
+    cache = ConversionCache(path, "csv2xml")
+    assert cache.lookup("A", b"1") == "<A/>"
+    assert cache.lookup("B", b"2") is None
+    cache.store("B", b"2", "<B2/>")
+    cache.save()
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache = ConversionCache(path, "csv2xml")
+    assert cache.lookup("B", b"2") == "<B2/>"
+    cache.save()
+    cache = ConversionCache(path, "csv2xml")
+    assert cache.lookup("A", b"1") is None
+    cache.close()
+
+def test_stored_in_same_run_is_not_reused(tmp_path):
+    cache = ConversionCache(str(tmp_path / "output.cache"), "csv2xml")
+    cache.store("A", b"1", "<A/>")
+    assert cache.lookup("A", b"1") is None
+    cache.close()
+
+def test_unsaved_changes_are_discarded(tmp_path):
+    path = str(tmp_path / "output.cache")
+    cache = ConversionCache(path, "xml2csv")
+    cache.store("A", b"1", ["row"])
+    cache.save()
+
+    cache = ConversionCache(path, "xml2csv")
+    cache.store("B", b"1", ["row"])
+    cache.close()
+
+    cache = ConversionCache(path, "xml2csv")
+    assert cache.lookup("A", b"1") == ["row"]
+    assert cache.lookup("B", b"1") is None
+    cache.close()
+
+def test_other_kind_and_old_format_are_not_used(tmp_path, capsys):
+    path = str(tmp_path / "output.cache")
+    cache = ConversionCache(path, "xml2csv")
+    cache.store("A", b"1", ["row"])
+    cache.save()
+    cache = ConversionCache(path, "csv2xml")
+    assert cache.lookup("A", b"1") is None
+    cache.close()
+
+    with open(path, "wb") as f:
+        pickle.dump({"version": 3, "kind": "csv2xml", "entries": {"A": (b"1", "<A/>")}}, f)
+    cache = ConversionCache(path, "csv2xml")
+    assert "キャッシュファイルを読み込めません" in capsys.readouterr().out
+    assert cache.lookup("A", b"1") is None
+    cache.store("A", b"1", "<A/>")
+    cache.save()
+    cache = ConversionCache(path, "csv2xml")
+    assert cache.lookup("A", b"1") == "<A/>"
+    cache.close()
+
+def test_unreadable_cache_warning_is_recorded(tmp_path, capsys):
+    path = tmp_path / "output.cache"
+    path.write_bytes(b"not a database" * 100)
+    diagnostics = ConversionDiagnostics()
+    cache = ConversionCache(str(path), "csv2xml", diagnostics)
+    assert diagnostics.counts == {WARN_CACHE_RESET: 1}
+    assert capsys.readouterr().out == ""
+    assert cache.lookup("A", b"1") is None
+    cache.close()
@@ -0,0 +1,72 @@
+import pytest
+
+from xml_processor import iter_testcases
+
+NESTED_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<testsuite id="1" name="ルート">
+<testcase internalid="1" name="直下"><summary>a</summary></testcase>
+<testsuite id="2" name="画面">
+<testcase internalid="2" name="画面1"><steps><step><step_number>1</step_number></step></steps></testcase>
+<testsuite id="3" name="子">
+<testcase internalid="3" name="子1"/>
+</testsuite>
+<testcase internalid="4" name="画面2"/>
+</testsuite>
+<testsuite id="4" name="別">
+<testcase internalid="5" name="別1"/>
+</testsuite>
+<testcase internalid="6" name="最後"/>
+</testsuite>
+"""
+
+def write_xml(tmp_path, text):
+    path = tmp_path / "testcases.xml"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+def names_and_suites(xml_file, suite_path):
+    return [(testcase.get("name"), suite) for testcase, suite in iter_testcases(xml_file, suite_path=suite_path)]
+
+def test_suite_path_with_nested_suites(tmp_path):
+    xml_file = write_xml(tmp_path, NESTED_XML)
+    assert names_and_suites(xml_file, True) == [
+        ("直下", "ルート"), ("画面1", "ルート/画面"), ("子1", "ルート/画面/子"), ("画面2", "ルート/画面"),
+        ("別1", "ルート/別"), ("最後", "ルート"),
+    ]
+
+def test_suite_name_is_root_suite(tmp_path):
+    """suite_path が偽の場合は、入れ子でもルートのテストスイート名を返す"""
+    xml_file = write_xml(tmp_path, NESTED_XML)
+    assert names_and_suites(xml_file, False) == [(name, "ルート") for name in ("直下", "画面1", "子1", "画面2", "別1", "最後")]
+
+@pytest.mark.parametrize("suite_path", [False, True])
+def test_testcases_root(tmp_path, suite_path):
+    """テストスイートのない <testcases> 直下のテストケース"""
+    xml_file = write_xml(tmp_path, '<?xml version="1.0"?>\n<testcases><testcase name="a"/><testcase name="b"/></testcases>')
+    assert names_and_suites(xml_file, suite_path) == [("a", ""), ("b", "")]
+
+def test_testcase_as_root(tmp_path):
+    xml_file = write_xml(tmp_path, '<testcase name="単独"><summary>a</summary></testcase>')
+    assert names_and_suites(xml_file, False) == [("単独", "")]
+
+def test_unexpected_root_uses_first_suite_name(tmp_path):
+    xml_file = write_xml(tmp_path, '<export><testsuite name="A"><testcase name="a"/></testsuite><testsuite name="B"><testcase name="b"/></testsuite></export>')
+    assert names_and_suites(xml_file, False) == [("a", "A"), ("b", "A")]
+    assert names_and_suites(xml_file, True) == [("a", "A"), ("b", "B")]
+
+def test_elements_are_cleared_while_streaming(tmp_path):
+    xml_file = write_xml(tmp_path, NESTED_XML)
+    previous = []
+    for testcase, _ in iter_testcases(xml_file):
+        # 返した要素は、次の要素を返す前に内容を消して親から切り離している
+        for elem in previous:
+            assert len(elem) == 0 and elem.attrib == {} and elem.text is None
+        if testcase.get("name") == "画面1":
+            assert len(testcase.find("steps")) == 1
+        previous.append(testcase)
+    assert len(previous) == 6
+
+def test_parse_error(tmp_path):
+    xml_file = write_xml(tmp_path, '<testsuite name="A"><testcase name="a"></testsuite>')
+    with pytest.raises(ValueError, match="XMLの解析に失敗しました"):
+        list(iter_testcases(xml_file))
@@ -0,0 +1,21 @@
+from metrics import ConversionMetrics
+
+def test_phase_peak_memory_is_per_phase():
+    """フェーズ毎のピークメモリは、そのフェーズの実行中に確保したメモリだけを反映する"""
+    metrics = ConversionMetrics("tracemalloc")
+    with metrics.profiling():
+        with metrics.phase("parse"):
+            data = bytearray(8 * 1024 * 1024)
+            del data
+        with metrics.phase("write"):
+            data = bytearray(1024)
+            del data
+    assert metrics.phase_peak_memory["parse"] >= 8 * 1024 * 1024
+    assert metrics.phase_peak_memory["write"] < 1024 * 1024
+
+def test_no_phase_peak_memory_without_tracemalloc():
+    metrics = ConversionMetrics()
+    with metrics.phase("parse"):
+        pass
+    assert metrics.phase_peak_memory == {}
+    assert "tracemalloc でプロファイルした場合のみ" in metrics.format_report()
@@ -0,0 +1,44 @@
+import pytest
+
+from csv_to_xml import convert_csv_to_xml, stream_csv_to_xml
+from diagnostics import ConversionDiagnostics
+from parallel_utils import DEFAULT_CHUNK_SIZE
+from xml_processor import CSV_HEADERS, convert_xml_file_to_csv
+from sample_data import make_csv_rows, write_csv_file
+
+# ワーカーに複数のチャンクを渡すよう、DEFAULT_CHUNK_SIZE より多くのテストケースにする
+N_TESTCASES = DEFAULT_CHUNK_SIZE * 2 + 50
+
+@pytest.fixture(scope="module")
+def csv_file(tmp_path_factory):
+    rows = make_csv_rows(N_TESTCASES, 2)
+    # 警告（期待結果が空のステップ）がチャンクをまたいで出るようにする
+    expected_idx = CSV_HEADERS.index("期待結果")
+    for row in rows[1::97]:
+        row[expected_idx] = ""
+    path = tmp_path_factory.mktemp("parallel") / "input.csv"
+    write_csv_file(path, rows[1:])
+    return path
+
+@pytest.mark.parametrize("convert", [convert_csv_to_xml, stream_csv_to_xml])
+@pytest.mark.parametrize("max_testcases", [None, 150])
+def test_csv_to_xml_workers_output_is_identical(tmp_path, csv_file, convert, max_testcases):
+    outputs = {}
+    for workers in (1, 2):
+        output_dir = tmp_path / f"workers{workers}"
+        output_dir.mkdir()
+        diagnostics = ConversionDiagnostics()
+        convert(str(csv_file), str(output_dir / "output.xml"), workers=workers, encoding="utf-8", max_testcases=max_testcases,
+                diagnostics=diagnostics)
+        files = {path.name: path.read_bytes() for path in sorted(output_dir.iterdir())}
+        outputs[workers] = files, diagnostics.records
+
+    assert outputs[2] == outputs[1]
+    assert outputs[1][1]
+
+def test_xml_to_csv_workers_output_is_identical(tmp_path, csv_file):
+    xml_file = tmp_path / "input.xml"
+    convert_csv_to_xml(str(csv_file), str(xml_file), encoding="utf-8")
+    for workers in (1, 2):
+        convert_xml_file_to_csv(str(xml_file), str(tmp_path / f"workers{workers}.csv"), workers=workers)
+    assert (tmp_path / "workers2.csv").read_bytes() == (tmp_path / "workers1.csv").read_bytes()
@@ -0,0 +1,147 @@
+import queue
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import progress as progress_module
+from csv_to_xml import convert_csv_to_xml
+from progress import ConversionProgress, ConversionCancelled
+from sample_data import make_csv_rows, write_csv_file
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def perf_counter(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(progress_module, "time", clock)
+    return clock
+
+def test_rate_and_remaining_time_from_testcases(clock):
+    progress = ConversionProgress(total_testcases=200)
+    clock.now += 10
+    progress.advance(50, 120)
+    assert progress.get_fraction() == 0.25
+    assert progress.format_status() == "テストケース 50 件 / ステップ 120 行 (5 件/秒, 残り約 30 秒)"
+
+def test_remaining_time_from_bytes(clock):
+    progress = ConversionProgress()
+    progress.total_bytes = 1000
+    clock.now += 4
+    progress.update_bytes(800)
+    progress.advance(20)
+    assert progress.get_fraction() == 0.8
+    assert progress.format_status() == "テストケース 20 件 / ステップ 0 行 (5 件/秒, 残り約 1 秒)"
+
+def test_no_remaining_time_without_total(clock):
+    progress = ConversionProgress()
+    assert progress.format_status() == "テストケース 0 件 / ステップ 0 行"
+    clock.now += 2
+    progress.advance(10, 10)
+    assert progress.get_fraction() is None
+    assert progress.format_status() == "テストケース 10 件 / ステップ 10 行 (5 件/秒)"
+
+def test_report_interval(clock):
+    reports = []
+    progress = ConversionProgress(report=reports.append, interval=1.0)
+    progress.advance()
+    clock.now += 0.5
+    progress.advance()
+    assert reports == []
+    clock.now += 0.5
+    progress.advance()
+    assert len(reports) == 1
+    progress.advance()
+    assert len(reports) == 1
+
+def test_cancel():
+    progress = ConversionProgress()
+    progress.advance()
+    progress.cancel()
+    assert progress.cancelled
+    with pytest.raises(ConversionCancelled):
+        progress.advance()
+    with pytest.raises(ConversionCancelled):
+        progress.update_bytes(10)
+    assert progress.testcases == 1
+
+def test_cancel_stops_conversion(tmp_path):
+    csv_file = tmp_path / "input.csv"
+    write_csv_file(csv_file, make_csv_rows(10, 2)[1:])
+    progress = ConversionProgress(interval=0)
+    # 最初のテストケースの進捗を通知したときにキャンセルする
+    progress.report = lambda status: progress.cancel()
+
+    with pytest.raises(ConversionCancelled):
+        convert_csv_to_xml(str(csv_file), str(tmp_path / "output.xml"), encoding="utf-8", progress=progress)
+    assert progress.testcases == 1
+
+def make_gui(progress, output_file):
+    """exit_app・conversion_worker が使う属性だけを持つ、TestLinkConverter の代わり"""
+    destroyed = []
+    gui = SimpleNamespace(
+        progress=progress, output_file=str(output_file), messages=queue.Queue(), worker=None,
+        root=SimpleNamespace(update_idletasks=lambda: None, destroy=lambda: destroyed.append(True)),
+    )
+    gui.cancel_conversion = progress.cancel
+    return gui, destroyed
+
+def test_exit_app_waits_for_cancelled_worker(tmp_path):
+    converter_gui = pytest.importorskip("converter_gui")
+    output_file = tmp_path / "output.xml"
+    progress = ConversionProgress()
+    started = threading.Event()
+    seen_at_exit = []
+
+    def convert(input_file, output_file, progress, metrics, diagnostics):
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write("<testcases>")
+            started.set()
+            while True:
+                progress.advance()
+                time.sleep(0.01)
+
+    gui, destroyed = make_gui(progress, output_file)
+    gui.root.destroy = lambda: (seen_at_exit.append(output_file.exists()), destroyed.append(True))
+    gui.worker = threading.Thread(target=converter_gui.TestLinkConverter.conversion_worker,
+                                  args=(gui, convert, "input.csv", str(output_file), "CSV→XML変換", "完了", progress, None))
+    gui.worker.start()
+    started.wait(5)
+
+    converter_gui.TestLinkConverter.exit_app(gui)
+    assert not gui.worker.is_alive()
+    # ウィンドウを閉じる前に、ワーカーが途中まで書き込んだ出力ファイルを削除している
+    assert seen_at_exit == [False]
+    assert gui.messages.get_nowait()[0] == "cancelled"
+
+def test_exit_app_removes_output_if_worker_does_not_stop(tmp_path, monkeypatch):
+    converter_gui = pytest.importorskip("converter_gui")
+    monkeypatch.setattr(converter_gui, "EXIT_JOIN_TIMEOUT", 0.05)
+    output_file = tmp_path / "output.xml"
+    output_file.write_text("<testcases>", encoding="utf-8")
+    release = threading.Event()
+
+    gui, destroyed = make_gui(ConversionProgress(), output_file)
+    # 進捗を記録しない処理の途中で、キャンセルにすぐには応じないワーカー
+    gui.worker = threading.Thread(target=release.wait, daemon=True)
+    gui.worker.start()
+    try:
+        converter_gui.TestLinkConverter.exit_app(gui)
+        assert gui.progress.cancelled
+        assert not output_file.exists()
+        assert destroyed == [True]
+    finally:
+        release.set()
+
+def test_exit_app_without_conversion(tmp_path):
+    converter_gui = pytest.importorskip("converter_gui")
+    gui, destroyed = make_gui(ConversionProgress(), tmp_path / "output.xml")
+    converter_gui.TestLinkConverter.exit_app(gui)
+    assert not gui.progress.cancelled
+    assert destroyed == [True]
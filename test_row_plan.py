@@ -0,0 +1,62 @@
+import pytest
+
+from csv_reader import get_header_indices
+from xml_builder import (RowPlan, get_group_key, ROW_FIELDS, COL_ID, COL_EXTERNAL_ID, COL_NAME, COL_SUMMARY, COL_STEP_NUMBER,
+                         COL_EXPECTED, COL_EXEC_TYPE, COL_PRECONDITIONS, COL_SUITE, COL_CUSTOM_FIELDS)
+
+# 任意の列は ID・事前条件とカスタムフィールド1つだけ。実行タイプは最後の列
+HEADERS = [
+    "ID", "テストケース名", "バージョン", "サマリ（概要）", "重要度", "事前条件", "ステップ番号",
+    "アクション（手順）", "期待結果", "AutomationEnabled", "実行タイプ",
+]
+ROW = ["1", "名前", "1", "サマリ", "2", "事前", "1", "手順", "結果", "1", "2"]
+
+@pytest.fixture
+def plan():
+    return RowPlan(get_header_indices(HEADERS))
+
+def test_read_full_row(plan):
+    record = plan.read(ROW)
+    assert len(record) == len(ROW_FIELDS) + 1
+    assert (record[COL_ID], record[COL_NAME], record[COL_PRECONDITIONS], record[COL_EXEC_TYPE]) == ("1", "名前", "事前", "2")
+    assert record[COL_CUSTOM_FIELDS:] == ("1",)
+    assert plan.custom_field_names == ("AutomationEnabled",)
+
+def test_missing_optional_columns_are_empty(plan):
+    """ヘッダーにない列（インデックス -1）は空文字になる"""
+    record = plan.read(ROW)
+    assert (record[COL_EXTERNAL_ID], record[COL_SUITE]) == ("", "")
+    assert [record[index] for index, field in enumerate(ROW_FIELDS) if field not in HEADERS] == [""] * (len(ROW_FIELDS) - 10)
+
+def test_whitespace_is_stripped(plan):
+    record = plan.read([f" \t{value}　 " if value else value for value in ROW])
+    assert record == plan.read(ROW)
+
+@pytest.mark.parametrize("length", range(len(ROW)))
+def test_short_rows_are_padded(plan, length):
+    """足りない列は、実行タイプは "1"、それ以外は空文字で補う"""
+    record = plan.read(ROW[:length])
+    expected = plan.read([value if index < length else "" for index, value in enumerate(ROW)])
+    assert record[:COL_EXEC_TYPE] + record[COL_EXEC_TYPE + 1:] == expected[:COL_EXEC_TYPE] + expected[COL_EXEC_TYPE + 1:]
+    assert record[COL_EXEC_TYPE] == "1"
+
+def test_long_rows_ignore_extra_columns(plan):
+    assert plan.read(ROW + ["余分", "列"]) == plan.read(ROW)
+
+def test_empty_exec_type_is_not_padded(plan):
+    """列があって空の場合は補わない（補うのは列が足りない場合のみ）"""
+    assert plan.read(ROW[:-1] + [""])[COL_EXEC_TYPE] == ""
+
+@pytest.mark.parametrize("row", [
+    ROW, [" 1 "] + ROW[1:], [""] + ROW[1:], ["", " 名前 "], ["", ""], [], ["7"],
+])
+def test_read_key_matches_read(plan, row):
+    assert plan.read_key(row) == get_group_key(plan.read(row))
+
+def test_read_key_without_id_column():
+    headers = HEADERS[1:]
+    plan = RowPlan(get_header_indices(headers))
+    assert plan.read_key(ROW[1:]) == get_group_key(plan.read(ROW[1:])) != ""
+    assert plan.read(ROW[1:])[COL_ID] == ""
+    assert plan.read(ROW[1:])[COL_SUMMARY] == "サマリ"
+    assert (plan.read(ROW[1:])[COL_STEP_NUMBER], plan.read(ROW[1:])[COL_EXPECTED]) == ("1", "結果")
@@ -0,0 +1,88 @@
+import pytest
+
+import csv_to_xml
+import xml_builder
+from csv_reader import get_header_indices
+from csv_to_xml import convert_csv_to_xml, stream_csv_to_xml
+from diagnostics import ConversionDiagnostics, WARN_EMPTY_STEP, WARN_STREAM_RESTART
+from metrics import ConversionMetrics
+from progress import ConversionProgress
+from sample_data import csv_row, write_csv_file
+from xml_processor import CSV_HEADERS
+
+def make_row(internal_id, step, expected):
+    """(ID, ステップ番号, 期待結果) のCSV行（期待結果が空のステップは警告になる）"""
+    return csv_row({
+        "ID": internal_id, "テストケース名": f"テスト{internal_id}", "バージョン": "1", "サマリ（概要）": "サマリ", "重要度": "2",
+        "ステップ番号": step, "アクション（手順）": f"手順{step}", "期待結果": expected, "実行タイプ": "1", "親テストスイート名": "Root",
+    })
+
+def write_csv(path, rows):
+    write_csv_file(path, [make_row(*row) for row in rows])
+
+CONTIGUOUS_ROWS = [("1", "1", "結果"), ("1", "2", ""), ("2", "1", "結果"), ("3", "1", "結果"), ("3", "2", "結果")]
+# テストケース1の行が、テストケース2の後に再び現れる
+NON_CONTIGUOUS_ROWS = [("1", "1", "結果"), ("2", "1", "結果"), ("1", "2", ""), ("3", "1", "結果"), ("3", "2", "結果")]
+
+@pytest.mark.parametrize("rows, restarts", [(CONTIGUOUS_ROWS, 0), (NON_CONTIGUOUS_ROWS, 1)])
+@pytest.mark.parametrize("memory_budget", [0, 1024 * 1024])
+def test_stream_matches_in_memory(tmp_path, rows, restarts, memory_budget):
+    csv_file = tmp_path / "input.csv"
+    write_csv(csv_file, rows)
+    convert_csv_to_xml(str(csv_file), str(tmp_path / "memory.xml"), encoding="utf-8")
+
+    metrics = ConversionMetrics()
+    progress = ConversionProgress()
+    diagnostics = ConversionDiagnostics()
+    stream_csv_to_xml(str(csv_file), str(tmp_path / "stream.xml"), encoding="utf-8", metrics=metrics, progress=progress,
+                      diagnostics=diagnostics, memory_budget=memory_budget)
+
+    assert (tmp_path / "stream.xml").read_bytes() == (tmp_path / "memory.xml").read_bytes()
+    # やり直した場合も、カウンター・進捗・警告は1回分だけ数え、やり直したこと自体を警告として記録する
+    assert metrics.counters.get("stream_restarts", 0) == restarts
+    assert metrics.counters["warnings"] == 1 + restarts
+    assert metrics.counters["testcases"] == 3
+    assert metrics.counters["csv_rows"] == len(rows)
+    assert progress.testcases == 3
+    assert diagnostics.counts == {WARN_EMPTY_STEP: 1, **({WARN_STREAM_RESTART: 1} if restarts else {})}
+    assert len(diagnostics.records) == 1 + restarts
+
+def test_groups_are_yielded_while_reading():
+    """連続する行は、次のテストケースの最初の行を読んだ時点でまとめて返す（全行を読み込まない）"""
+    consumed = []
+    def rows():
+        for row in CONTIGUOUS_ROWS:
+            consumed.append(row[0])
+            yield make_row(*row)
+
+    plan = xml_builder.RowPlan(get_header_indices(CSV_HEADERS))
+    groups = xml_builder.iter_testcase_groups(rows(), plan, diagnostics=ConversionDiagnostics())
+    key, testcase = next(groups)
+    assert (key, testcase.row_count) == ("ID_1", 2)
+    assert consumed == ["1", "1", "2"]
+    assert [key for key, _ in groups] == ["ID_2", "ID_3"]
+
+def test_stream_writes_before_reading_all_rows(tmp_path, monkeypatch):
+    csv_file = tmp_path / "input.csv"
+    output_file = tmp_path / "stream.xml"
+    write_csv(csv_file, CONTIGUOUS_ROWS)
+    consumed = []
+    iter_csv_rows = csv_to_xml.iter_csv_rows
+    def counting_rows(*args):
+        for row in iter_csv_rows(*args):
+            consumed.append(row)
+            yield row
+    monkeypatch.setattr(csv_to_xml, "iter_csv_rows", counting_rows)
+
+    # テストケース毎に、その時点で読み込んだ行数（ヘッダー行を含む）と出力ファイルの有無を記録する
+    seen = []
+    progress = ConversionProgress(interval=0)
+    progress.report = lambda status: seen.append((len(consumed), output_file.exists()))
+    stream_csv_to_xml(str(csv_file), str(output_file), encoding="utf-8", progress=progress, diagnostics=ConversionDiagnostics())
+    assert seen == [(4, True), (5, True), (6, True)]
+
+def test_stream_without_data_rows(tmp_path):
+    csv_file = tmp_path / "input.csv"
+    write_csv(csv_file, [])
+    with pytest.raises(Exception, match="CSVファイルにデータ行がありません"):
+        stream_csv_to_xml(str(csv_file), str(tmp_path / "stream.xml"), encoding="utf-8")
@@ -0,0 +1,29 @@
+import csv
+import os
+
+from xml_processor import write_csv_rows_by_suite, CSV_HEADERS
+
+SUITE_INDEX = CSV_HEADERS.index("親テストスイート名")
+NAME_INDEX = CSV_HEADERS.index("テストケース名")
+
+def make_row(suite, name):
+    row = [""] * len(CSV_HEADERS)
+    row[SUITE_INDEX] = suite
+    row[NAME_INDEX] = name
+    return row
+
+def read_names(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        return [row[NAME_INDEX] for row in list(csv.reader(f))[1:]]
+
+def test_colliding_suite_names_get_unique_files(tmp_path):
+    rows = [
+        make_row("Root/画面:A", "1"),
+        make_row("Root/画面?A", "2"), # 記号を _ に置き換えると同じファイル名になる
+        make_row("root/画面_a", "3"), # 大文字・小文字だけが異なる
+        make_row("Root/画面:A", "4"), # 同じパスは同じファイルに追記する
+    ]
+    written = write_csv_rows_by_suite(str(tmp_path), rows, "default", encoding="utf-8")
+
+    assert [os.path.basename(path) for path in written] == ["Root__画面_A.csv", "Root__画面_A_2.csv", "root__画面_a_3.csv"]
+    assert [read_names(path) for path in written] == [["1", "4"], ["2"], ["3"]]
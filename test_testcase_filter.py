@@ -0,0 +1,98 @@
+import csv
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from csv_to_xml import convert_csv_to_xml, stream_csv_to_xml
+from xml_processor import convert_xml_to_csv
+from sample_data import csv_row, write_csv_file
+import testcase_filter
+from testcase_filter import parse_filter_expression, COND_FIELD, COND_CUSTOM, COND_NEGATE, COND_VALUES
+
+def write_csv(path, testcases):
+    """(ID, 名前, 重要度, テストスイート, AutomationEnabled) 毎に2ステップのCSVを書き込む"""
+    write_csv_file(path, [
+        csv_row({
+            "ID": internal_id, "テストケース名": name, "バージョン": "1", "サマリ（概要）": "サマリ", "重要度": importance,
+            "ステップ番号": step, "アクション（手順）": f"手順{step}", "期待結果": f"結果{step}", "実行タイプ": "1",
+            "親テストスイート名": suite, "AutomationEnabled": automation,
+        })
+        for internal_id, name, importance, suite, automation in testcases for step in ("1", "2")
+    ])
+
+def converted_names(path):
+    return [testcase.get("name") for testcase in ET.parse(path).getroot().iter("testcase")]
+
+TESTCASES = [
+    ("1", "ルートのテスト", "3", "Root", "1"),
+    ("2", "子のテスト", "2", "Root/子", "0"),
+    ("3", "別スイートのテスト", "3", "Other", "1"),
+    ("4", "似た名前のスイート", "1", "Root2", "1"),
+]
+
+def test_parse_filter_expression():
+    condition = parse_filter_expression("Importance != high, low")
+    assert condition[COND_FIELD] == "importance"
+    assert not condition[COND_CUSTOM]
+    assert condition[COND_NEGATE]
+    assert condition[COND_VALUES] == {"3", "1"}
+
+    condition = parse_filter_expression("AutomationEnabled=1")
+    assert condition[COND_FIELD] == "AutomationEnabled"
+    assert condition[COND_CUSTOM]
+    assert not condition[COND_NEGATE]
+
+    with pytest.raises(ValueError):
+        parse_filter_expression("importance")
+
+@pytest.mark.parametrize("convert", [convert_csv_to_xml, stream_csv_to_xml])
+@pytest.mark.parametrize("expressions, expected", [
+    (["suite=Root"], ["ルートのテスト", "子のテスト"]),
+    (["suite=Root/子"], ["子のテスト"]),
+    (["suite!=Root"], ["別スイートのテスト", "似た名前のスイート"]),
+    (["importance=high", "AutomationEnabled=1"], ["ルートのテスト", "別スイートのテスト"]),
+])
+def test_csv_to_xml_filter(tmp_path, convert, expressions, expected):
+    csv_file = tmp_path / "input.csv"
+    output = tmp_path / "output.xml"
+    write_csv(csv_file, TESTCASES)
+
+    selected = testcase_filter.TestcaseFilter(expressions)
+    convert(str(csv_file), str(output), encoding="utf-8", testcase_filter=selected)
+
+    assert converted_names(output) == expected
+    assert selected.matched == len(expected)
+    assert selected.excluded == len(TESTCASES) - len(expected)
+
+def test_xml_to_csv_filter(tmp_path):
+    """フィルタを指定したXML→CSV変換の結果が、すべて変換してから絞り込んだ行と一致する"""
+    csv_file = tmp_path / "input.csv"
+    xml_file = tmp_path / "input.xml"
+    write_csv(csv_file, TESTCASES)
+    convert_csv_to_xml(str(csv_file), str(xml_file), encoding="utf-8")
+    root = ET.parse(xml_file).getroot()
+
+    output = tmp_path / "all.csv"
+    convert_xml_to_csv(root, "", str(output), encoding="utf-8")
+    with open(output, encoding="utf-8", newline="") as f:
+        rows = list(csv.reader(f))
+    importance, automation = rows[0].index("重要度"), rows[0].index("AutomationEnabled")
+    expected = [rows[0]] + [row for row in rows[1:] if row[importance] == "3" and row[automation] == "1"]
+
+    output = tmp_path / "filtered.csv"
+    selected = testcase_filter.TestcaseFilter(["importance=high", "AutomationEnabled=1"])
+    convert_xml_to_csv(root, "", str(output), encoding="utf-8", testcase_filter=selected)
+    with open(output, encoding="utf-8", newline="") as f:
+        assert list(csv.reader(f)) == expected
+    assert selected.matched == 2
+
+@pytest.mark.parametrize("convert", [convert_csv_to_xml, stream_csv_to_xml])
+def test_csv_to_xml_filter_matches_filtered_csv(tmp_path, convert):
+    """フィルタを指定したCSV→XML変換の結果が、絞り込んだCSVを変換した結果と一致する"""
+    write_csv(tmp_path / "input.csv", TESTCASES)
+    write_csv(tmp_path / "filtered.csv", [testcase for testcase in TESTCASES if testcase[2] == "3" and testcase[4] == "1"])
+    convert(str(tmp_path / "filtered.csv"), str(tmp_path / "expected.xml"), encoding="utf-8")
+
+    selected = testcase_filter.TestcaseFilter(["importance=high", "AutomationEnabled=1"])
+    convert(str(tmp_path / "input.csv"), str(tmp_path / "output.xml"), encoding="utf-8", testcase_filter=selected)
+    assert (tmp_path / "output.xml").read_bytes() == (tmp_path / "expected.xml").read_bytes()
@@ -0,0 +1,47 @@
+import pytest
+
+from text_cache import (set_text_cache_size, clear_text_caches, get_text_cache_stats, format_text_cache_stats,
+                        DEFAULT_CACHE_SIZE)
+from text_utils import text_to_html
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    set_text_cache_size(DEFAULT_CACHE_SIZE)
+    yield
+    set_text_cache_size(DEFAULT_CACHE_SIZE)
+
+def test_hits_and_misses():
+    for text in ("a", "b", "a", "a"):
+        text_to_html(text)
+    assert get_text_cache_stats()["text_to_html"] == {"hits": 2, "misses": 2, "size": 2, "maxsize": DEFAULT_CACHE_SIZE}
+    assert format_text_cache_stats() == "text_to_html: ヒット 2 / 4 件 (50%)"
+
+    clear_text_caches()
+    assert get_text_cache_stats()["text_to_html"] == {"hits": 0, "misses": 0, "size": 0, "maxsize": DEFAULT_CACHE_SIZE}
+    assert format_text_cache_stats() == ""
+
+def test_set_size_resizes_and_clears():
+    text_to_html("a")
+    text_to_html("a")
+    set_text_cache_size(1)
+    # 統計と内容はクリアされ、すべての関数のサイズが変わる
+    assert all(stat == {"hits": 0, "misses": 0, "size": 0, "maxsize": 1} for stat in get_text_cache_stats().values())
+    for text in ("a", "b", "a"):
+        text_to_html(text)
+    assert get_text_cache_stats()["text_to_html"] == {"hits": 0, "misses": 3, "size": 1, "maxsize": 1}
+
+def test_size_zero_disables_cache():
+    set_text_cache_size(0)
+    assert text_to_html("a") == text_to_html("a")
+    assert get_text_cache_stats()["text_to_html"] == {"hits": 0, "misses": 2, "size": 0, "maxsize": 0}
+
+def test_cached_result_matches_uncached():
+    texts = ["", "1行目\n2行目", "<タグ> & 記号"]
+    cached = [text_to_html(text) for text in texts + texts]
+    set_text_cache_size(0)
+    assert cached == [text_to_html(text) for text in texts + texts]
+
+def test_negative_size_is_rejected():
+    with pytest.raises(ValueError):
+        set_text_cache_size(-1)
+    assert get_text_cache_stats()["text_to_html"]["maxsize"] == DEFAULT_CACHE_SIZE
@@ -0,0 +1,105 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from csv_reader import get_header_indices
+from csv_to_xml import write_testcases_xml_chunks, get_manifest_path, get_chunk_path
+from xml_builder import RowPlan, iter_testcase_groups
+from xml_processor import CSV_HEADERS
+from sample_data import make_testcase_rows
+
+N_TESTCASES = 12
+
+def steps_of(i):
+    """テストケース i のステップ数（ファイルサイズがテストケース毎に変わるよう、1〜4で変える）"""
+    return i % 4 + 1
+
+def make_groups():
+    rows = [row for i in range(N_TESTCASES) for row in make_testcase_rows(i, steps_of(i))]
+    return iter_testcase_groups(rows, RowPlan(get_header_indices(list(CSV_HEADERS))))
+
+def read_chunks(output_xml_file):
+    """マニフェストと、各ファイルの (テストケース名, ステップ数) のリストを返す"""
+    with open(get_manifest_path(output_xml_file), encoding="utf-8") as f:
+        manifest = json.load(f)
+    chunk_dir = os.path.dirname(output_xml_file)
+    contents = []
+    for chunk in manifest["chunks"]:
+        root = ET.parse(os.path.join(chunk_dir, chunk["file"])).getroot()
+        contents.append([(tc.get("name"), len(tc.findall("steps/step"))) for tc in root.findall("testcase")])
+    return manifest, contents
+
+def check_complete_output(output_xml_file, chunks):
+    manifest, contents = read_chunks(output_xml_file)
+    assert manifest == {"complete": True, "chunks": chunks}
+    # すべてのテストケースがすべてのステップと共に、順に1回ずつ出力される（テストケースの途中で分割しない）
+    assert [tc for content in contents for tc in content] == [(f"テストケース {i}", steps_of(i)) for i in range(N_TESTCASES)]
+    chunk_dir = os.path.dirname(output_xml_file)
+    for chunk, content in zip(chunks, contents):
+        assert chunk["testcases"] == len(content)
+        assert chunk["bytes"] == os.path.getsize(os.path.join(chunk_dir, chunk["file"]))
+    return contents
+
+@pytest.mark.parametrize("max_testcases, expected_counts", [(5, [5, 5, 2]), (4, [4, 4, 4]), (100, [12])])
+def test_split_by_testcases(tmp_path, max_testcases, expected_counts):
+    output_xml_file = str(tmp_path / "out.xml")
+    chunks = write_testcases_xml_chunks(output_xml_file, make_groups(), max_testcases=max_testcases)
+    contents = check_complete_output(output_xml_file, chunks)
+    assert [len(content) for content in contents] == expected_counts
+    assert [chunk["file"] for chunk in chunks] == [os.path.basename(get_chunk_path(output_xml_file, n + 1)) for n in range(len(chunks))]
+
+@pytest.mark.parametrize("max_bytes", [1, 3000, 5000, 10 ** 6])
+def test_split_by_bytes(tmp_path, max_bytes):
+    output_xml_file = str(tmp_path / "out.xml")
+    chunks = write_testcases_xml_chunks(output_xml_file, make_groups(), max_bytes=max_bytes)
+    contents = check_complete_output(output_xml_file, chunks)
+    for chunk, content in zip(chunks, contents):
+        # 1件で上限を超えるテストケースだけは、それだけで1ファイルになる
+        assert chunk["bytes"] <= max_bytes or len(content) == 1
+    if max_bytes == 1:
+        assert len(chunks) == N_TESTCASES
+    if max_bytes == 10 ** 6:
+        assert len(chunks) == 1
+
+def test_split_by_testcases_and_bytes(tmp_path):
+    output_xml_file = str(tmp_path / "out.xml")
+    chunks = write_testcases_xml_chunks(output_xml_file, make_groups(), max_testcases=3, max_bytes=3000)
+    check_complete_output(output_xml_file, chunks)
+    assert all(chunk["testcases"] <= 3 and (chunk["bytes"] <= 3000 or chunk["testcases"] == 1) for chunk in chunks)
+
+def failing_groups(fail_after):
+    for n, group in enumerate(make_groups()):
+        if n == fail_after:
+            raise RuntimeError("読み込みエラー")
+        yield group
+
+def test_failure_keeps_finished_chunks_only(tmp_path):
+    output_xml_file = str(tmp_path / "out.xml")
+    with pytest.raises(RuntimeError):
+        write_testcases_xml_chunks(output_xml_file, failing_groups(7), max_testcases=3)
+
+    manifest, contents = read_chunks(output_xml_file)
+    assert manifest["complete"] is False
+    # 書き終えた2ファイル（6件）だけが残り、書き込み途中の3つ目のファイルは削除される
+    assert [chunk["testcases"] for chunk in manifest["chunks"]] == [3, 3]
+    assert [tc for content in contents for tc in content] == [(f"テストケース {i}", steps_of(i)) for i in range(6)]
+    for chunk in manifest["chunks"]:
+        assert chunk["bytes"] == os.path.getsize(tmp_path / chunk["file"])
+    assert not os.path.exists(get_chunk_path(output_xml_file, 3))
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(get_manifest_path(output_xml_file))] + [chunk["file"] for chunk in manifest["chunks"]])
+
+def test_failure_before_first_chunk(tmp_path):
+    output_xml_file = str(tmp_path / "out.xml")
+    with pytest.raises(RuntimeError):
+        write_testcases_xml_chunks(output_xml_file, failing_groups(1), max_testcases=3)
+    assert os.listdir(tmp_path) == []
+
+def test_empty_input_writes_one_empty_document(tmp_path):
+    output_xml_file = str(tmp_path / "out.xml")
+    chunks = write_testcases_xml_chunks(output_xml_file, iter([]), max_testcases=3)
+    manifest, contents = read_chunks(output_xml_file)
+    assert manifest == {"complete": True, "chunks": chunks}
+    assert [chunk["testcases"] for chunk in chunks] == [0]
+    assert contents == [[]]
@@ -0,0 +1,53 @@
+import pytest
+
+from csv_reader import get_header_indices
+from diagnostics import ConversionDiagnostics
+from xml_builder import RowPlan, iter_testcase_groups, build_testcase_element, create_root_element
+import xml_emitter
+from xml_processor import CSV_HEADERS
+from sample_data import make_csv_rows
+from xml_utils import element_to_string, remove_blank_lines
+
+STEPS_PER_TESTCASE = 3
+
+# 標準の行の一部を置き換える値（テストケース番号, ステップ番号, ヘッダー, 値）
+EMITTER_EDGE_CASES = [
+    (0, 1, "ID", ""),
+    (1, 1, "外部ID", ""),
+    (2, 1, "推定実行時間", "1.5 <分> & 秒"),
+    (3, 1, "ステータス", "  "),
+    (4, 1, "テストケース名", "\"引用\" & <名前>"),
+    (5, 2, "ステップ番号", ""),
+    (6, 1, "アクション（手順）", ""),
+    (7, 1, "期待結果", "1行目\n\n\n3行目\r\n・項目"),
+    (8, 1, "AutomationAction", "値]]>値"),
+    (9, 1, "AutomationEnabled", ""),
+    (10, 1, "事前条件", "\u2028区切り\x0b文字"),
+    (11, 1, "サマリ（概要）", ""),
+    (12, 1, "実行タイプ", ""),
+    (13, 1, "ステップ番号", ""),
+    (13, 1, "実行タイプ", ""),
+]
+
+def make_rows(n_testcases):
+    """テストケース毎に STEPS_PER_TESTCASE 行のCSV行（ヘッダー行を含む）を生成し、EMITTER_EDGE_CASES を反映する"""
+    rows = make_csv_rows(n_testcases, STEPS_PER_TESTCASE)
+    for testcase, step, header, value in EMITTER_EDGE_CASES:
+        rows[1 + testcase * STEPS_PER_TESTCASE + step - 1][CSV_HEADERS.index(header)] = value
+    return rows
+
+def emit_with_element_tree(testcase):
+    """比較用: 要素ツリーを構築して <testcase> のXML文字列に変換する"""
+    testcase_elem = build_testcase_element(create_root_element(), testcase, ConversionDiagnostics())
+    return None if testcase_elem is None else element_to_string(testcase_elem, "\t")
+
+ROWS = make_rows(max(case[0] for case in EMITTER_EDGE_CASES) + 2)
+TESTCASES = list(iter_testcase_groups(ROWS[1:], RowPlan(get_header_indices(ROWS[0]))))
+
+@pytest.mark.parametrize("group_key, testcase", TESTCASES, ids=[key for key, _ in TESTCASES])
+def test_testcase_to_xml_matches_element_tree(group_key, testcase):
+    expected = emit_with_element_tree(testcase)
+    actual = xml_emitter.testcase_to_xml(testcase, diagnostics=ConversionDiagnostics())
+    if expected is not None:
+        expected, actual = remove_blank_lines(expected), remove_blank_lines(actual)
+    assert actual == expected
@@ -0,0 +1,54 @@
+import pytest
+
+from diagnostics import ConversionDiagnostics, WARN_INDEX_RESET
+from xml_index import XmlIndex, ENTRY_INTERNAL_ID, ENTRY_PATH, get_index_path
+from xml_processor import iter_testcases
+from xml_utils import element_to_string
+
+XML = """<?xml version="1.0" encoding="UTF-8"?>
+<!-- <testcase name="コメント内"> -->
+<testsuite id="1" name="ルート">
+<testsuite id="2" name="画面">
+<testcase internalid="10" name="ログイン"><externalid><![CDATA[1]]></externalid>
+<summary><![CDATA[<p>本文の <testcase name="x"> は要素ではない</p>]]></summary></testcase>
+<testsuite id="3" name="子">
+<testcase internalid="11" name="入れ子"><summary><![CDATA[<![CDATA[二重]]>]]></summary></testcase>
+</testsuite>
+</testsuite>
+<testcase internalid="12" name='属性に > を含む "名前"'><externalid>3</externalid></testcase>
+</testsuite>
+"""
+
+@pytest.fixture
+def xml_file(tmp_path):
+    path = tmp_path / "testcases.xml"
+    path.write_text(XML, encoding="utf-8")
+    return str(path)
+
+def as_strings(testcases):
+    return [(element_to_string(testcase), suite) for testcase, suite in testcases]
+
+@pytest.mark.parametrize("suite_path", [False, True])
+def test_extracted_testcases_match_full_parse(xml_file, suite_path):
+    index = XmlIndex.build(xml_file)
+    assert [entry[ENTRY_INTERNAL_ID] for entry in index.testcases] == ["10", "11", "12"]
+    expected = as_strings(iter_testcases(xml_file, suite_path=suite_path))
+    assert as_strings(index.iter_testcases(index.testcases, suite_path)) == expected
+
+def test_select_and_reload(xml_file):
+    index = XmlIndex.open(xml_file)
+    assert [entry[ENTRY_PATH] for entry in index.select(suites=["ルート/画面"])] == ["ルート/画面", "ルート/画面/子"]
+    assert [entry[ENTRY_INTERNAL_ID] for entry in index.select(external_ids=["3"], names=["ログイン"])] == ["10", "12"]
+
+    loaded = XmlIndex.load(xml_file)
+    assert loaded is not None
+    assert loaded.testcases == index.testcases
+
+def test_unreadable_index_is_rebuilt(xml_file):
+    with open(get_index_path(xml_file), "w", encoding="utf-8") as f:
+        f.write("{壊れた索引")
+    diagnostics = ConversionDiagnostics()
+    index = XmlIndex.open(xml_file, diagnostics=diagnostics)
+    assert diagnostics.counts == {WARN_INDEX_RESET: 1}
+    assert [entry[ENTRY_INTERNAL_ID] for entry in index.testcases] == ["10", "11", "12"]
+    assert XmlIndex.load(xml_file) is not None
@@ -0,0 +1,39 @@
+import xml.etree.ElementTree as ET
+
+from xml_utils import element_to_string, remove_blank_lines
+
+def build_tree():
+    root = ET.Element("testcases")
+    testcase = ET.SubElement(root, "testcase", {"internalid": "1", "name": "A & <名前>"})
+    for tag, text in [("externalid", "10"), ("summary", "<p>a]]>b</p>"), ("preconditions", None), ("estimated_exec_duration", "1 < 2 & 3"), ("status", "  ")]:
+        ET.SubElement(testcase, tag).text = text
+    step = ET.SubElement(ET.SubElement(testcase, "steps"), "step")
+    for tag, text in [("step_number", "1"), ("actions", "<p>手順</p>"), ("expectedresults", "")]:
+        ET.SubElement(step, tag).text = text
+    return root
+
+def test_element_to_string():
+    """CDATA・エスケープ・空要素・入れ子のインデントが従来の出力形式と同じになる"""
+    assert element_to_string(build_tree()) == (
+        '<testcases>\n'
+        '\t<testcase internalid="1" name="A &amp; &lt;名前&gt;">\n'
+        '\t\t<externalid><![CDATA[10]]></externalid>\n'
+        '\t\t<summary><![CDATA[<p>a]]]]><![CDATA[>b</p>]]></summary>\n'
+        '\t\t<preconditions></preconditions>\n'
+        '\t\t<estimated_exec_duration>1 &lt; 2 &amp; 3</estimated_exec_duration>\n'
+        '\t\t<status></status>\n'
+        '\t\t<steps>\n'
+        '\t\t\t<step>\n'
+        '\t\t\t\t<step_number><![CDATA[1]]></step_number>\n'
+        '\t\t\t\t<actions><![CDATA[<p>手順</p>]]></actions>\n'
+        '\t\t\t\t<expectedresults></expectedresults>\n'
+        '\t\t\t</step>\n'
+        '\t\t</steps>\n'
+        '\t</testcase>\n'
+        '</testcases>'
+    )
+
+def test_remove_blank_lines():
+    """空白だけの行を削除し、CRLF や U+2028 などの改行を LF に揃える"""
+    assert remove_blank_lines("a\n\n  \nb\u2028c\r\nd") == "a\nb\nc\nd"
+    assert remove_blank_lines("a\n\tb") == "a\n\tb"
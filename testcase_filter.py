@@ -0,0 +1,106 @@
+from metrics import count
+from progress import advance
+from text_utils import SUITE_PATH_SEPARATOR
+
+# フィルタ式で指定できるテストケースの項目（Testcase の属性名）。それ以外の項目名はカスタムフィールド名とする
+FILTER_FIELDS = ("internal_id", "external_id", "name", "suite", "importance", "status", "exec_type", "active", "is_open")
+# 項目名の別名
+FIELD_ALIASES = {"id": "internal_id", "externalid": "external_id", "execution_type": "exec_type"}
+# 値の別名（TestLink の画面に表示される名前 → XML・CSVの値）
+VALUE_ALIASES = {
+    "importance": {"high": "3", "medium": "2", "low": "1", "高": "3", "中": "2", "低": "1"},
+    "status": {
+        "draft": "1", "readyforreview": "2", "reviewinprogress": "3", "rework": "4",
+        "obsolete": "5", "future": "6", "final": "7",
+    },
+    "exec_type": {"manual": "1", "automated": "2", "手動": "1", "自動": "2"},
+}
+# 1つの条件に複数の値を指定する場合の区切り文字（いずれかに一致すればよい）
+VALUE_SEPARATOR = ","
+
+# 条件のタプルの各項目の位置
+(COND_EXPRESSION, COND_FIELD, COND_CUSTOM, COND_NEGATE, COND_VALUES) = range(5)
+
+def parse_filter_expression(expression):
+    """フィルタ式「項目=値」「項目!=値」（値は , 区切りで複数指定可）を条件のタプルに変換する"""
+    position = expression.find("=")
+    negate = position > 0 and expression[position - 1] == "!"
+    field = expression[:position - 1 if negate else position].strip()
+    value = expression[position + 1:]
+    if position < 0 or not field:
+        raise ValueError(f"フィルタ式が正しくありません: {expression}（項目=値 または 項目!=値 の形式で指定してください）")
+    normalized = FIELD_ALIASES.get(field.lower(), field.lower())
+    custom = normalized not in FILTER_FIELDS
+    if not custom:
+        field = normalized
+    aliases = VALUE_ALIASES.get(field, {}) if not custom else {}
+    values = []
+    for item in value.split(VALUE_SEPARATOR):
+        item = item.strip()
+        values.append(aliases.get(item.replace(" ", "").lower(), item))
+    return (expression, field, custom, negate, frozenset(values))
+
+def _suite_matches(suite, values):
+    """テストスイート名（またはパス）が values のいずれか、またはその下位のテストスイートか"""
+    return any(suite == value or suite.startswith(value + SUITE_PATH_SEPARATOR) for value in values)
+
+class TestcaseFilter:
+    """フィルタ式の条件に一致するテストケースだけを変換するためのフィルタ
+
+    条件はすべて満たす必要がある（AND）。1つの条件に , 区切りで複数の値を指定すると、いずれかに一致すればよい（OR）。
+    suite はテストスイート名（xml2csv で --suite-path を指定した場合はパス）が一致するか、その下位のものに一致する。
+    判定にはIDや重要度などの項目とカスタムフィールドの値だけを使い、HTMLの変換前に行うため、
+    除外したテストケースはほとんど処理時間がかからない。一致した件数と、条件毎に除外した件数を記録する。
+    """
+
+    def __init__(self, expressions):
+        self.conditions = [parse_filter_expression(expression) for expression in expressions]
+        self.matched = 0
+        self.excluded = 0
+        self.excluded_by = {condition[COND_EXPRESSION]: 0 for condition in self.conditions}
+
+    def match(self, get_field, get_custom_fields):
+        """get_field(項目名) で項目の値を、get_custom_fields() でカスタムフィールドの {名前: 値} を取得して判定する
+
+        カスタムフィールドは条件にある場合だけ取得する。最初に満たさなかった条件で除外した件数を数える。
+        """
+        custom_fields = None
+        for expression, field, custom, negate, values in self.conditions:
+            if custom:
+                if custom_fields is None:
+                    custom_fields = get_custom_fields()
+                value = custom_fields.get(field) or ""
+            else:
+                value = get_field(field) or ""
+            value = value.strip()
+            matched = _suite_matches(value, values) if field == "suite" else value in values
+            if matched == negate:
+                self.excluded += 1
+                self.excluded_by[expression] += 1
+                return False
+        self.matched += 1
+        return True
+
+    def match_testcase(self, testcase):
+        """Testcase が条件に一致するか"""
+        return self.match(lambda field: getattr(testcase, field), lambda: dict(testcase.custom_fields))
+
+    def format_stats(self):
+        """一致・除外したテストケース数を表示用の文字列にする"""
+        text = f"フィルタ: {self.matched + self.excluded} 件中 {self.matched} 件を変換、{self.excluded} 件を除外"
+        details = [f"{expression}: {excluded} 件" for expression, excluded in self.excluded_by.items() if excluded]
+        if details:
+            text += f"（{', '.join(details)}）"
+        return text
+
+def filter_testcase_groups(testcase_groups, testcase_filter, progress=None, metrics=None):
+    """(グループキー, Testcase) のうち testcase_filter に一致するものだけを返す
+
+    除外したテストケースも進捗に数え、metrics を指定すると除外数を filtered_out として記録する。
+    """
+    for group_key, testcase in testcase_groups:
+        if testcase_filter.match_testcase(testcase):
+            yield group_key, testcase
+            continue
+        advance(progress, 1, testcase.row_count)
+        count(metrics, "filtered_out")
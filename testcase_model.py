@@ -0,0 +1,75 @@
+import sys
+
+def _intern(value):
+    """値の種類が少なく、多くのテストケースやステップで繰り返される値を共有する"""
+    return sys.intern(value) if value else ""
+
+class Step:
+    """テストケースの1ステップ
+
+    アクションと期待結果はHTMLではなくテキスト（CSVの値と同じ形式）で保持する。
+    line はCSVから作成した場合の、テストケース内の行番号（警告の表示用、1行目を2とする）。
+    """
+
+    __slots__ = ("number", "actions", "expected", "exec_type", "line")
+
+    def __init__(self, number, actions, expected, exec_type, line=None):
+        self.number = number
+        self.actions = actions
+        self.expected = expected
+        self.exec_type = _intern(exec_type)
+        self.line = line
+
+    def astuple(self):
+        """変換結果に影響する値のタプル（line は含まない）"""
+        return (self.number, self.actions, self.expected, self.exec_type)
+
+class Testcase:
+    """CSV→XML と XML→CSV の両方向で使う、1テストケース分のデータ
+
+    テストケースの項目は、ステップ毎に複製せず1回だけ保持する。サマリ・事前条件も
+    テキスト（CSVの値と同じ形式）で保持する。custom_fields は (名前, 値) のタプル、
+    steps は Step のリストで、ステップ（XMLの <steps> 要素）がない場合は None。
+    row_count はCSVの行数（進捗表示と件数の記録用）。
+    """
+
+    __slots__ = (
+        "internal_id", "external_id", "version", "name", "summary", "importance", "preconditions",
+        "exec_type", "exec_duration", "status", "active", "is_open", "suite", "custom_fields",
+        "steps", "row_count",
+    )
+
+    def __init__(self, internal_id, external_id, version, name, summary, importance, preconditions,
+                 exec_type, exec_duration="", status="", active="", is_open="", suite="",
+                 custom_fields=(), steps=None, row_count=1):
+        self.internal_id = internal_id
+        self.external_id = external_id
+        self.version = _intern(version)
+        self.name = name
+        self.summary = summary
+        self.importance = _intern(importance)
+        self.preconditions = preconditions
+        self.exec_type = _intern(exec_type)
+        self.exec_duration = exec_duration
+        self.status = _intern(status)
+        self.active = _intern(active)
+        self.is_open = _intern(is_open)
+        self.suite = _intern(suite)
+        self.custom_fields = tuple((_intern(cf_name), cf_value) for cf_name, cf_value in custom_fields)
+        self.steps = steps
+        self.row_count = row_count
+
+    def add_step(self, step):
+        """ステップを末尾に加える"""
+        if self.steps is None:
+            self.steps = []
+        self.steps.append(step)
+
+    def astuple(self):
+        """変換結果に影響する値のタプル（差分変換のハッシュ値の計算用）"""
+        steps = None if self.steps is None else tuple(step.astuple() for step in self.steps)
+        return (
+            self.internal_id, self.external_id, self.version, self.name, self.summary, self.importance,
+            self.preconditions, self.exec_type, self.exec_duration, self.status, self.active, self.is_open,
+            self.suite, self.custom_fields, steps,
+        )
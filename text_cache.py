@@ -0,0 +1,62 @@
+import functools
+
+# キャッシュする変換結果の件数（関数毎）。0 でキャッシュ無効
+DEFAULT_CACHE_SIZE = 4096
+
+# キャッシュ付きで登録された関数名 -> lru_cache でラップした関数
+_caches = {}
+_originals = {}
+_cache_size = DEFAULT_CACHE_SIZE
+
+def cached_text_function(func):
+    """テキスト変換関数の結果を LRU キャッシュするデコレータ
+
+    同じ事前条件や期待結果が何千回も現れるため、同一テキストの変換は1回だけ行う。
+    キャッシュサイズは set_text_cache_size で変更できる。
+    """
+    name = func.__name__
+    _originals[name] = func
+    _caches[name] = functools.lru_cache(maxsize=_cache_size)(func)
+
+    @functools.wraps(func)
+    def wrapper(text):
+        return _caches[name](text)
+
+    return wrapper
+
+def set_text_cache_size(maxsize):
+    """全キャッシュのサイズを変更する（既存のキャッシュ内容と統計はクリアされる）"""
+    global _cache_size
+    if maxsize < 0:
+        raise ValueError(f"キャッシュサイズには0以上を指定してください: {maxsize}")
+    _cache_size = maxsize
+    for name, func in _originals.items():
+        _caches[name] = functools.lru_cache(maxsize=maxsize)(func)
+
+def clear_text_caches():
+    """全キャッシュの内容とヒット数・ミス数をクリアする"""
+    for cache in _caches.values():
+        cache.cache_clear()
+
+def get_text_cache_stats():
+    """関数名毎のキャッシュ統計 {"hits", "misses", "size", "maxsize"} を返す"""
+    stats = {}
+    for name, cache in _caches.items():
+        info = cache.cache_info()
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+        }
+    return stats
+
+def format_text_cache_stats():
+    """キャッシュ統計を表示用の文字列にする（呼び出しのなかった関数は省略）"""
+    lines = []
+    for name, stat in get_text_cache_stats().items():
+        total = stat["hits"] + stat["misses"]
+        if not total:
+            continue
+        lines.append(f"{name}: ヒット {stat['hits']} / {total} 件 ({stat['hits'] / total:.0%})")
+    return "\n".join(lines)
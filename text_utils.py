@@ -1,11 +1,16 @@
-import xml.sax.saxutils as saxutils
+from xml_utils import escape_xml
+from text_cache import cached_text_function
 
+# テストスイートのパスで、テストスイート名を区切る文字（xml_processor・xml_index・testcase_filter で共通）
+SUITE_PATH_SEPARATOR = "/"
+
+@cached_text_function
 def text_to_html(text):
     """プレーンテキストをTestLinkが期待するHTML形式（主に<p>, <ol>, <li>）に変換する"""
     if not text:
         return "<p></p>"
     # HTMLエスケープ
-    text = saxutils.escape(text)
+    text = escape_xml(text)
     lines = text.split('\n')
     html_parts = []
     in_list = False
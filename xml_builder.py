@@ -1,220 +1,277 @@
 import xml.etree.ElementTree as ET
+from operator import itemgetter
 from text_utils import text_to_html
+from metrics import count
+from diagnostics import warn, WARN_MISSING_KEY, WARN_MISSING_REQUIRED, WARN_EMPTY_STEP
+from testcase_model import Testcase, Step
 
-def group_testcases(rows, header_indices):
-    """テストケースをIDまたは名前でグループ化する"""
-    # インデックスを変数に展開
-    id_idx = header_indices.get("ID", -1)
-    testcase_name_idx = header_indices["テストケース名"]
+# RowPlan.read が返すタプルの各項目の位置（カスタムフィールドの値は COL_CUSTOM_FIELDS 以降に並ぶ）
+(COL_ID, COL_EXTERNAL_ID, COL_VERSION, COL_NAME, COL_SUMMARY, COL_IMPORTANCE, COL_PRECONDITIONS,
+ COL_STEP_NUMBER, COL_ACTIONS, COL_EXPECTED, COL_EXEC_TYPE, COL_EXEC_DURATION, COL_STATUS,
+ COL_ACTIVE, COL_IS_OPEN, COL_SUITE, COL_CUSTOM_FIELDS) = range(17)
 
+# 上の各項目に対応するCSVのヘッダー
+ROW_FIELDS = (
+    "ID", "外部ID", "バージョン", "テストケース名", "サマリ（概要）", "重要度", "事前条件",
+    "ステップ番号", "アクション（手順）", "期待結果", "実行タイプ", "推定実行時間", "ステータス",
+    "有効/無効", "開いているか", "親テストスイート名"
+)
+
+class RowPlan:
+    """get_header_indices の結果から作る、CSV行の読み取り方法
+
+    必要な列を operator.itemgetter でまとめて取り出し、前後の空白を除いたタプルにする。
+    ヘッダーにない列は空文字になり、列数が足りない行は既定値（実行タイプは "1"、それ以外は空文字）で補う。
+    行毎に列の有無や行の長さを確認せずに済むよう、テストケースの処理の前に1回だけ作成する。
+    """
+
+    def __init__(self, header_indices):
+        custom_fields_indices = header_indices.get("custom_fields", {})
+        self.custom_field_names = tuple(custom_fields_indices)
+        indices = [header_indices.get(field, -1) for field in ROW_FIELDS] + list(custom_fields_indices.values())
+
+        # 列がない項目は、行の末尾に追加する空文字を参照する
+        self.width = max(indices) + 1
+        self._getter = itemgetter(*[index if index != -1 else self.width for index in indices])
+        self._padding = [""] * self.width
+        exec_type_idx = header_indices["実行タイプ"]
+        self._padding[exec_type_idx] = "1" # デフォルト Manual
+        self._id_index = header_indices.get("ID", -1)
+        self._name_index = header_indices.get("テストケース名", -1)
+
+    def read(self, row):
+        """CSV行を、前後の空白を除いた ROW_FIELDS 順（とカスタムフィールドの値）のタプルに変換する"""
+        if len(row) != self.width:
+            row = row[:self.width] + self._padding[len(row):]
+        return tuple(map(str.strip, self._getter(row + [""])))
+
+    def read_key(self, row):
+        """CSV行のグループキーだけを読み取る（get_group_key(self.read(row)) と同じ値）"""
+        internal_id = row[self._id_index].strip() if 0 <= self._id_index < len(row) else ""
+        name = row[self._name_index].strip() if 0 <= self._name_index < len(row) else ""
+        return _group_key(internal_id, name)
+
+class NonContiguousRowsError(ValueError):
+    """iter_testcase_groups で、出力済みのテストケースの行が再び現れた場合に送出される例外"""
+
+def _group_key(internal_id, name):
+    if internal_id:
+        return f"ID_{internal_id}"
+    if name: # IDがなく名前がある場合、名前をキーにする
+        return f"NAME_{name}"
+    return ""
+
+def get_group_key(record):
+    """行のグループキー（IDがあれば ID_<ID>、なければ NAME_<名前>）を返す。どちらもなければ空文字"""
+    return _group_key(record[COL_ID], record[COL_NAME])
+
+def get_testcase_key(testcase):
+    """Testcase のグループキー（get_group_key と同じ形式）を返す"""
+    return _group_key(testcase.internal_id, testcase.name)
+
+def new_testcase(record, custom_field_names):
+    """テストケースの1行目（plan.read で変換したタプル）から、行を含まない Testcase を作る"""
+    custom_fields = [(cf_name, cf_value) for cf_name, cf_value in zip(custom_field_names, record[COL_CUSTOM_FIELDS:]) if cf_value]
+    return Testcase(
+        record[COL_ID], record[COL_EXTERNAL_ID], record[COL_VERSION], record[COL_NAME], record[COL_SUMMARY],
+        record[COL_IMPORTANCE], record[COL_PRECONDITIONS], record[COL_EXEC_TYPE], record[COL_EXEC_DURATION],
+        record[COL_STATUS], record[COL_ACTIVE], record[COL_IS_OPEN], record[COL_SUITE], custom_fields, row_count=0
+    )
+
+def add_record(testcase, record):
+    """テストケースの行（plan.read で変換したタプル）を Testcase に加える（ステップ番号がある行のみステップにする）"""
+    testcase.row_count += 1
+    step_number = record[COL_STEP_NUMBER]
+    if step_number:
+        # line はグループ内の行番号 (デバッグ用)
+        testcase.add_step(Step(step_number, record[COL_ACTIONS], record[COL_EXPECTED], record[COL_EXEC_TYPE], testcase.row_count + 1))
+
+def merge_testcase_parts(testcase, part):
+    """別々に集めた同じテストケースの後続の行（part）を testcase に加える（part の1行目の項目は使わない）"""
+    for step in part.steps or ():
+        step.line += testcase.row_count
+        testcase.add_step(step)
+    testcase.row_count += part.row_count
+
+def group_testcases(rows, plan, metrics=None, diagnostics=None):
+    """テストケースをIDまたは名前でグループ化し、グループキーと Testcase の辞書を返す（各行は plan.read で変換する）
+
+    metrics を指定すると、キーがなくスキップした行数（skipped_rows）を記録する。
+    diagnostics（ConversionDiagnostics）を指定すると、警告を表示せずに記録する。
+    """
     # テストケースをグループ化 (IDまたは名前で)
     testcase_groups = {}
     line_num = 1 # ヘッダーが1行目
     for row in rows[1:]: # データ行のみ処理
         line_num += 1
-        # IDと名前を取得 (存在しない場合は空文字)
-        tc_id = row[id_idx].strip() if id_idx != -1 and id_idx < len(row) else ""
-        tc_name = row[testcase_name_idx].strip() if testcase_name_idx != -1 and testcase_name_idx < len(row) else ""
-
-        group_key = ""
-        if tc_id:
-            group_key = f"ID_{tc_id}"
-        elif tc_name: # IDがなく名前がある場合、名前をキーにする
-            group_key = f"NAME_{tc_name}"
-        else:
-            print(f"警告: 行 {line_num} にはテストケースIDも名前もありません。スキップします。")
+        record = plan.read(row)
+        group_key = get_group_key(record)
+        if not group_key:
+            warn(diagnostics, WARN_MISSING_KEY, f"行 {line_num} にはテストケースIDも名前もありません。スキップします。", line_num)
+            count(metrics, "skipped_rows")
+            count(metrics, "warnings")
             continue
 
-        if group_key not in testcase_groups:
-            testcase_groups[group_key] = []
-        testcase_groups[group_key].append(row)
-        
+        testcase = testcase_groups.get(group_key)
+        if testcase is None:
+            testcase = testcase_groups[group_key] = new_testcase(record, plan.custom_field_names)
+        add_record(testcase, record)
+
     return testcase_groups
 
-def build_testcase_element(root, testcase_rows, header_indices):
-    """テストケース行からXML要素を構築する"""
-    if not testcase_rows:
-        return
-        
-    # インデックスを変数に展開
-    id_idx = header_indices.get("ID", -1)
-    external_id_idx = header_indices.get("外部ID", -1)
-    version_idx = header_indices["バージョン"]
-    testcase_name_idx = header_indices["テストケース名"]
-    summary_idx = header_indices["サマリ（概要）"]
-    importance_idx = header_indices["重要度"]
-    preconditions_idx = header_indices.get("事前条件", -1)
-    step_number_idx = header_indices["ステップ番号"]
-    actions_idx = header_indices["アクション（手順）"]
-    expected_idx = header_indices["期待結果"]
-    exec_type_idx = header_indices["実行タイプ"]
-    exec_duration_idx = header_indices.get("推定実行時間", -1)
-    status_idx = header_indices.get("ステータス", -1)
-    is_active_idx = header_indices.get("有効/無効", -1)
-    is_open_idx = header_indices.get("開いているか", -1)
-    
-    # カスタムフィールドのインデックス
-    custom_fields_indices = header_indices.get("custom_fields", {})
-    
-    first_row = testcase_rows[0]
+def iter_testcase_groups(rows, plan, metrics=None, diagnostics=None):
+    """データ行を逐次読み、連続する同一テストケースの行がまとまるたびに (グループキー, Testcase) を返す
 
-    # 必須データの存在チェック
-    missing_data = False
-    for header in ["テストケース名", "バージョン", "サマリ（概要）", "重要度", "実行タイプ"]:
-        idx = header_indices[header]
-        # ステップ関連以外は first_row でチェック
-        if idx >= len(first_row) or not first_row[idx].strip():
+    group_testcases と異なり全行を保持しないため、同じテストケースの行は
+    連続している必要がある。出力済みのテストケースが再度現れた場合は NonContiguousRowsError を送出する。
+    """
+    finished_keys = set()
+    current_key = None
+    current = None
+    line_num = 1 # ヘッダーが1行目
+    for row in rows: # データ行のみ渡される
+        line_num += 1
+        record = plan.read(row)
+        group_key = get_group_key(record)
+        if not group_key:
+            warn(diagnostics, WARN_MISSING_KEY, f"行 {line_num} にはテストケースIDも名前もありません。スキップします。", line_num)
+            count(metrics, "skipped_rows")
+            count(metrics, "warnings")
+            continue
+
+        if group_key != current_key:
+            if current_key is not None:
+                yield current_key, current
+                finished_keys.add(current_key)
+            if group_key in finished_keys:
+                raise NonContiguousRowsError(f"行 {line_num} のテストケース {group_key} は既に出力済みです。同じテストケースの行は連続させてください。")
+            current_key = group_key
+            current = new_testcase(record, plan.custom_field_names)
+        add_record(current, record)
+
+    if current_key is not None:
+        yield current_key, current
+
+# テストケースに必須の項目（ヘッダー名, Testcase の属性名）
+_REQUIRED_FIELDS = (
+    ("テストケース名", "name"), ("バージョン", "version"), ("サマリ（概要）", "summary"),
+    ("重要度", "importance"), ("実行タイプ", "exec_type"),
+)
+
+def check_required_fields(testcase, diagnostics=None):
+    """テストケース（1行目の値）に必須データがあるか確認する。不足していれば警告を表示（記録）して False を返す"""
+    for header, field in _REQUIRED_FIELDS:
+        if not getattr(testcase, field):
              # ステップ実行タイプはステップ行でチェックする or デフォルト値を使う
-             if header == "実行タイプ" and step_number_idx != -1 and first_row[step_number_idx].strip(): # ステップがあれば無視
+             if field == "exec_type" and testcase.steps and testcase.steps[0].line == 2: # 1行目がステップなら無視
                   continue
-             print(f"警告: 必須データ「{header}」が不足または空です。スキップします。")
-             missing_data = True
-             break
-    if missing_data:
+             warn(diagnostics, WARN_MISSING_REQUIRED, f"必須データ「{header}」が不足または空です。スキップします。", key=get_testcase_key(testcase))
+             return False
+    return True
+
+def build_testcase_element(root, testcase, diagnostics=None):
+    """Testcase からXML要素を構築する"""
+    if testcase is None or not testcase.row_count:
+        return
+
+    # 必須データの存在チェック
+    if not check_required_fields(testcase, diagnostics):
         return
 
     # <testcase> 要素の属性を設定 (順序を合わせる)
-    current_internal_id = first_row[id_idx].strip() if id_idx != -1 and id_idx < len(first_row) else ""
     tc_attributes = {}
-    if current_internal_id:
-        tc_attributes["internalid"] = current_internal_id
-    tc_attributes["name"] = first_row[testcase_name_idx].strip()
+    if testcase.internal_id:
+        tc_attributes["internalid"] = testcase.internal_id
+    tc_attributes["name"] = testcase.name
 
-    testcase = ET.SubElement(root, "testcase", attrib=tc_attributes)
+    testcase_elem = ET.SubElement(root, "testcase", attrib=tc_attributes)
 
     # TestLink形式に合わせて要素を追加（順序を保持）
     
     # <node_order>
-    node_order = ET.SubElement(testcase, "node_order")
+    node_order = ET.SubElement(testcase_elem, "node_order")
     node_order.text = "0"  # デフォルト値として0を設定
     
     # <externalid>
-    external_id_text = first_row[external_id_idx].strip() if external_id_idx != -1 and external_id_idx < len(first_row) else ""
-    external_id_elem = ET.SubElement(testcase, "externalid")
-    external_id_elem.text = external_id_text
+    external_id_elem = ET.SubElement(testcase_elem, "externalid")
+    external_id_elem.text = testcase.external_id
 
     # <version>
-    version_text = first_row[version_idx].strip() if version_idx < len(first_row) else "1"
-    version_elem = ET.SubElement(testcase, "version")
-    version_elem.text = version_text
+    version_elem = ET.SubElement(testcase_elem, "version")
+    version_elem.text = testcase.version
 
     # <summary>
-    summary_text = first_row[summary_idx].strip() if summary_idx < len(first_row) else ""
-    summary = ET.SubElement(testcase, "summary")
-    summary.text = text_to_html(summary_text)
+    summary = ET.SubElement(testcase_elem, "summary")
+    summary.text = text_to_html(testcase.summary)
 
     # <preconditions>
-    preconditions_text = first_row[preconditions_idx].strip() if preconditions_idx != -1 and preconditions_idx < len(first_row) else ""
-    preconditions = ET.SubElement(testcase, "preconditions")
-    preconditions.text = text_to_html(preconditions_text)
+    preconditions = ET.SubElement(testcase_elem, "preconditions")
+    preconditions.text = text_to_html(testcase.preconditions)
 
     # <execution_type> (Testcaseレベル) - 常に追加
-    tc_exec_type_text = first_row[exec_type_idx].strip() if exec_type_idx < len(first_row) else "1" # デフォルト Manual
-    exec_type_elem = ET.SubElement(testcase, "execution_type")
-    exec_type_elem.text = tc_exec_type_text
+    exec_type_elem = ET.SubElement(testcase_elem, "execution_type")
+    exec_type_elem.text = testcase.exec_type
 
     # <importance>
-    importance_text = first_row[importance_idx].strip() if importance_idx < len(first_row) else "2" # デフォルト Medium
-    importance = ET.SubElement(testcase, "importance")
-    importance.text = importance_text
+    importance = ET.SubElement(testcase_elem, "importance")
+    importance.text = testcase.importance
 
     # <estimated_exec_duration> - 常に追加（空でも）
-    exec_duration = ET.SubElement(testcase, "estimated_exec_duration")
-    if exec_duration_idx != -1 and exec_duration_idx < len(first_row) and first_row[exec_duration_idx].strip():
-        exec_duration.text = first_row[exec_duration_idx].strip()
-
-    # <status>
-    if status_idx != -1 and status_idx < len(first_row) and first_row[status_idx].strip():
-        status = ET.SubElement(testcase, "status")
-        status.text = first_row[status_idx].strip()
-    else:
-        # デフォルト値として1を設定
-        status = ET.SubElement(testcase, "status")
-        status.text = "1"
-
-    # <is_open>
-    if is_open_idx != -1 and is_open_idx < len(first_row) and first_row[is_open_idx].strip():
-        is_open = ET.SubElement(testcase, "is_open")
-        is_open.text = first_row[is_open_idx].strip()
-    else:
-        # デフォルト値として1を設定
-        is_open = ET.SubElement(testcase, "is_open")
-        is_open.text = "1"
-
-    # <active>
-    if is_active_idx != -1 and is_active_idx < len(first_row) and first_row[is_active_idx].strip():
-        active = ET.SubElement(testcase, "active")
-        active.text = first_row[is_active_idx].strip()
-    else:
-        # デフォルト値として1を設定
-        active = ET.SubElement(testcase, "active")
-        active.text = "1"
+    exec_duration = ET.SubElement(testcase_elem, "estimated_exec_duration")
+    if testcase.exec_duration:
+        exec_duration.text = testcase.exec_duration
+
+    # <status>, <is_open>, <active> - 値がなければデフォルト値として1を設定
+    status = ET.SubElement(testcase_elem, "status")
+    status.text = testcase.status or "1"
+    is_open = ET.SubElement(testcase_elem, "is_open")
+    is_open.text = testcase.is_open or "1"
+    active = ET.SubElement(testcase_elem, "active")
+    active.text = testcase.active or "1"
 
     # <steps> 要素 - TestLinkの順序に合わせる
-    build_steps_elements(testcase, testcase_rows, header_indices)
+    build_steps_elements(testcase_elem, testcase, diagnostics)
     
-    # カスタムフィールドの追加 - TestLinkの順序に合わせてstepsの後
-    if custom_fields_indices:
-        has_custom_fields = False
-        custom_fields_container = ET.SubElement(testcase, "custom_fields")
+    # カスタムフィールドの追加 - TestLinkの順序に合わせてstepsの後（値がある場合のみ）
+    custom_fields = [(cf_name, cf_value) for cf_name, cf_value in testcase.custom_fields if cf_value]
+    if custom_fields:
+        custom_fields_container = ET.SubElement(testcase_elem, "custom_fields")
         
-        for cf_name, cf_idx in custom_fields_indices.items():
-            cf_value = first_row[cf_idx].strip() if cf_idx < len(first_row) else ""
-            if cf_value:  # 値がある場合のみ追加
-                has_custom_fields = True
-                custom_field = ET.SubElement(custom_fields_container, "custom_field")
-                
-                name_elem = ET.SubElement(custom_field, "name")
-                name_elem.text = cf_name
-                
-                value_elem = ET.SubElement(custom_field, "value")
-                value_elem.text = cf_value
-        
-        # カスタムフィールド要素が空の場合は削除
-        if not has_custom_fields:
-            testcase.remove(custom_fields_container)
+        for cf_name, cf_value in custom_fields:
+            custom_field = ET.SubElement(custom_fields_container, "custom_field")
+            
+            name_elem = ET.SubElement(custom_field, "name")
+            name_elem.text = cf_name
+            
+            value_elem = ET.SubElement(custom_field, "value")
+            value_elem.text = cf_value
     
-    return testcase
+    return testcase_elem
 
 def add_optional_elements(testcase, row, header_indices):
     """オプショナル要素を追加する - 現在は使用していない（必要な要素は直接build_testcase_elementに記述）"""
     pass
 
-def build_steps_elements(testcase, testcase_rows, header_indices):
-    """ステップ要素を構築する"""
-    step_number_idx = header_indices["ステップ番号"]
-    actions_idx = header_indices["アクション（手順）"]
-    expected_idx = header_indices["期待結果"]
-    exec_type_idx = header_indices["実行タイプ"]
-    
+def build_steps_elements(testcase_elem, testcase, diagnostics=None):
+    """ステップ要素を構築する（ステップがない場合は追加しない）"""
+    if not testcase.steps:
+        return
     # <steps> 要素
-    steps_container = ET.SubElement(testcase, "steps")
-    step_line_num = 1 # グループ内の行番号 (デバッグ用)
-    for row in testcase_rows:
-        step_line_num += 1
-        # ステップ番号がある行のみステップとして処理
-        step_number = row[step_number_idx].strip() if step_number_idx != -1 and step_number_idx < len(row) else ""
-        if step_number:
-            # ステップに必要なデータのチェック
-            actions_text = row[actions_idx].strip() if actions_idx < len(row) else ""
-            expected_text = row[expected_idx].strip() if expected_idx < len(row) else ""
-            step_exec_type_text = row[exec_type_idx].strip() if exec_type_idx < len(row) else "1" # ステップ実行タイプ
-            if not actions_text or not expected_text:
-                 print(f"警告: ステップ番号 {step_number} (CSV行: {step_line_num}) でアクションまたは期待結果が空です。")
-
-            step = ET.SubElement(steps_container, "step")
-            step_num_elem = ET.SubElement(step, "step_number")
-            step_num_elem.text = step_number
-            actions = ET.SubElement(step, "actions")
-            actions.text = text_to_html(actions_text)
-            expected = ET.SubElement(step, "expectedresults")
-            expected.text = text_to_html(expected_text)
-            step_exec_type = ET.SubElement(step, "execution_type")
-            step_exec_type.text = step_exec_type_text
-
-    # ステップがない場合はsteps要素を削除
-    if not len(steps_container):
-        testcase.remove(steps_container)
+    steps_container = ET.SubElement(testcase_elem, "steps")
+    for step_data in testcase.steps:
+        # ステップに必要なデータのチェック
+        if not step_data.actions or not step_data.expected:
+             warn(diagnostics, WARN_EMPTY_STEP, f"ステップ番号 {step_data.number} (CSV行: {step_data.line}) でアクションまたは期待結果が空です。", key=get_testcase_key(testcase))
+
+        step = ET.SubElement(steps_container, "step")
+        step_num_elem = ET.SubElement(step, "step_number")
+        step_num_elem.text = step_data.number
+        actions = ET.SubElement(step, "actions")
+        actions.text = text_to_html(step_data.actions)
+        expected = ET.SubElement(step, "expectedresults")
+        expected.text = text_to_html(step_data.expected)
+        step_exec_type = ET.SubElement(step, "execution_type")
+        step_exec_type.text = step_data.exec_type # ステップ実行タイプ
 
 def create_root_element():
     """ルートのXML要素を作成する"""
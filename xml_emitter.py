@@ -0,0 +1,77 @@
+from text_utils import text_to_html
+from xml_utils import escape_xml
+from diagnostics import warn, WARN_EMPTY_STEP
+from xml_builder import check_required_fields, get_testcase_key
+
+def _cdata_line(indent, tag, text):
+    """値をCDATAで囲んだ1行の要素を返す（空白のみの値は空要素）"""
+    if not text or not text.strip():
+        return f"{indent}<{tag}></{tag}>"
+    return f"{indent}<{tag}><![CDATA[{text.replace(']]>', ']]]]><![CDATA[>')}]]></{tag}>"
+
+def _escaped_line(indent, tag, text):
+    """値をXMLエスケープした1行の要素を返す（空白のみの値は空要素）"""
+    if not text or not text.strip():
+        return f"{indent}<{tag}></{tag}>"
+    return f"{indent}<{tag}>{escape_xml(text)}</{tag}>"
+
+def testcase_to_xml(testcase, to_html=text_to_html, diagnostics=None):
+    """Testcase から <testcase> のXML文字列を直接生成する
+
+    要素ツリーを作らずに、xml_builder.build_testcase_element の結果を
+    xml_utils.element_to_string(testcase, "\\t") で出力したものと同じ文字列を返す。
+    必須データが不足している場合は None を返す。to_html はテキストをHTMLに変換する関数
+    （処理時間を計測する場合に置き換える）。diagnostics を指定すると、警告を表示せずに記録する。
+    """
+    if testcase is None or not testcase.row_count:
+        return None
+    if not check_required_fields(testcase, diagnostics):
+        return None
+
+    lines = []
+    append = lines.append
+
+    # <testcase> 要素の属性 (internalid, name の順)
+    internal_id = testcase.internal_id
+    id_attribute = f' internalid="{escape_xml(internal_id)}"' if internal_id else ""
+    append(f'\t<testcase{id_attribute} name="{escape_xml(testcase.name)}">')
+
+    append("\t\t<node_order><![CDATA[0]]></node_order>")
+    append(_cdata_line("\t\t", "externalid", testcase.external_id))
+    append(_cdata_line("\t\t", "version", testcase.version))
+    append(_cdata_line("\t\t", "summary", to_html(testcase.summary)))
+    append(_cdata_line("\t\t", "preconditions", to_html(testcase.preconditions)))
+    append(_cdata_line("\t\t", "execution_type", testcase.exec_type))
+    append(_cdata_line("\t\t", "importance", testcase.importance))
+    append(_escaped_line("\t\t", "estimated_exec_duration", testcase.exec_duration))
+    append(_cdata_line("\t\t", "status", testcase.status or "1"))
+    append(_cdata_line("\t\t", "is_open", testcase.is_open or "1"))
+    append(_cdata_line("\t\t", "active", testcase.active or "1"))
+
+    # <steps> - ステップがなければ出力しない
+    if testcase.steps:
+        append("\t\t<steps>")
+        for step in testcase.steps:
+            if not step.actions or not step.expected:
+                warn(diagnostics, WARN_EMPTY_STEP, f"ステップ番号 {step.number} (CSV行: {step.line}) でアクションまたは期待結果が空です。", key=get_testcase_key(testcase))
+            append("\t\t\t<step>")
+            append(_cdata_line("\t\t\t\t", "step_number", step.number))
+            append(_cdata_line("\t\t\t\t", "actions", to_html(step.actions)))
+            append(_cdata_line("\t\t\t\t", "expectedresults", to_html(step.expected)))
+            append(_cdata_line("\t\t\t\t", "execution_type", step.exec_type))
+            append("\t\t\t</step>")
+        append("\t\t</steps>")
+
+    # <custom_fields> - 値があるカスタムフィールドのみ。なければ出力しない
+    custom_fields = [(cf_name, cf_value) for cf_name, cf_value in testcase.custom_fields if cf_value]
+    if custom_fields:
+        append("\t\t<custom_fields>")
+        for cf_name, cf_value in custom_fields:
+            append("\t\t\t<custom_field>")
+            append(_cdata_line("\t\t\t\t", "name", cf_name))
+            append(_cdata_line("\t\t\t\t", "value", cf_value))
+            append("\t\t\t</custom_field>")
+        append("\t\t</custom_fields>")
+
+    append("\t</testcase>")
+    return "\n".join(lines)
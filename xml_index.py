@@ -0,0 +1,230 @@
+import json
+import mmap
+import os
+import re
+import xml.etree.ElementTree as ET
+from cdata_repair import iter_repaired_chunks
+from diagnostics import warn, WARN_INDEX_RESET
+from text_utils import SUITE_PATH_SEPARATOR
+
+# 索引ファイルの形式が変わった場合に上げる（古い索引は使わない）
+INDEX_VERSION = 1
+# XMLファイル名に付ける索引ファイルの接尾辞
+INDEX_SUFFIX = ".index.json"
+# 索引の作成中に進捗を記録する間隔（読み進めたバイト数）
+PROGRESS_INTERVAL = 4 * 1024 * 1024
+
+# テストケースの索引の各項目の位置
+(ENTRY_OFFSET, ENTRY_LENGTH, ENTRY_INTERNAL_ID, ENTRY_EXTERNAL_ID, ENTRY_NAME, ENTRY_SUITE, ENTRY_PATH) = range(7)
+# テストスイートの索引の各項目の位置
+(SUITE_OFFSET, SUITE_LENGTH, SUITE_PATH) = range(3)
+
+# testsuite / testcase の開始・終了タグと、タグとして扱わない CDATA・コメント・処理命令の始まり
+_TOKEN_RE = re.compile(rb'<(?:(!\[CDATA\[)|(!--)|(\?)|(/?)(testsuite|testcase)\b((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>)')
+_TOKEN_ENDS = {1: b"]]>", 2: b"-->", 3: b"?>"}
+# ルート要素の開始タグ（XML宣言・コメント・DOCTYPE は読み飛ばす）
+_ROOT_RE = re.compile(rb'<(?:!--.*?-->|\?.*?\?>|!DOCTYPE[^>]*>|([A-Za-z_][\w.:-]*))', re.DOTALL)
+_DECLARATION_RE = re.compile(rb'(?:\xef\xbb\xbf)?(<\?xml[^>]*\?>)')
+_EXTERNALID_RE = re.compile(rb'<externalid\s*>.*?</externalid\s*>', re.DOTALL)
+_CDATA_OPEN = b"<![CDATA["
+
+def get_index_path(xml_file):
+    """XMLファイルに対応する索引ファイルのパスを返す"""
+    return xml_file + INDEX_SUFFIX
+
+def _source_stat(xml_file):
+    """索引が対象のファイルと一致するか確認するための、ファイルサイズと更新日時"""
+    stat = os.stat(xml_file)
+    return [stat.st_size, stat.st_mtime_ns]
+
+def _parse_fragment(fragment, declaration):
+    """XMLファイルの一部（1つの要素）を、二重CDATAを修正してパースする（declaration はXML宣言）"""
+    if fragment.count(_CDATA_OPEN) > 1:
+        fragment = b"".join(iter_repaired_chunks([fragment]))
+    return ET.fromstring(declaration + fragment)
+
+def _start_tag_attributes(attributes, tag, declaration):
+    """開始タグの属性部分（バイト列）を辞書にする"""
+    attributes = attributes.rstrip(b"/")
+    return _parse_fragment(b"<" + tag + attributes + b"/>", declaration).attrib
+
+class XmlIndex:
+    """XMLファイル内の各 <testcase> と <testsuite> のバイト位置の索引
+
+    build() でファイルを1回走査して作成し、save() でXMLファイルの隣（get_index_path）に保存する。
+    select() で選んだテストケースは、iter_testcases() でファイルをメモリマップし、
+    その範囲だけをパースして取り出せるため、巨大なエクスポートから一部のテストケースだけを
+    変換する場合にファイル全体をパースせずに済む。
+    テストケースの索引は ENTRY_* の位置に (位置, 長さ, internalid, 外部ID, 名前, テストスイート名,
+    テストスイートのパス) を持つタプル、テストスイートの索引は SUITE_* の位置に (位置, 長さ, パス) を持つタプル。
+    テストスイート名は xml_processor.iter_testcases が返す名前と同じ。
+    """
+
+    def __init__(self, xml_file, declaration, testcases, testsuites, source=None):
+        self.xml_file = xml_file
+        self.declaration = declaration
+        self.testcases = testcases
+        self.testsuites = testsuites
+        self.source = source if source is not None else _source_stat(xml_file)
+
+    @classmethod
+    def build(cls, xml_file, progress=None):
+        """XMLファイルを走査して索引を作成する（CDATA・コメント内のタグは無視する）"""
+        source = _source_stat(xml_file)
+        testcases = []
+        testsuites = []
+        if progress is not None:
+            progress.total_bytes = source[0]
+        with open(xml_file, "rb") as f:
+            if not source[0]:
+                return cls(xml_file, b"", testcases, testsuites, source)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                match = _DECLARATION_RE.match(buf)
+                declaration = match.group(1) if match else b""
+                root_tag = None
+                for match in _ROOT_RE.finditer(buf):
+                    if match.group(1) is not None:
+                        root_tag = match.group(1)
+                        break
+
+                suite_starts = [] # 開いているテストスイートの (位置, パス)
+                testsuite_name = ""
+                seen_suite = False
+                testcase_start = None
+                testcase_attrib = None
+                next_report = PROGRESS_INTERVAL
+                pos = 0
+                while True:
+                    match = _TOKEN_RE.search(buf, pos)
+                    if match is None:
+                        break
+                    pos = match.end()
+                    if progress is not None and pos >= next_report:
+                        progress.update_bytes(pos)
+                        next_report = pos + PROGRESS_INTERVAL
+                    skipped = match.lastindex if match.lastindex in _TOKEN_ENDS else None
+                    if skipped is not None:
+                        # CDATA・コメント・処理命令の中身は読み飛ばす
+                        end = buf.find(_TOKEN_ENDS[skipped], pos)
+                        pos = len(buf) if end < 0 else end + len(_TOKEN_ENDS[skipped])
+                        continue
+
+                    closing, tag, attributes = match.group(4), match.group(5), match.group(6)
+                    self_closing = attributes.endswith(b"/")
+                    if tag == b"testsuite":
+                        if not closing:
+                            name = _start_tag_attributes(attributes, tag, declaration).get("name", "")
+                            # xml_processor.iter_testcases と同じ規則でテストスイート名を決める
+                            if root_tag == b"testsuite":
+                                if not seen_suite:
+                                    testsuite_name = name
+                            elif root_tag != b"testcases" and not testsuite_name:
+                                testsuite_name = name
+                            seen_suite = True
+                            suite_starts.append((match.start(), suite_starts[-1][1] + SUITE_PATH_SEPARATOR + name if suite_starts else name))
+                        if (closing or self_closing) and suite_starts:
+                            start, path = suite_starts.pop()
+                            testsuites.append((start, match.end() - start, path))
+                        continue
+
+                    if not closing:
+                        testcase_start = match.start()
+                        testcase_attrib = _start_tag_attributes(attributes, tag, declaration)
+                    if (closing or self_closing) and testcase_start is not None:
+                        end = match.end()
+                        externalid = ""
+                        id_match = _EXTERNALID_RE.search(buf, testcase_start, end)
+                        if id_match is not None:
+                            externalid = (_parse_fragment(id_match.group(), declaration).text or "").strip()
+                        testcases.append((
+                            testcase_start, end - testcase_start,
+                            testcase_attrib.get("internalid", ""), externalid, testcase_attrib.get("name", ""),
+                            testsuite_name, suite_starts[-1][1] if suite_starts else "",
+                        ))
+                        testcase_start = None
+        if progress is not None:
+            progress.update_bytes(source[0])
+        testsuites.sort()
+        return cls(xml_file, declaration, testcases, testsuites, source)
+
+    def save(self, index_file=None):
+        """索引をJSONファイルに書き込む（書き込み途中のファイルは残さない）。書き込んだパスを返す"""
+        index_file = index_file or get_index_path(self.xml_file)
+        temp_path = index_file + ".tmp"
+        data = {
+            "version": INDEX_VERSION,
+            "source": self.source,
+            "declaration": self.declaration.decode("latin-1"),
+            "testcases": self.testcases,
+            "testsuites": self.testsuites,
+        }
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, index_file)
+        return index_file
+
+    @classmethod
+    def load(cls, xml_file, index_file=None, diagnostics=None):
+        """保存した索引を読み込む。索引がないか、形式が古いか、XMLファイルが索引の作成後に変更されていれば None
+
+        索引ファイルを読み込めない場合も None で、diagnostics（ConversionDiagnostics）を指定すると、その警告を記録する。
+        """
+        index_file = index_file or get_index_path(xml_file)
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            warn(diagnostics, WARN_INDEX_RESET, f"索引ファイルを読み込めません。索引を作成し直します: {str(e)}")
+            return None
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION or data.get("source") != _source_stat(xml_file):
+            return None
+        return cls(
+            xml_file, data["declaration"].encode("latin-1"),
+            [tuple(entry) for entry in data["testcases"]], [tuple(entry) for entry in data["testsuites"]],
+            data["source"],
+        )
+
+    @classmethod
+    def open(cls, xml_file, index_file=None, progress=None, diagnostics=None):
+        """保存した索引が使えればそれを、使えなければ索引を作成・保存して返す（diagnostics は load と同じ）"""
+        index = cls.load(xml_file, index_file, diagnostics)
+        if index is None:
+            index = cls.build(xml_file, progress)
+            index.save(index_file)
+        return index
+
+    def select(self, internal_ids=(), external_ids=(), names=(), suites=()):
+        """指定した internalid・外部ID・名前・テストスイートのパス（その下位を含む）のいずれかに一致する
+        テストケースの索引をファイル内の順に返す。何も指定しなければすべてのテストケース
+        """
+        if not (internal_ids or external_ids or names or suites):
+            return list(self.testcases)
+        internal_ids, external_ids, names, suites = set(internal_ids), set(external_ids), set(names), set(suites)
+        prefixes = tuple(suite + SUITE_PATH_SEPARATOR for suite in suites)
+        return [
+            entry for entry in self.testcases
+            if entry[ENTRY_INTERNAL_ID] in internal_ids or entry[ENTRY_EXTERNAL_ID] in external_ids
+            or entry[ENTRY_NAME] in names
+            or entry[ENTRY_PATH] in suites or entry[ENTRY_PATH].startswith(prefixes)
+        ]
+
+    def iter_testcases(self, entries, suite_path=False, progress=None):
+        """索引の範囲だけをパースし、(testcase要素, テストスイート名) を順に返す（xml_processor.iter_testcases と同じ形式）
+
+        suite_path が真の場合、テストスイート名の代わりにテストスイートのパスを返す。
+        """
+        if progress is not None:
+            progress.total_testcases = len(entries)
+        if not entries:
+            return
+        with open(self.xml_file, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                for entry in entries:
+                    offset = entry[ENTRY_OFFSET]
+                    try:
+                        testcase = _parse_fragment(buf[offset:offset + entry[ENTRY_LENGTH]], self.declaration)
+                    except ET.ParseError as pe:
+                        raise ValueError(f"XMLの解析に失敗しました（位置 {offset}）: {pe}")
+                    yield testcase, entry[ENTRY_PATH] if suite_path else entry[ENTRY_SUITE]
@@ -1,8 +1,17 @@
 import xml.etree.ElementTree as ET
 import csv
 import re
-import codecs
+import os
 import traceback
+from text_cache import cached_text_function
+from parallel_utils import iter_chunks, ordered_parallel_map, DEFAULT_CHUNK_SIZE
+from csv_reader import DEFAULT_OUTPUT_ENCODING, open_csv_output
+from metrics import timed_iter, phase, count, timed_function, profiling
+from progress import ConversionCancelled, advance
+from cdata_repair import iter_repaired_chunks
+from incremental_cache import element_digest
+from testcase_model import Testcase, Step
+from text_utils import SUITE_PATH_SEPARATOR
 
 def fix_double_cdata(xml_content):
     """二重CDATAタグの問題を修正する"""
@@ -42,143 +51,572 @@ def parse_xml_root(xml_content):
 
 def get_element_text(element, tag_name):
     """指定されたタグの要素テキストを取得する (CDATA対応強化)"""
-    tag = element.find(tag_name)
+    return _element_text(element.find(tag_name))
+
+def index_children(element):
+    """子要素をタグ名で引ける辞書を作る（同じタグが複数ある場合は find と同じく最初の要素）"""
+    return {child.tag: child for child in reversed(element)}
+
+def get_child_text(children, tag_name):
+    """index_children の辞書から、指定されたタグの要素テキストを取得する（get_element_text と同じ結果）"""
+    return _element_text(children.get(tag_name))
+
+def _element_text(tag):
+    """要素のテキストを前後の空白を除いて返す。テキスト中にCDATAの記述が残っていれば取り除く"""
     if tag is not None:
         text = tag.text
         if text:
-             text = re.sub(r'<!\[CDATA\[(.*?)\]\]>', r'\1', text, flags=re.DOTALL)
+             # CDATAはパース時に取り除かれるため、テキストとして残っている場合のみ置換する
+             if '<![CDATA[' in text:
+                 text = _CDATA_RE.sub(r'\1', text)
              return text.strip()
     return ""
 
+# clean_html で使用する正規表現（呼び出し毎のコンパイルを避けるため事前にコンパイル）
+_CDATA_RE = re.compile(r'<!\[CDATA\[(.*?)\]\]>', re.DOTALL)
+_P_RE = re.compile(r'<p>(.*?)</p>', re.DOTALL | re.IGNORECASE)
+_BR_RE = re.compile(r'<br\s*/?>', re.IGNORECASE)
+# リストの開始・終了タグと項目のタグ
+_LIST_TAG_RE = re.compile(r'<(/?)(ul|ol|li)\b[^>]*>', re.IGNORECASE)
+_OTHER_TAG_RE = re.compile(r'<(?!\/?(p|br|ul|ol|li)\b)[^>]+>', re.IGNORECASE)
+_SPACES_RE = re.compile(r'[ \t]+')
+_BLANK_LINES_RE = re.compile(r'\n\s*\n+')
+
+def _finish_html(text):
+    """構造タグ処理後のテキストから残りのタグを除去し、エンティティをデコードして空白を整理する"""
+    # その他タグ除去
+    if '<' in text:
+        text = _OTHER_TAG_RE.sub('', text)
+    # HTMLエンティティデコード
+    if '&' in text:
+        text = text.replace("&nbsp;", " ").replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&").replace("&quot;", "\"").replace("&#39;", "'")
+    # 空白・改行整理（置換対象がない場合は正規表現を実行しない）
+    if '\t' in text or '  ' in text:
+        text = _SPACES_RE.sub(' ', text)
+    if text.count('\n') > 1:
+        text = _BLANK_LINES_RE.sub('\n', text)
+    return text.strip()
+
+def _render_list(frame):
+    """閉じたリスト（_convert_lists のフレーム）を、項目の各行に「・」を付けた前後を改行で区切った文字列にする"""
+    kind, lines, item = frame
+    if item is not None:
+        _add_item_lines(item, lines)
+    return '\n' + '\n'.join(lines) + '\n' if lines else '\n'
+
+def _add_item_lines(item, lines):
+    """項目の内容（文字列のリスト）を行に分け、空でない各行に「・」を付けて lines に加える"""
+    for line in "".join(item).split('\n'):
+        line = line.strip()
+        if line:
+            lines.append("・" + line)
+
+def _convert_lists(text, match):
+    """リスト（<ul>/<ol> と <li>）を、リストのタグを1回走査して項目毎の「・」付きの行に変換する
+
+    match は最初のリストのタグ。入れ子のリストの項目は外側の項目とは別の行（「・・」）になる。
+    リスト内で <li> の外にあるテキストは捨てる。閉じタグのない <li> は次の <li> やリストの終わりで、
+    閉じタグのないリストは外側のリストの終わりか文字列の終わりで閉じたものとする。
+    リスト外の <li> は1項目のリストとして扱い、対応する開始タグのない閉じタグは無視する。
+    """
+    out = [text[:match.start()]]
+    stack = [] # 開いているリストのフレーム [種類（リスト外の <li> は None）, 行のリスト, 処理中の項目 or None]
+    pos = match.start()
+
+    def close_top():
+        rendered = _render_list(stack.pop())
+        if not stack:
+            out.append(rendered)
+        elif stack[-1][2] is not None:
+            stack[-1][2].append(rendered)
+
+    for match in _LIST_TAG_RE.finditer(text, pos):
+        chunk = text[pos:match.start()]
+        pos = match.end()
+        if not stack:
+            out.append(chunk)
+        elif stack[-1][2] is not None:
+            stack[-1][2].append(chunk)
+
+        closing, kind = match.group(1), match.group(2).lower()
+        if kind == "li":
+            if stack and stack[-1][0] is None and (closing or stack[-1][2] is not None):
+                # リスト外の <li> の終わり
+                close_top()
+                if closing:
+                    continue
+            if closing:
+                if stack and stack[-1][2] is not None:
+                    _add_item_lines(stack[-1][2], stack[-1][1])
+                    stack[-1][2] = None
+                continue
+            if not stack:
+                stack.append([None, [], []])
+                continue
+            if stack[-1][2] is not None:
+                _add_item_lines(stack[-1][2], stack[-1][1])
+            stack[-1][2] = []
+        elif not closing:
+            stack.append([kind, [], None])
+        elif any(frame[0] == kind for frame in stack):
+            # 内側の閉じていないリストも閉じる
+            while stack[-1][0] != kind:
+                close_top()
+            close_top()
+
+    if not stack:
+        out.append(text[pos:])
+    elif stack[-1][2] is not None:
+        stack[-1][2].append(text[pos:])
+    while stack:
+        close_top()
+    return "".join(out)
+
+@cached_text_function
 def clean_html(text):
-    """HTMLタグを適切に処理してプレーンテキストに変換する"""
+    """HTMLタグを適切に処理してプレーンテキストに変換する
+
+    リスト（<ul>/<ol> と <li>）は項目毎に「・」を付けた行にする（入れ子の項目は「・・」）。
+    以前の実装はリストの内容を捨てていたため、リストを含むテキストだけは以前と出力が異なる。
+    """
     if not text:
         return ""
     # CDATA除去
-    text = re.sub(r'<!\[CDATA\[(.*?)\]\]>', r'\1', text, flags=re.DOTALL)
+    if '<![CDATA[' in text:
+        text = _CDATA_RE.sub(r'\1', text)
+    if '<' not in text:
+        # タグがなければ構造タグの置換は不要
+        return _finish_html(text)
     # <p> -> 改行
-    text = re.sub(r'<p>(.*?)</p>', lambda m: m.group(1).strip() + '\n', text, flags=re.DOTALL | re.IGNORECASE)
+    text = _P_RE.sub(lambda m: m.group(1).strip() + '\n', text)
     # <br> -> 改行
-    text = re.sub(r'<br\s*/?>', '\n', text, flags=re.IGNORECASE)
+    text = _BR_RE.sub('\n', text)
     # リスト処理
-    def replace_list(match):
-        list_content = match.group(1)
-        items = re.findall(r'<li.*?>(.*?)</li>', list_content, flags=re.DOTALL | re.IGNORECASE)
-        plain_items = []
-        for item in items:
-            cleaned_item = clean_html(item).strip() # 再帰呼び出しでネストに対応
-            lines = [f"・{line.strip()}" for line in cleaned_item.split('\n') if line.strip()]
-            plain_items.extend(lines)
-        return '\n'.join(plain_items) + '\n' if plain_items else '\n'
-    text = re.sub(r'<(ul|ol).*?>(.*?)</\1>', replace_list, text, flags=re.DOTALL | re.IGNORECASE)
-    # 残った<li>処理
-    text = re.sub(r'<li.*?>(.*?)</li>', lambda m: '・' + clean_html(m.group(1)).strip() + '\n', text, flags=re.DOTALL | re.IGNORECASE)
-    # その他タグ除去
-    text = re.sub(r'<(?!\/?(p|br|ul|ol|li)\b)[^>]+>', '', text, flags=re.IGNORECASE)
-    # HTMLエンティティデコード
-    text = text.replace("&nbsp;", " ").replace("&lt;", "<").replace("&gt;", ">").replace("&amp;", "&").replace("&quot;", "\"").replace("&#39;", "'")
-    # 空白・改行整理
-    text = re.sub(r'[ \t]+', ' ', text)
-    text = re.sub(r'\n\s*\n+', '\n', text)
-    return text.strip()
+    match = _LIST_TAG_RE.search(text)
+    if match is not None:
+        text = _convert_lists(text, match)
+    # その他タグ除去・HTMLエンティティデコード・空白・改行整理
+    return _finish_html(text)
 
-def convert_xml_to_csv(testcases_root, testsuite_name, output_csv_file):
-    """XML要素ツリーからデータを抽出し、CSVファイルに書き込む"""
-    try:
-        rows = []
-        
-        # カスタムフィールドの一覧（必要なフィールドをここで定義）
-        custom_field_names = [
-            "AutomationAction", "AutomationParameters", "AutomationEnabled", 
-            "AutomationTargetNode", "AutomationValidation"
-        ]
-        
-        # ヘッダー行にカスタムフィールド名を追加
-        headers = [
-            "ID", "外部ID", "バージョン", "テストケース名", "サマリ（概要）",
-            "重要度", "事前条件", "ステップ番号", "アクション（手順）", "期待結果",
-            "実行タイプ", "推定実行時間", "ステータス", "有効/無効", "開いているか",
-            "親テストスイート名"
-        ]
-        # カスタムフィールドをヘッダーに追加
-        headers.extend(custom_field_names)
-        rows.append(headers)
-
-        # testcases_root (testsuite または testcases 要素) から testcase を検索
-        for testcase in testcases_root.findall(".//testcase"):
-            # テストケース基本情報の取得
-            testcase_id = testcase.get("internalid", "")
-            external_id = get_element_text(testcase, "externalid")
-            version = get_element_text(testcase, "version")
-            testcase_name = testcase.get("name", "")
-            summary = clean_html(get_element_text(testcase, "summary"))
-            importance = get_element_text(testcase, "importance")
-            preconditions = clean_html(get_element_text(testcase, "preconditions"))
-            
-            # テストケースレベルの実行タイプ取得
-            tc_exec_type_elem = testcase.find("execution_type")
-            tc_exec_type = tc_exec_type_elem.text.strip() if tc_exec_type_elem is not None and tc_exec_type_elem.text else ""
-
-            # その他のテストケース属性
-            exec_duration = get_element_text(testcase, "estimated_exec_duration")
-            status = get_element_text(testcase, "status")
-            is_active = get_element_text(testcase, "active")
-            is_open = get_element_text(testcase, "is_open")
-
-            # カスタムフィールドの値を取得
-            custom_field_values = {}
-            custom_fields_elem = testcase.find("custom_fields")
-            if custom_fields_elem is not None:
-                for cf in custom_fields_elem.findall("custom_field"):
-                    cf_name = get_element_text(cf, "name")
-                    cf_value = get_element_text(cf, "value")
-                    if cf_name:
-                        custom_field_values[cf_name] = cf_value
-
-            steps = testcase.find("steps")
-            if steps is not None and len(steps) > 0:
-                # ステップがある場合は各ステップ毎に行を出力
-                for step in steps.findall("step"):
-                    step_number = get_element_text(step, "step_number")
-                    actions = clean_html(get_element_text(step, "actions"))
-                    expected = clean_html(get_element_text(step, "expectedresults"))
-                    
-                    # ステップレベルの実行タイプを取得（なければテストケースのものを使用）
-                    step_exec_type_elem = step.find("execution_type")
-                    step_exec_type = step_exec_type_elem.text.strip() if step_exec_type_elem is not None and step_exec_type_elem.text else tc_exec_type
-
-                    row = [
-                        testcase_id, external_id, version, testcase_name, summary,
-                        importance, preconditions, step_number, actions, expected,
-                        step_exec_type, exec_duration, status, is_active, is_open,
-                        testsuite_name
-                    ]
-                    
-                    # カスタムフィールド値を追加
-                    for cf_name in custom_field_names:
-                        row.append(custom_field_values.get(cf_name, ""))
-                    
-                    rows.append(row)
-            else:
-                # ステップがない場合は1行のみ出力
-                row = [
-                    testcase_id, external_id, version, testcase_name, summary,
-                    importance, preconditions, "", "", "", # ステップ関連は空
-                    tc_exec_type, exec_duration, status, is_active, is_open,
-                    testsuite_name
-                ]
-                
-                # カスタムフィールド値を追加
-                for cf_name in custom_field_names:
-                    row.append(custom_field_values.get(cf_name, ""))
-                
-                rows.append(row)
-
-        # CSVファイル書き込み
-        with codecs.open(output_csv_file, 'w', 'shift_jis', errors='ignore') as f:
+# カスタムフィールドの一覧（必要なフィールドをここで定義）
+CUSTOM_FIELD_NAMES = [
+    "AutomationAction", "AutomationParameters", "AutomationEnabled", 
+    "AutomationTargetNode", "AutomationValidation"
+]
+
+# CSVのヘッダー行（末尾にカスタムフィールド名を追加）
+CSV_HEADERS = [
+    "ID", "外部ID", "バージョン", "テストケース名", "サマリ（概要）",
+    "重要度", "事前条件", "ステップ番号", "アクション（手順）", "期待結果",
+    "実行タイプ", "推定実行時間", "ステータス", "有効/無効", "開いているか",
+    "親テストスイート名"
+] + CUSTOM_FIELD_NAMES
+
+# テストスイート毎のCSVファイル名に使えない文字
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+# フィルタの項目（Testcase の属性名）と、その値を持つ testcase 要素の子要素
+_FILTER_CHILD_TAGS = {
+    "external_id": "externalid", "importance": "importance", "status": "status",
+    "active": "active", "is_open": "is_open",
+}
+
+# ストリーミング変換時に一度に読み込むバイト数
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+def _exec_type_text(element):
+    """実行タイプの要素のテキスト（CDATAの除去はしない）。要素がないか空の場合は None"""
+    if element is not None and element.text:
+        return element.text.strip()
+    return None
+
+def _element_custom_fields(children):
+    """index_children の辞書から、カスタムフィールドの (名前, 値) のリストを取得する"""
+    custom_fields = []
+    custom_fields_elem = children.get("custom_fields")
+    if custom_fields_elem is not None:
+        for cf in custom_fields_elem.findall("custom_field"):
+            cf_children = index_children(cf)
+            cf_name = get_child_text(cf_children, "name")
+            if cf_name:
+                custom_fields.append((cf_name, get_child_text(cf_children, "value")))
+    return custom_fields
+
+def element_to_testcase(testcase, testsuite_name, clean=clean_html):
+    """testcase要素から Testcase を作る
+
+    clean はHTMLをテキストに変換する関数（処理時間を計測する場合に置き換える）。
+    """
+    # 子要素をタグ名で引けるようにする（フィールド毎に find で子要素を走査しない）
+    children = index_children(testcase)
+
+    # テストケースレベルの実行タイプ取得
+    tc_exec_type = _exec_type_text(children.get("execution_type")) or ""
+
+    # カスタムフィールドの値を取得
+    custom_fields = _element_custom_fields(children)
+
+    # ステップ（<steps> がないか空の場合は None）
+    steps = None
+    steps_elem = children.get("steps")
+    if steps_elem is not None and len(steps_elem) > 0:
+        steps = []
+        for step in steps_elem.findall("step"):
+            step_children = index_children(step)
+            # ステップレベルの実行タイプ（なければテストケースのものを使用）
+            step_exec_type = _exec_type_text(step_children.get("execution_type"))
+            steps.append(Step(
+                get_child_text(step_children, "step_number"),
+                clean(get_child_text(step_children, "actions")),
+                clean(get_child_text(step_children, "expectedresults")),
+                tc_exec_type if step_exec_type is None else step_exec_type,
+            ))
+
+    return Testcase(
+        testcase.get("internalid", ""),
+        get_child_text(children, "externalid"),
+        get_child_text(children, "version"),
+        testcase.get("name", ""),
+        clean(get_child_text(children, "summary")),
+        get_child_text(children, "importance"),
+        clean(get_child_text(children, "preconditions")),
+        tc_exec_type,
+        get_child_text(children, "estimated_exec_duration"),
+        get_child_text(children, "status"),
+        get_child_text(children, "active"),
+        get_child_text(children, "is_open"),
+        testsuite_name,
+        custom_fields,
+        steps,
+        len(steps) if steps is not None else 1,
+    )
+
+def testcase_model_to_rows(testcase):
+    """Testcase からCSVの行（ステップ毎に1行、ステップがなければ1行）のリストを生成する"""
+    head = [
+        testcase.internal_id, testcase.external_id, testcase.version, testcase.name, testcase.summary,
+        testcase.importance, testcase.preconditions,
+    ]
+    tail = [testcase.exec_duration, testcase.status, testcase.active, testcase.is_open, testcase.suite]
+    # カスタムフィールド値（同じ名前が複数ある場合は後のもの）
+    custom_field_values = dict(testcase.custom_fields)
+    tail += [custom_field_values.get(cf_name, "") for cf_name in CUSTOM_FIELD_NAMES]
+
+    if testcase.steps is None:
+        # ステップがない場合は1行のみ出力（ステップ関連は空）
+        return [head + ["", "", "", testcase.exec_type] + tail]
+    return [head + [step.number, step.actions, step.expected, step.exec_type] + tail for step in testcase.steps]
+
+def testcase_to_rows(testcase, testsuite_name, clean=clean_html):
+    """testcase要素からCSVの行（ステップ毎に1行）のリストを生成する"""
+    return testcase_model_to_rows(element_to_testcase(testcase, testsuite_name, clean))
+
+def element_filter_field(testcase, children, testsuite_name, field):
+    """フィルタの項目（Testcase の属性名）に対応する testcase 要素の値を、HTMLを変換せずに取得する"""
+    if field == "internal_id":
+        return testcase.get("internalid", "")
+    if field == "name":
+        return testcase.get("name", "")
+    if field == "suite":
+        return testsuite_name
+    if field == "exec_type":
+        return _exec_type_text(children.get("execution_type"))
+    return get_child_text(children, _FILTER_CHILD_TAGS[field])
+
+def filter_testcase_elements(testcases, testcase_filter, progress=None, metrics=None):
+    """(testcase要素, テストスイート名) のうち testcase_filter（testcase_filter.TestcaseFilter）に一致するものだけを返す
+
+    判定は属性と子要素のテキストだけで行い、サマリやステップのHTMLは変換しない。
+    除外したテストケースも進捗に数え、metrics を指定すると除外数を filtered_out として記録する。
+    """
+    for testcase, testsuite_name in testcases:
+        children = index_children(testcase)
+        if testcase_filter.match(
+            lambda field: element_filter_field(testcase, children, testsuite_name, field),
+            lambda: dict(_element_custom_fields(children)),
+        ):
+            yield testcase, testsuite_name
+            continue
+        advance(progress, 1, 0)
+        count(metrics, "filtered_out")
+
+def testcase_chunk_to_models(chunk):
+    """(testcase要素のXMLバイト列, テストスイート名) のリストを Testcase のリストに変換する（並列変換のワーカー用）"""
+    return [element_to_testcase(ET.fromstring(testcase_xml), testsuite_name) for testcase_xml, testsuite_name in chunk]
+
+def testcase_cache_key(testcase):
+    """差分変換のキャッシュでテストケースを識別するキー（internalid、外部ID、名前の順に使用）を返す。なければ空文字"""
+    internal_id = testcase.get("internalid", "").strip()
+    if internal_id:
+        return f"ID_{internal_id}"
+    external_id = get_element_text(testcase, "externalid")
+    if external_id:
+        return f"EXT_{external_id}"
+    name = testcase.get("name", "").strip()
+    if name:
+        return f"NAME_{name}"
+    return ""
+
+def cached_element_to_testcase(cache, testcase, testsuite_name, clean=clean_html):
+    """内容が前回から変わっていなければキャッシュの Testcase を返し、変わっていれば変換してキャッシュに加える"""
+    key = testcase_cache_key(testcase)
+    if not key:
+        return element_to_testcase(testcase, testsuite_name, clean)
+    digest = element_digest(testcase, testsuite_name)
+    model = cache.lookup(key, digest)
+    if model is None:
+        model = element_to_testcase(testcase, testsuite_name, clean)
+        cache.store(key, digest, model)
+    return model
+
+def iter_testcase_rows(testcases, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, cache=None, metrics=None, testcase_filter=None):
+    """(testcase要素, テストスイート名) を順にCSV行へ変換して返す
+
+    workers が2以上の場合はテストケースを chunk_size 件ずつワーカープロセスで変換し、
+    元の順序で結果を返す。progress を指定するとテストケース毎に進捗を記録する。
+    cache（ConversionCache）を指定すると、前回から変わっていないテストケースは変換結果を再利用する。
+    この場合は変換するテストケースが少ないため並列化しない。
+    metrics を指定すると、テストケース数（testcases）と行数（rows）を記録する。
+    testcase_filter（testcase_filter.TestcaseFilter）を指定すると、一致しないテストケースは
+    キャッシュの参照やワーカーへの受け渡しの前に除外する。
+    """
+    clean = timed_function(metrics, "clean_html", clean_html)
+    if testcase_filter is not None:
+        testcases = timed_iter(metrics, "filter", filter_testcase_elements(testcases, testcase_filter, progress, metrics))
+    if cache is not None:
+        models = (cached_element_to_testcase(cache, testcase, testsuite_name, clean) for testcase, testsuite_name in testcases)
+    elif not workers or workers <= 1:
+        models = (element_to_testcase(testcase, testsuite_name, clean) for testcase, testsuite_name in testcases)
+    else:
+        # 要素は呼び出し元で解放されるため、ワーカーにはXMLバイト列として渡す
+        serialized = ((ET.tostring(testcase, encoding="utf-8"), testsuite_name) for testcase, testsuite_name in testcases)
+        chunks = ordered_parallel_map(testcase_chunk_to_models, iter_chunks(serialized, chunk_size), workers)
+        models = (model for chunk in chunks for model in chunk)
+
+    for model in models:
+        rows = testcase_model_to_rows(model)
+        advance(progress, 1, len(rows))
+        count(metrics, "testcases")
+        count(metrics, "rows", len(rows))
+        yield from rows
+
+def write_csv_rows(output_csv_file, rows, encoding=DEFAULT_OUTPUT_ENCODING, metrics=None):
+    """ヘッダー行と rows をCSVファイルに逐次書き込む"""
+    with phase(metrics, "write"):
+        with open_csv_output(output_csv_file, encoding) as f:
             writer = csv.writer(f, quoting=csv.QUOTE_ALL)
-            writer.writerows(rows)
+            writer.writerow(CSV_HEADERS)
+            writer.writerows(timed_iter(metrics, "transform", rows))
 
-    except Exception as e:
-        # ここで発生したエラーは呼び出し元 (main_app) に伝播させる
-        raise Exception(f"XMLからCSVへの変換処理中にエラーが発生しました: {str(e)}\n{traceback.format_exc()}")
\ No newline at end of file
+def convert_xml_to_csv(testcases_root, testsuite_name, output_csv_file, workers=None, encoding=DEFAULT_OUTPUT_ENCODING, metrics=None, progress=None, cache=None,
+                       testcase_filter=None):
+    """XML要素ツリーからデータを抽出し、CSVファイルに書き込む（workers が2以上ならテストケースを並列変換）
+
+    testcase_filter（testcase_filter.TestcaseFilter）を指定すると、一致するテストケースだけを変換する。
+    """
+    with profiling(metrics):
+        try:
+            # testcases_root (testsuite または testcases 要素) から testcase を検索
+            testcase_elements = testcases_root.findall(".//testcase")
+            if progress is not None:
+                progress.total_testcases = len(testcase_elements)
+            testcases = ((testcase, testsuite_name) for testcase in testcase_elements)
+            # CSVファイル書き込み（テストケース毎に逐次書き出す）
+            rows = iter_testcase_rows(testcases, workers, progress=progress, cache=cache, metrics=metrics, testcase_filter=testcase_filter)
+            write_csv_rows(output_csv_file, rows, encoding, metrics)
+            if cache is not None:
+                cache.save()
+
+        except ConversionCancelled:
+            raise
+        except Exception as e:
+            # ここで発生したエラーは呼び出し元 (main_app) に伝播させる
+            raise Exception(f"XMLからCSVへの変換処理中にエラーが発生しました: {str(e)}\n{traceback.format_exc()}")
+
+def iter_xml_file_chunks(xml_file, chunk_size=STREAM_CHUNK_SIZE, progress=None):
+    """XMLファイルをバイト列のチャンク単位で順に返す"""
+    if progress is not None:
+        progress.total_bytes = os.path.getsize(xml_file)
+    with open(xml_file, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            if progress is not None:
+                progress.update_bytes(f.tell())
+            yield chunk
+
+def iter_testcases(xml_file, metrics=None, progress=None, suite_path=False):
+    """XMLファイルを逐次パースし、(testcase要素, テストスイート名) を1件ずつ返す
+
+    返した testcase 要素は次の要素を読む前に解放されるため、
+    ファイルサイズに関係なくメモリ使用量はほぼ一定になる。
+    suite_path が真の場合、テストスイート名の代わりにルートからテストケースを含む
+    テストスイートまでの名前を SUITE_PATH_SEPARATOR でつないだパスを返す。
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack = []
+    testsuite_name = ""
+    root_tag = None
+    suite_names = [] # 現在のテストスイートのパス
+
+    def read_events():
+        nonlocal testsuite_name, root_tag
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root_tag is None:
+                    # ルート要素が testsuite か testcases かを判定
+                    root_tag = elem.tag
+                    if root_tag == "testsuite":
+                        testsuite_name = elem.get("name", "")
+                elif root_tag not in ("testsuite", "testcases") and elem.tag == "testsuite" and not testsuite_name:
+                    # 想定外の形式の場合、最初の testsuite の名前を使う
+                    testsuite_name = elem.get("name", "")
+                if elem.tag == "testsuite":
+                    suite_names.append(elem.get("name", ""))
+                stack.append(elem)
+            else:
+                stack.pop()
+                if elem.tag == "testcase":
+                    yield elem, SUITE_PATH_SEPARATOR.join(suite_names) if suite_path else testsuite_name
+                    # 処理済みの要素を親から切り離して解放する
+                    if stack:
+                        stack[-1].remove(elem)
+                    elem.clear()
+                elif elem.tag == "testsuite":
+                    suite_names.pop()
+                    if stack:
+                        # 処理済みのサブスイートも同様に解放する
+                        stack[-1].remove(elem)
+
+    try:
+        chunks = timed_iter(metrics, "read", iter_xml_file_chunks(xml_file, progress=progress))
+        for chunk in timed_iter(metrics, "cdata_repair", iter_repaired_chunks(chunks)):
+            parser.feed(chunk)
+            yield from read_events()
+        parser.close()
+        yield from read_events()
+    except ET.ParseError as pe:
+        raise ValueError(f"XMLの解析に失敗しました: {pe}")
+
+def iter_source_testcases(xml_file, metrics=None, progress=None, suite_path=False, index=None, entries=None):
+    """index（xml_index.XmlIndex）があれば entries（index.select の結果、省略時はすべて）の範囲だけをパースし、
+    なければファイル全体を iter_testcases でパースして、(testcase要素, テストスイート名) を順に返す
+    """
+    if index is None:
+        return iter_testcases(xml_file, metrics, progress, suite_path)
+    return index.iter_testcases(index.select() if entries is None else entries, suite_path, progress)
+
+def convert_xml_file_to_csv(xml_file, output_csv_file, workers=None, encoding=DEFAULT_OUTPUT_ENCODING, metrics=None, progress=None, cache=None, suite_path=False,
+                            index=None, entries=None, testcase_filter=None):
+    """XMLファイルをストリーミングでパースし、テストケース毎にCSVファイルへ書き込む（workers が2以上なら並列変換）
+
+    progress（ConversionProgress）を指定すると進捗を記録し、キャンセルされた場合は
+    ConversionCancelled をそのまま送出する。cache（ConversionCache）を指定すると差分変換を行い、
+    変換が成功した場合にキャッシュファイルを更新する。suite_path が真の場合、
+    「親テストスイート名」列にルートからのテストスイートのパスを出力する。
+    index（xml_index.XmlIndex）と entries を指定すると、選択したテストケースの範囲だけをパースして変換する。
+    testcase_filter（testcase_filter.TestcaseFilter）を指定すると、一致するテストケースだけを変換する。
+    """
+    with profiling(metrics):
+        try:
+            testcases = timed_iter(metrics, "parse", iter_source_testcases(xml_file, metrics, progress, suite_path, index, entries))
+            rows = iter_testcase_rows(testcases, workers, progress=progress, cache=cache, metrics=metrics, testcase_filter=testcase_filter)
+            write_csv_rows(output_csv_file, rows, encoding, metrics)
+            if cache is not None:
+                cache.save()
+
+        except ConversionCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"XMLからCSVへの変換処理中にエラーが発生しました: {str(e)}\n{traceback.format_exc()}")
+
+def get_suite_csv_name(suite_path, default_name):
+    """テストスイートのパスから、テストスイート毎のCSVファイル名を作る（パスが空なら default_name）"""
+    if not suite_path:
+        return default_name + ".csv"
+    return _UNSAFE_FILENAME_RE.sub("_", suite_path.replace(SUITE_PATH_SEPARATOR, "__")) + ".csv"
+
+def _unique_file_name(name, used_names):
+    """name が使用済みなら拡張子の前に _2, _3, ... を付けた名前を返し、使用済みに加える
+
+    大文字・小文字を区別しないファイルシステムでも重ならないよう、小文字にして比較する。
+    """
+    base, ext = os.path.splitext(name)
+    candidate = name
+    number = 1
+    while candidate.lower() in used_names:
+        number += 1
+        candidate = f"{base}_{number}{ext}"
+    used_names.add(candidate.lower())
+    return candidate
+
+def write_csv_rows_by_suite(output_dir, rows, default_name, encoding=DEFAULT_OUTPUT_ENCODING, metrics=None):
+    """CSV行を「親テストスイート名」列のパス毎に別のCSVファイルへ逐次書き込み、書き込んだファイルのリストを返す
+
+    開いておくファイルは、現在のテストケースを含むテストスイートとその上位のものだけにする。
+    そのため同時に開くファイル数は階層の深さまでに収まる。閉じたテストスイートの行が
+    再び現れた場合（同じパスの同名のテストスイートなど）は、同じファイルに追記する。
+    パスが異なるのにファイル名が同じになるテストスイート（記号を _ に置き換えた結果が同じものなど）は、
+    後に現れたものに _2, _3, ... を付けた別のファイルに書き込む。
+    """
+    suite_idx = CSV_HEADERS.index("親テストスイート名")
+    file_names = {} # テストスイートのパス -> ファイル名
+    used_names = set() # 使用済みのファイル名（小文字）
+    writers = {} # ファイル名 -> (テストスイートのパス, ファイル, csv.writer)
+    written = [] # 書き込んだファイル（出力順）
+    current_path = None
+    try:
+        with phase(metrics, "write"):
+            for row in timed_iter(metrics, "transform", rows):
+                path = row[suite_idx]
+                if path != current_path:
+                    current_path = path
+                    # 現在のテストスイートの上位でないテストスイートは終わっているため閉じる
+                    for name, (open_path, f, _) in list(writers.items()):
+                        if not (path == open_path or path.startswith(open_path + SUITE_PATH_SEPARATOR)):
+                            f.close()
+                            del writers[name]
+
+                name = file_names.get(path)
+                if name is None:
+                    name = file_names[path] = _unique_file_name(get_suite_csv_name(path, default_name), used_names)
+                entry = writers.get(name)
+                if entry is None:
+                    output_csv_file = os.path.join(output_dir, name)
+                    is_new = output_csv_file not in written
+                    f = open_csv_output(output_csv_file, encoding, 'w' if is_new else 'a')
+                    writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+                    if is_new:
+                        writer.writerow(CSV_HEADERS)
+                        written.append(output_csv_file)
+                    entry = writers[name] = (path, f, writer)
+                entry[2].writerow(row)
+    finally:
+        for _, f, _ in writers.values():
+            f.close()
+    return written
+
+def convert_xml_file_to_suite_csvs(xml_file, output_dir, workers=None, encoding=DEFAULT_OUTPUT_ENCODING, metrics=None, progress=None, cache=None,
+                                   index=None, entries=None, testcase_filter=None):
+    """XMLファイルをストリーミングでパースし、テストスイート毎のCSVファイルに分けて書き込む
+
+    「親テストスイート名」列にはルートからのテストスイートのパスを出力する。
+    各ファイルは単独でCSV→XML変換やインポートができるため、巨大なエクスポートを分割して並列に処理できる。
+    index・entries・testcase_filter は convert_xml_file_to_csv と同じ。書き込んだCSVファイルのリストを返す。
+    """
+    with profiling(metrics):
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            default_name = os.path.splitext(os.path.basename(xml_file))[0]
+            testcases = timed_iter(metrics, "parse", iter_source_testcases(xml_file, metrics, progress, True, index, entries))
+            rows = iter_testcase_rows(testcases, workers, progress=progress, cache=cache, metrics=metrics, testcase_filter=testcase_filter)
+            written = write_csv_rows_by_suite(output_dir, rows, default_name, encoding, metrics)
+            if cache is not None:
+                cache.save()
+            return written
+
+        except ConversionCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"XMLからCSVへの変換処理中にエラーが発生しました: {str(e)}\n{traceback.format_exc()}")
@@ -1,54 +1,71 @@
-import xml.sax.saxutils as saxutils
+import re
 
-def element_to_string(element, indent=""):
-    """ElementTreeの要素を整形された文字列に変換（TestLink形式に合わせてCDATA対応）"""
+# 常にCDATAで囲むタグ
+HTML_TAGS = frozenset(['summary', 'preconditions', 'actions', 'expectedresults', 'details'])
+# 値があればCDATAで囲むタグ
+CDATA_TAGS = frozenset([
+    'node_order', 'externalid', 'version', 'step_number',
+    'execution_type', 'importance', 'status',
+    'is_open', 'active', 'name', 'value'
+])
+
+# 空白だけの行、または \n 以外の改行文字（str.splitlines が区切りとみなす文字）
+_BLANK_LINE_OR_BREAK_RE = re.compile(r'(?:\A|\n)[^\S\n]*(?:\n|\Z)|[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+
+def escape_xml(text):
+    """&, <, > をエスケープする（xml.sax.saxutils.escape と同じ結果）
+
+    xml.sax.saxutils は urllib を読み込むため起動が遅くなる。そのため同じ処理をここで行う。
+    """
+    return text.replace("&", "&amp;").replace(">", "&gt;").replace("<", "&lt;")
+
+def write_element(element, write, indent=""):
+    """ElementTreeの要素を整形し、断片ごとに write 関数へ書き出す（TestLink形式に合わせてCDATA対応）
+
+    文字列の連結を行わず1パスで書き出すため、出力サイズに対して線形時間で処理できる。
+    write には list.append やファイルオブジェクトの write を渡す。
+    """
     tag = element.tag
-    attrib_str = ""
+    write(f"{indent}<{tag}")
     if element.attrib:
-        attrib_str = " " + " ".join(f'{k}="{saxutils.escape(str(v))}"' for k, v in element.attrib.items())
+        write(" " + " ".join(f'{k}="{escape_xml(str(v))}"' for k, v in element.attrib.items()))
 
-    result = f"{indent}<{tag}{attrib_str}"
     text_content = element.text
     has_children = len(element) > 0
 
-    if has_children or (text_content is not None and text_content.strip()):
-        result += ">"
-    else:
-         result += "></" + tag + ">" # 空要素 <tag></tag>
-         return result
-
-    # 常にCDATAで囲むタグ
-    html_tags = ['summary', 'preconditions', 'actions', 'expectedresults', 'details']
-    # 値があればCDATAで囲むタグ
-    cdata_tags = [
-        'node_order', 'externalid', 'version', 'step_number', 
-        'execution_type', 'importance', 'status', 
-        'is_open', 'active', 'name', 'value'
-    ]
-
-    if text_content is not None:
-        # テキストをエスケープするかCDATAで囲む
-        stripped_text = text_content # strip() しないで元のテキストを保持
-        if stripped_text:
-            if tag in html_tags:
-                # HTML要素はCDATAで囲む
-                escaped_text = stripped_text.replace(']]>', ']]]]><![CDATA[>')
-                result += f"<![CDATA[{escaped_text}]]>"
-            elif tag in cdata_tags:
-                # 通常値もCDATAで囲む（TestLink形式に合わせる）
-                escaped_text = stripped_text.replace(']]>', ']]]]><![CDATA[>')
-                result += f"<![CDATA[{escaped_text}]]>"
-            else:
-                # それ以外のテキストはXMLエスケープ
-                result += saxutils.escape(stripped_text)
+    if not has_children and not (text_content is not None and text_content.strip()):
+        write(f"></{tag}>") # 空要素 <tag></tag>
+        return
+    write(">")
+
+    # テキストをエスケープするかCDATAで囲む（strip() しないで元のテキストを保持）
+    if text_content:
+        if tag in HTML_TAGS or tag in CDATA_TAGS:
+            # HTML要素・通常値ともCDATAで囲む（TestLink形式に合わせる）
+            escaped_text = text_content.replace(']]>', ']]]]><![CDATA[>')
+            write(f"<![CDATA[{escaped_text}]]>")
+        else:
+            # それ以外のテキストはXMLエスケープ
+            write(escape_xml(text_content))
 
     if has_children:
-        result += "\n"
+        write("\n")
+        child_indent = indent + "\t"
         for child in element:
-            result += element_to_string(child, indent + "\t") + "\n"
-        result += f"{indent}</{tag}>"
-    elif text_content is not None and text_content.strip(): # テキストのみの場合
-        result += f"</{tag}>"
-    # 子要素もテキストもない場合は上で処理済み (<tag></tag>)
+            write_element(child, write, child_indent)
+            write("\n")
+        write(f"{indent}</{tag}>")
+    else: # テキストのみの場合
+        write(f"</{tag}>")
+
+def element_to_string(element, indent=""):
+    """ElementTreeの要素を整形された文字列に変換（TestLink形式に合わせてCDATA対応）"""
+    parts = []
+    write_element(element, parts.append, indent)
+    return "".join(parts)
 
-    return result
\ No newline at end of file
+def remove_blank_lines(xml_string):
+    """空白だけの行を削除し、改行を \\n に揃える（該当する行がなければそのまま返す）"""
+    if _BLANK_LINE_OR_BREAK_RE.search(xml_string) is None:
+        return xml_string
+    return "\n".join(line for line in xml_string.splitlines() if line.strip())